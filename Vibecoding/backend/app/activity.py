@@ -0,0 +1,201 @@
+"""
+activity.py
+-----------
+Historial de cambios de tareas (task_activity) con escritura en lotes.
+
+Un INSERT síncrono por mutación alargaría cada escritura. En su lugar:
+- crud llama a record(db, ...) dentro de la transacción de la mutación;
+  el registro queda en la sesión y solo se encola tras su COMMIT (si la
+  transacción se deshace, se descarta). Con group commit, el COMMIT real
+  es el del grupo.
+- Un hilo escritor por base de datos (o shard) junta los registros y los
+  inserta con un executemany cada ACTIVITY_BATCH_SIZE registros o cada
+  ACTIVITY_FLUSH_INTERVAL_MS.
+- El buffer es acotado (ACTIVITY_MAX_BUFFER): si se llena, los registros
+  nuevos se descartan y se cuentan en `dropped`, sin frenar la escritura.
+- shutdown() vacía los buffers antes de apagar.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from . import group_commit, models, sharding
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("ACTIVITY_LOG_ENABLED", "true").lower() == "true"
+BATCH_SIZE = int(os.getenv("ACTIVITY_BATCH_SIZE", "200"))
+FLUSH_INTERVAL_MS = float(os.getenv("ACTIVITY_FLUSH_INTERVAL_MS", "500"))
+MAX_BUFFER = int(os.getenv("ACTIVITY_MAX_BUFFER", "10000"))
+
+
+class ActivityWriter:
+    """Hilo escritor de una base de datos (o de un shard)"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        batch_size: int = BATCH_SIZE,
+        interval: float = FLUSH_INTERVAL_MS / 1000,
+        max_buffer: int = MAX_BUFFER
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.interval = interval
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_buffer)
+        self._thread = threading.Thread(target=self._run, name="activity-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, entry: dict) -> bool:
+        """Encola un registro sin bloquear; False si el buffer está lleno"""
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning("Buffer de actividad lleno: %s registros descartados", self.dropped)
+            return False
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Espera a que se escriba todo lo encolado hasta ahora"""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def stop(self, timeout: float = 5.0):
+        """Escribe lo pendiente y detiene el hilo"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            batch: List[dict] = []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.interval
+            # Marcadores de flush / parada: cortan el lote en curso
+            while isinstance(item, dict):
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    item = False
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    item = False
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    item = False
+            self._write(batch)
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                return
+
+    def _write(self, batch: List[dict]):
+        if not batch:
+            return
+        session = self.session_factory()
+        try:
+            table = models.TaskActivity.__table__
+            sharding.assign_ids(session, table, batch)
+            session.execute(insert(table), batch)
+            session.commit()
+            self.written += len(batch)
+            self.batches += 1
+        except Exception:
+            logger.exception("No se pudo escribir un lote de %s registros de actividad", len(batch))
+            session.rollback()
+            self.dropped += len(batch)
+        finally:
+            session.close()
+
+
+# ========== API PARA CRUD ==========
+
+_writers: Dict[tuple, ActivityWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def writer_for(db: Session) -> ActivityWriter:
+    """Escritor de la base de datos a la que apunta la sesión (uno por shard)"""
+    key, factory = group_commit.session_target(db)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = ActivityWriter(factory)
+        return writer
+
+
+def record(db: Session, task_id: int, user_id: int, action: str, changes: Optional[dict] = None):
+    """Registra un cambio de tarea; se encola cuando la transacción de db confirma"""
+    if not ENABLED:
+        return
+    db.info.setdefault("pending_activity", []).append({
+        "task_id": task_id,
+        "user_id": user_id,
+        "action": action,
+        "changes": json.dumps(changes, default=str, ensure_ascii=False) if changes else None,
+        "ts": datetime.utcnow(),
+    })
+
+
+@event.listens_for(Session, "after_commit")
+def _enqueue_committed(session):
+    session.info.pop("activity_marks", None)
+    entries = session.info.pop("pending_activity", None)
+    if not entries:
+        return
+    writer = writer_for(session)
+    for entry in entries:
+        writer.submit(entry)
+
+
+@event.listens_for(Session, "after_transaction_create")
+def _mark_savepoint(session, transaction):
+    # Con group commit cada operación corre en un SAVEPOINT: si se deshace,
+    # solo se descartan los registros que agregó ella
+    if transaction.nested:
+        marks = session.info.setdefault("activity_marks", {})
+        marks[transaction] = len(session.info.get("pending_activity", ()))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back(session, previous_transaction):
+    if previous_transaction.nested:
+        mark = session.info.get("activity_marks", {}).pop(previous_transaction, None)
+        if mark is not None and "pending_activity" in session.info:
+            del session.info["pending_activity"][mark:]
+    else:
+        session.info.pop("pending_activity", None)
+        session.info.pop("activity_marks", None)
+
+
+def flush(timeout: float = 5.0):
+    """Espera a que todos los escritores escriban lo encolado"""
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.flush(timeout)
+
+
+def shutdown():
+    """Vacía los buffers y detiene los escritores (usado en el apagado de la app)"""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.stop()
@@ -0,0 +1,269 @@
+"""
+admission.py
+------------
+Control de admisión y descarte de carga.
+
+Con picos de tráfico el threadpool de FastAPI encolaba las peticiones sin
+límite y la latencia crecía para todos. Este middleware clasifica cada
+petición (auth, read, write) y aplica, por clase:
+- un límite de peticiones concurrentes
+- una cola de espera acotada con un plazo máximo
+- 503 con Retry-After inmediato si la cola está llena o vence el plazo
+
+Además hay un límite total (el tamaño del threadpool). Cuando se libera un
+lugar se atiende primero a las lecturas, luego las escrituras y por último
+el login/registro (bcrypt).
+
+La configuración se puede recargar en caliente desde ADMISSION_CONFIG_PATH
+(JSON; se relee cuando cambia el archivo) y las métricas de las colas se
+consultan en /api/_debug/admission.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from collections import deque
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+CONFIG_PATH = os.getenv("ADMISSION_CONFIG_PATH", "")
+# Por defecto el tamaño del threadpool de AnyIO (40)
+TOTAL_LIMIT = int(os.getenv("ADMISSION_TOTAL_LIMIT", "40"))
+
+# Menor número = mayor prioridad
+DEFAULT_CLASSES = {
+    "read": {"limit": 32, "queue": 200, "timeout": 2.0, "retry_after": 1, "priority": 0},
+    "write": {"limit": 16, "queue": 100, "timeout": 5.0, "retry_after": 2, "priority": 1},
+    "auth": {"limit": 4, "queue": 32, "timeout": 5.0, "retry_after": 5, "priority": 2},
+}
+
+AUTH_PATHS = frozenset({"/api/auth/login", "/api/auth/register"})
+EXEMPT_PREFIXES = ("/api/health", "/api/_debug", "/docs", "/redoc", "/openapi.json")
+RELOAD_CHECK_SECONDS = 1.0
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    """Clase de la petición, o None si no pasa por el control de admisión"""
+    if path == "/" or path.startswith(EXEMPT_PREFIXES) or method == "OPTIONS":
+        return None
+    if path in AUTH_PATHS:
+        return "auth"
+    return "read" if method in ("GET", "HEAD") else "write"
+
+
+class Rejected(Exception):
+    """La petición no se admite (cola llena o plazo vencido)"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _RouteClass:
+    def __init__(self, name: str, settings: dict):
+        self.name = name
+        self.active = 0
+        self.waiters: deque = deque()
+        self.metrics = {"admitted": 0, "queued": 0, "rejected_full": 0, "rejected_timeout": 0,
+                        "wait_seconds_total": 0.0, "wait_seconds_max": 0.0}
+        self.apply(settings)
+
+    def apply(self, settings: dict):
+        self.settings = dict(settings)
+        self.limit = int(settings["limit"])
+        self.queue = int(settings["queue"])
+        self.timeout = float(settings["timeout"])
+        self.retry_after = int(settings["retry_after"])
+        self.priority = int(settings["priority"])
+
+
+class AdmissionController:
+    """Límites por clase y total; todo corre en el event loop (sin locks)"""
+
+    def __init__(self, classes: Optional[Dict[str, dict]] = None, total_limit: int = TOTAL_LIMIT,
+                 config_path: str = CONFIG_PATH):
+        self.classes: Dict[str, _RouteClass] = {}
+        self.total_limit = total_limit
+        self.total_active = 0
+        self.config_path = config_path
+        self._config_mtime: Optional[float] = None
+        self._next_reload_check = 0.0
+        self.configure({"total_limit": total_limit, "classes": classes or DEFAULT_CLASSES})
+
+    # Configuración
+
+    def configure(self, config: dict):
+        """Aplica una configuración (parcial) y despacha a quien ahora tenga lugar"""
+        if "total_limit" in config:
+            self.total_limit = int(config["total_limit"])
+        for name, settings in config.get("classes", {}).items():
+            current = self.classes.get(name)
+            merged = {**DEFAULT_CLASSES.get(name, {}), **(current.settings if current else {}), **settings}
+            if current is None:
+                self.classes[name] = _RouteClass(name, merged)
+            else:
+                current.apply(merged)
+        self._dispatch()
+
+    def reload_if_changed(self):
+        """Relee ADMISSION_CONFIG_PATH si cambió (como mucho una vez por segundo)"""
+        if not self.config_path:
+            return
+        now = time.monotonic()
+        if now < self._next_reload_check:
+            return
+        self._next_reload_check = now + RELOAD_CHECK_SECONDS
+        try:
+            mtime = os.stat(self.config_path).st_mtime
+            if mtime == self._config_mtime:
+                return
+            with open(self.config_path, encoding="utf-8") as config_file:
+                config = json.load(config_file)
+            self.configure(config)
+            self._config_mtime = mtime
+            logger.info("Configuración de admisión recargada desde %s", self.config_path)
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            logger.warning("No se pudo recargar %s: %s", self.config_path, exc)
+
+    # Admisión
+
+    def _has_room(self, route_class: _RouteClass) -> bool:
+        return route_class.active < route_class.limit and self.total_active < self.total_limit
+
+    def _grant(self, route_class: _RouteClass):
+        route_class.active += 1
+        self.total_active += 1
+        route_class.metrics["admitted"] += 1
+
+    def _dispatch(self):
+        """Entrega los lugares libres a los que esperan, por prioridad"""
+        for route_class in sorted(self.classes.values(), key=lambda c: c.priority):
+            while route_class.waiters and self._has_room(route_class):
+                future = route_class.waiters.popleft()
+                if not future.done():
+                    self._grant(route_class)
+                    future.set_result(None)
+
+    def _waiting_ahead(self, route_class: _RouteClass) -> bool:
+        """
+        Hay peticiones de igual o mayor prioridad esperando (no se las adelanta).
+        De otras clases solo cuentan las que tienen lugar en su propio límite:
+        las frenadas por él no ocuparían el lugar libre del total.
+        """
+        return any(
+            other.waiters
+            for other in self.classes.values()
+            if other.priority <= route_class.priority
+            and (other is route_class or other.active < other.limit)
+        )
+
+    async def acquire(self, name: str):
+        route_class = self.classes[name]
+        if self._has_room(route_class) and not self._waiting_ahead(route_class):
+            self._grant(route_class)
+            return
+        if len(route_class.waiters) >= route_class.queue:
+            route_class.metrics["rejected_full"] += 1
+            raise Rejected("queue_full", route_class.retry_after)
+
+        future = asyncio.get_running_loop().create_future()
+        route_class.waiters.append(future)
+        route_class.metrics["queued"] += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), route_class.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if future.done() and not future.cancelled():
+                # Se le asignó un lugar justo al vencer: se devuelve
+                self.release(name)
+            else:
+                future.cancel()
+                try:
+                    route_class.waiters.remove(future)
+                except ValueError:
+                    pass
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            route_class.metrics["rejected_timeout"] += 1
+            raise Rejected("timeout", route_class.retry_after)
+        finally:
+            waited = time.monotonic() - started
+            route_class.metrics["wait_seconds_total"] += waited
+            route_class.metrics["wait_seconds_max"] = max(route_class.metrics["wait_seconds_max"], waited)
+
+    def release(self, name: str):
+        route_class = self.classes[name]
+        route_class.active -= 1
+        self.total_active -= 1
+        self._dispatch()
+
+    def metrics(self) -> dict:
+        return {
+            "total_limit": self.total_limit,
+            "total_active": self.total_active,
+            "classes": {
+                name: {
+                    "limit": route_class.limit,
+                    "queue_limit": route_class.queue,
+                    "timeout": route_class.timeout,
+                    "priority": route_class.priority,
+                    "active": route_class.active,
+                    "waiting": len(route_class.waiters),
+                    **{key: round(value, 6) if isinstance(value, float) else value
+                       for key, value in route_class.metrics.items()},
+                }
+                for name, route_class in self.classes.items()
+            },
+        }
+
+
+controller = AdmissionController()
+
+
+def apply_thread_limit(limit: Optional[int] = None):
+    """Ajusta el threadpool de AnyIO (endpoints síncronos) al límite total"""
+    import anyio.to_thread
+    anyio.to_thread.current_default_thread_limiter().total_tokens = limit or controller.total_limit
+
+
+# ========== MIDDLEWARE ==========
+
+class AdmissionMiddleware:
+    """Middleware ASGI de control de admisión"""
+
+    def __init__(self, app, admission: AdmissionController = controller):
+        self.app = app
+        self.admission = admission
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ADMISSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        name = classify(scope["method"], scope["path"])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        self.admission.reload_if_changed()
+        try:
+            await self.admission.acquire(name)
+        except Rejected as rejected:
+            body = json.dumps({"detail": "Servidor saturado, reintente más tarde"}).encode("utf-8")
+            await send({"type": "http.response.start", "status": 503, "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(rejected.retry_after))).encode()),
+                (b"x-admission-rejected", rejected.reason.encode()),
+            ]})
+            await send({"type": "http.response.body", "body": body})
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.admission.release(name)
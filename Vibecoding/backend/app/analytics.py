@@ -0,0 +1,222 @@
+"""
+analytics.py
+------------
+Analítica de tareas por intervalos de tiempo (RF14 extendido).
+Mantiene una tabla de rollups diarios por usuario (task_daily_stats) que
+las mutaciones de crud actualizan de forma incremental con upserts, de modo
+que los dashboards leen pocas filas en lugar de agrupar todas las tareas.
+"""
+
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Contadores de la tabla de rollups
+COUNTERS = ("created", "completed", "reopened", "due", "due_pending")
+
+# Máximo de buckets por consulta (evita rangos enormes)
+MAX_BUCKETS = 400
+
+
+def _as_date(value) -> Optional[date]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+# ========== MANTENIMIENTO INCREMENTAL ==========
+
+def _insert_for(db: Session):
+    """Insert con soporte de ON CONFLICT según el dialecto de la sesión"""
+    if db.get_bind(models.TaskDailyStat).dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+
+def apply_deltas(db: Session, user_id: int, deltas: Dict[date, Counter]):
+    """
+    Suma los deltas a los rollups del usuario (un upsert por día).
+    No hace commit: se ejecuta dentro de la transacción de la mutación.
+    """
+    table = models.TaskDailyStat
+    insert = _insert_for(db)
+
+    for day, counter in deltas.items():
+        changes = {name: value for name, value in counter.items() if value}
+        if not changes:
+            continue
+        stmt = insert(table).values(
+            user_id=user_id,
+            day=day,
+            **{name: changes.get(name, 0) for name in COUNTERS}
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.user_id, table.day],
+            set_={name: getattr(table, name) + stmt.excluded[name] for name in changes}
+        )
+        db.execute(stmt)
+
+
+def _due_contribution(deltas: Dict[date, Counter], status: str, due_date, sign: int):
+    due_day = _as_date(due_date)
+    if due_day is None:
+        return
+    deltas[due_day]["due"] += sign
+    if status == "pending":
+        deltas[due_day]["due_pending"] += sign
+
+
+def task_created(db: Session, user_id: int, status: str, due_date, created_at: datetime):
+    """Registra la creación de una tarea"""
+    deltas: Dict[date, Counter] = defaultdict(Counter)
+    deltas[created_at.date()]["created"] += 1
+    if status == "completed":
+        deltas[created_at.date()]["completed"] += 1
+    _due_contribution(deltas, status, due_date, +1)
+    apply_deltas(db, user_id, deltas)
+
+
+def tasks_bulk_created(db: Session, user_id: int, rows: Iterable[dict], created_at: datetime):
+    """Registra un bloque de tareas importadas con un upsert por día afectado"""
+    deltas: Dict[date, Counter] = defaultdict(Counter)
+    for row in rows:
+        status = row.get("status", "pending")
+        deltas[created_at.date()]["created"] += 1
+        if status == "completed":
+            deltas[created_at.date()]["completed"] += 1
+        _due_contribution(deltas, status, row.get("due_date"), +1)
+    apply_deltas(db, user_id, deltas)
+
+
+def task_changed(
+    db: Session,
+    user_id: int,
+    old_status: str,
+    old_due_date,
+    new_status: str,
+    new_due_date,
+    changed_at: datetime
+):
+    """Registra un cambio de estado y/o de fecha límite"""
+    deltas: Dict[date, Counter] = defaultdict(Counter)
+    if old_status != new_status:
+        key = "completed" if new_status == "completed" else "reopened"
+        deltas[changed_at.date()][key] += 1
+    _due_contribution(deltas, old_status, old_due_date, -1)
+    _due_contribution(deltas, new_status, new_due_date, +1)
+    apply_deltas(db, user_id, deltas)
+
+
+def task_deleted(db: Session, user_id: int, status: str, due_date):
+    """Retira la contribución de una tarea eliminada a los contadores de vencimiento"""
+    deltas: Dict[date, Counter] = defaultdict(Counter)
+    _due_contribution(deltas, status, due_date, -1)
+    apply_deltas(db, user_id, deltas)
+
+
+# ========== BACKFILL ==========
+
+def backfill(db: Session, user_id: Optional[int] = None) -> int:
+    """
+    Recalcula los rollups desde la tabla de tareas (todos los usuarios o uno).
+    Las completadas se atribuyen al día de su última actualización.
+    Retorna el número de filas de rollup escritas.
+    """
+    task = models.Task
+    scope = [task.user_id == user_id] if user_id is not None else []
+
+    deltas: Dict[int, Dict[date, Counter]] = defaultdict(lambda: defaultdict(Counter))
+
+    def accumulate(counter_name, day_column, *conditions):
+        stmt = (
+            select(task.user_id, func.date(day_column), func.count())
+            .where(day_column.isnot(None), *scope, *conditions)
+            .group_by(task.user_id, func.date(day_column))
+        )
+        for row_user_id, day, count in db.execute(stmt):
+            deltas[row_user_id][_as_date(day)][counter_name] += count
+
+    accumulate("created", task.created_at)
+    accumulate("completed", task.updated_at, task.status == "completed")
+    accumulate("due", task.due_date)
+    accumulate("due_pending", task.due_date, task.status == "pending")
+
+    db.execute(delete(models.TaskDailyStat).where(
+        *([models.TaskDailyStat.user_id == user_id] if user_id is not None else [])
+    ))
+    rows = 0
+    for row_user_id, by_day in deltas.items():
+        apply_deltas(db, row_user_id, by_day)
+        rows += len(by_day)
+    db.commit()
+
+    return rows
+
+
+# ========== CONSULTA ==========
+
+def bucket_start(day: date, granularity: str) -> date:
+    """Inicio del bucket que contiene el día (las semanas empiezan en lunes)"""
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def get_buckets(
+    db: Session,
+    user_id: int,
+    granularity: str,
+    start: date,
+    end: date,
+    today: Optional[date] = None
+) -> List[dict]:
+    """
+    Series temporales desde los rollups, agregadas por día o semana.
+    'overdue' cuenta las tareas con vencimiento en el bucket (antes de hoy)
+    que siguen pendientes.
+    """
+    today = today or datetime.utcnow().date()
+    start = bucket_start(start, granularity)
+    stat = models.TaskDailyStat
+
+    stmt = (
+        select(stat.day, *[getattr(stat, name) for name in COUNTERS])
+        .where(stat.user_id == user_id, stat.day >= start, stat.day <= end)
+        .order_by(stat.day)
+    )
+
+    step = timedelta(days=7 if granularity == "week" else 1)
+    buckets: Dict[date, dict] = {}
+    cursor = start
+    while cursor <= end:
+        buckets[cursor] = {
+            "period_start": cursor,
+            "created": 0,
+            "completed": 0,
+            "reopened": 0,
+            "due": 0,
+            "overdue": 0,
+        }
+        cursor += step
+
+    for day, created, completed, reopened, due, due_pending in db.execute(stmt):
+        day = _as_date(day)
+        bucket = buckets[bucket_start(day, granularity)]
+        bucket["created"] += created
+        bucket["completed"] += completed
+        bucket["reopened"] += reopened
+        bucket["due"] += due
+        if day < today:
+            bucket["overdue"] += due_pending
+
+    return list(buckets.values())
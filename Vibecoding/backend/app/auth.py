@@ -13,7 +13,9 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 
+from . import crud, tracing
 from .database import get_db
+from .sharding import route_to_user
 from .models import User
 
 # Configuración de seguridad
@@ -30,12 +32,14 @@ security = HTTPBearer()
 
 def hash_password(password: str) -> str:
     """Hashea una contraseña usando bcrypt (RNF5: Seguridad)"""
-    return pwd_context.hash(password)
+    with tracing.span("auth.bcrypt_hash"):
+        return pwd_context.hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica si una contraseña coincide con su hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    with tracing.span("auth.bcrypt_verify"):
+        return pwd_context.verify(plain_password, hashed_password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -73,12 +77,28 @@ def decode_access_token(token: str) -> Optional[dict]:
         return None
 
 
+def token_subject(authorization: bytes) -> Optional[str]:
+    """
+    'sub' de un header Authorization: Bearer válido, sin consultar la BD
+    (para los middlewares que agrupan peticiones por usuario).
+    """
+    scheme, _, token = authorization.decode("latin-1").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    subject = payload.get("sub")
+    return str(subject) if subject is not None else None
+
+
 def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
     """
     Autentica un usuario verificando email y password.
     Implementa AuthService.login() del diagrama.
     """
-    user = db.query(User).filter(User.email == email).first()
+    user = crud.get_user_by_email(db, email)
     
     if not user:
         return None
@@ -110,7 +130,8 @@ def get_current_user(
     )
     
     # Decodificar token
-    payload = decode_access_token(token)
+    with tracing.span("auth.jwt_decode"):
+        payload = decode_access_token(token)
     print(f"🔍 DEBUG: Payload decodificado: {payload}")
     
     if payload is None:
@@ -134,12 +155,16 @@ def get_current_user(
         raise credentials_exception
     
     # Buscar usuario en la base de datos
-    user = db.query(User).filter(User.id == user_id).first()
+    with tracing.span("auth.user_lookup", **{"enduser.id": user_id}):
+        user = crud.get_user_by_id(db, user_id)
     print(f"🔍 DEBUG: Usuario encontrado en BD: {user.email if user else 'None'}")
     
     if user is None:
         print(f"❌ DEBUG: Usuario con id={user_id} no existe en la base de datos")
         raise credentials_exception
     
+    # Con sharding, el resto de la petición usa el shard de este usuario
+    route_to_user(db, user.id)
+    
     print(f"✅ DEBUG: Autenticación exitosa para {user.email}")
     return user
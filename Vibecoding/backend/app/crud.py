@@ -5,11 +5,14 @@ Operaciones CRUD (Create, Read, Update, Delete) para las entidades.
 Implementa TaskService del diagrama de clases.
 """
 
-from sqlalchemy.orm import Session
-from typing import Optional, List
-from datetime import datetime
+from sqlalchemy import bindparam, case, func, select, insert, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, load_only, selectinload
+from typing import Optional, List, Iterator, Sequence, Tuple
+from datetime import datetime, timedelta
+from functools import lru_cache
 
-from . import models, schemas
+from . import models, schemas, export, analytics, sharding, typeahead, activity, labels
 
 
 # ========== USER CRUD ==========
@@ -29,14 +32,18 @@ def create_user(db: Session, user: schemas.UserCreate, password_hash: str) -> mo
     return db_user
 
 
+_USER_BY_EMAIL = select(models.User).where(models.User.email == bindparam("email"))
+_USER_BY_ID = select(models.User).where(models.User.id == bindparam("user_id"))
+
+
 def get_user_by_email(db: Session, email: str) -> Optional[models.User]:
     """Obtiene un usuario por email"""
-    return db.query(models.User).filter(models.User.email == email).first()
+    return db.execute(_USER_BY_EMAIL, {"email": email}).scalars().first()
 
 
 def get_user_by_id(db: Session, user_id: int) -> Optional[models.User]:
     """Obtiene un usuario por ID"""
-    return db.query(models.User).filter(models.User.id == user_id).first()
+    return db.execute(_USER_BY_ID, {"user_id": user_id}).scalars().first()
 
 
 # ========== TASK CRUD ==========
@@ -46,24 +53,115 @@ def create_task(db: Session, task: schemas.TaskCreate, user_id: int) -> models.T
     Crea una nueva tarea para un usuario.
     Implementa TaskService.createTask() del diagrama (RF4).
     """
+    now = datetime.utcnow()
     db_task = models.Task(
         title=task.title,
         description=task.description,
         due_date=task.due_date,
-        user_id=user_id
+        user_id=user_id,
+        created_at=now,
+        updated_at=now
     )
     db.add(db_task)
+    analytics.task_created(db, user_id, "pending", task.due_date, now)
+    db.flush()
+    activity.record(db, db_task.id, user_id, "created", task.model_dump(exclude_none=True))
     db.commit()
     db.refresh(db_task)
+    typeahead.index.task_saved(user_id, db_task.id, db_task.title)
     return db_task
 
 
+def bulk_create_tasks(db: Session, user_id: int, rows: List[dict]) -> int:
+    """
+    Inserta un bloque de tareas en una sola transacción (importación masiva).
+    Usa un insert de Core con executemany, sin construir objetos ORM.
+    """
+    if not rows:
+        return 0
+    
+    now = datetime.utcnow()
+    values = [
+        {
+            "user_id": user_id,
+            "title": row["title"],
+            "description": row.get("description"),
+            "status": row.get("status", "pending"),
+            "due_date": row.get("due_date"),
+            "created_at": now,
+            "updated_at": now
+        }
+        for row in rows
+    ]
+    sharding.assign_ids(db, models.Task.__table__, values)
+    db.execute(insert(models.Task.__table__), values)
+    analytics.tasks_bulk_created(db, user_id, rows, now)
+    db.commit()
+    # El insert de Core no retorna los ids: el índice se recarga al próximo uso
+    typeahead.index.invalidate(user_id)
+    
+    return len(rows)
+
+
+def _task_options(fields: Optional[Sequence[str]] = None, include: Sequence[str] = ()) -> list:
+    """
+    Opciones de carga de tareas.
+    - fields: solo se cargan esas columnas (?fields=)
+    - include: relaciones a precargar (?include=); 'reminder' y 'labels' usan
+      selectinload, una sola consulta extra para todo el listado en vez de una por tarea
+    """
+    options = []
+    if fields:
+        options.append(load_only(*[getattr(models.Task, name) for name in fields]))
+    if "reminder" in include:
+        options.append(selectinload(models.Task.reminder))
+    if "labels" in include:
+        options.append(selectinload(models.Task.labels))
+    return options
+
+
+# Las consultas calientes se construyen una vez por combinación de filtros y se
+# reutilizan con bindparam: el objeto select memoriza su cache key y SQLAlchemy
+# encuentra el SQL compilado en su caché sin reconstruir ni recorrer la consulta.
+
+@lru_cache(maxsize=256)
+def _tasks_statement(
+    status: bool, due_from: bool, due_to: bool, search: bool, order_by: str,
+    fields: Optional[Tuple[str, ...]], include: Tuple[str, ...], task_ids: bool = False
+):
+    """SELECT de get_tasks para la combinación de filtros presentes"""
+    Task = models.Task
+    stmt = select(Task).where(Task.user_id == bindparam("user_id"))
+    if status:
+        stmt = stmt.where(Task.status == bindparam("status"))
+    # Rango de vencimiento (usa ix_tasks_user_due / ix_tasks_user_status_due)
+    if due_from:
+        stmt = stmt.where(Task.due_date >= bindparam("due_from"))
+    if due_to:
+        stmt = stmt.where(Task.due_date < bindparam("due_to"))
+    if search:
+        stmt = stmt.where(Task.title.ilike(bindparam("search")) | Task.description.ilike(bindparam("search")))
+    # Ids ya filtrados por etiquetas en el índice de labels.py (sin JOIN a task_labels)
+    if task_ids:
+        stmt = stmt.where(Task.id.in_(bindparam("task_ids", expanding=True)))
+    if order_by == "due_date":
+        stmt = stmt.order_by(Task.due_date.desc().nullslast())
+    else:  # created_at por defecto
+        stmt = stmt.order_by(Task.created_at.desc())
+    return stmt.options(*_task_options(fields, include))
+
+
 def get_tasks(
     db: Session,
     user_id: int,
     status: Optional[str] = None,
     order_by: str = "created_at",
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    due_from: Optional[datetime] = None,
+    due_to: Optional[datetime] = None,
+    fields: Optional[Sequence[str]] = None,
+    include: Sequence[str] = (),
+    task_ids: Optional[Sequence[int]] = None
 ) -> List[models.Task]:
     """
     Obtiene lista de tareas de un usuario con filtros opcionales.
@@ -73,97 +171,213 @@ def get_tasks(
         status: Filtrar por estado (pending|completed) - RF8
         order_by: Ordenar por campo (created_at|due_date) - RF9
         search: Búsqueda por palabras clave en título/descripción - RF13
+        due_from / due_to: Rango de fecha límite [due_from, due_to)
+        fields: Columnas a cargar (el resto queda sin leer)
+        include: Relaciones a precargar (reminder, labels)
+        task_ids: Restringe a esos ids (resultado del filtro por etiquetas)
     """
-    query = db.query(models.Task).filter(models.Task.user_id == user_id)
-    
-    # Filtro por estado (RF8)
+    if task_ids is not None and not task_ids:
+        return []
+    stmt = _tasks_statement(
+        bool(status), bool(due_from), bool(due_to), bool(search),
+        "due_date" if order_by == "due_date" else "created_at",
+        tuple(fields) if fields else None, tuple(include), task_ids is not None
+    )
+    params = {"user_id": user_id}
     if status:
-        query = query.filter(models.Task.status == status)
-    
-    # Búsqueda por keywords (RF13)
+        params["status"] = status
+    if due_from:
+        params["due_from"] = due_from
+    if due_to:
+        params["due_to"] = due_to
     if search:
-        search_pattern = f"%{search}%"
-        query = query.filter(
-            (models.Task.title.ilike(search_pattern)) |
-            (models.Task.description.ilike(search_pattern))
-        )
+        params["search"] = f"%{search}%"
+    if task_ids is not None:
+        params["task_ids"] = list(task_ids)
     
-    # Ordenamiento (RF9)
-    if order_by == "due_date":
-        query = query.order_by(models.Task.due_date.desc().nullslast())
-    else:  # created_at por defecto
-        query = query.order_by(models.Task.created_at.desc())
+    return list(db.execute(stmt, params).scalars())
+
+
+def get_tasks_due_between(
+    db: Session,
+    user_id: int,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    status: str = "pending",
+    limit: int = 50,
+    fields: Optional[Sequence[str]] = None
+) -> List[models.Task]:
+    """
+    Tareas con fecha límite en [start, end), de la más próxima a la más lejana.
+    Se resuelve con un range scan sobre ix_tasks_user_status_due y un LIMIT.
+    """
+    stmt = select(models.Task).options(*_task_options(fields)).where(
+        models.Task.user_id == user_id,
+        models.Task.status == status,
+        models.Task.due_date.isnot(None)
+    )
+    if start:
+        stmt = stmt.where(models.Task.due_date >= start)
+    if end:
+        stmt = stmt.where(models.Task.due_date < end)
     
-    return query.all()
+    return list(db.execute(stmt.order_by(models.Task.due_date.asc()).limit(limit)).scalars())
+
+
+def get_upcoming_tasks(
+    db: Session, user_id: int, now: datetime, hours: int = 24, limit: int = 50,
+    fields: Optional[Sequence[str]] = None
+) -> List[models.Task]:
+    """Tareas pendientes que vencen en las próximas `hours` horas"""
+    return get_tasks_due_between(db, user_id, now, now + timedelta(hours=hours), limit=limit, fields=fields)
+
 
+def get_overdue_tasks(
+    db: Session, user_id: int, now: datetime, limit: int = 50,
+    fields: Optional[Sequence[str]] = None
+) -> List[models.Task]:
+    """Tareas pendientes con fecha límite ya pasada (las más atrasadas primero)"""
+    return get_tasks_due_between(db, user_id, None, now, limit=limit, fields=fields)
+
+
+def iter_tasks_for_export(db: Session, user_id: int, chunk_size: int = 500) -> Iterator[tuple]:
+    """
+    Itera las tareas de un usuario con un cursor del lado del servidor.
+    Selecciona solo columnas (sin entidades ORM ni identity map) y las trae
+    en bloques de chunk_size, de modo que la memoria no depende del total.
+    """
+    columns = [getattr(models.Task, field) for field in export.EXPORT_FIELDS]
+    stmt = (
+        select(*columns)
+        .where(models.Task.user_id == user_id)
+        .order_by(models.Task.id)
+        .execution_options(stream_results=True, yield_per=chunk_size)
+    )
+    for row in db.execute(stmt):
+        yield tuple(row)
 
-def get_task_by_id(db: Session, task_id: int, user_id: int) -> Optional[models.Task]:
+
+@lru_cache(maxsize=64)
+def _task_by_id_statement(fields: Optional[Tuple[str, ...]], include: Tuple[str, ...]):
+    return select(models.Task).where(
+        models.Task.id == bindparam("task_id"),
+        models.Task.user_id == bindparam("user_id")
+    ).options(*_task_options(fields, include))
+
+
+def get_task_by_id(
+    db: Session, task_id: int, user_id: int,
+    fields: Optional[Sequence[str]] = None, include: Sequence[str] = ()
+) -> Optional[models.Task]:
     """Obtiene una tarea específica verificando que pertenezca al usuario"""
-    return db.query(models.Task).filter(
-        models.Task.id == task_id,
-        models.Task.user_id == user_id
-    ).first()
+    stmt = _task_by_id_statement(tuple(fields) if fields else None, tuple(include))
+    return db.execute(stmt, {"task_id": task_id, "user_id": user_id}).scalars().first()
 
 
-def update_task(
+class VersionConflict(Exception):
+    """La tarea cambió desde la versión que el cliente leyó (se responde 409)"""
+
+    def __init__(self, current_version: int):
+        super().__init__(f"La tarea está en la versión {current_version}")
+        self.current_version = current_version
+
+
+_TASK_VERSION = select(models.Task.status, models.Task.due_date, models.Task.version).where(
+    models.Task.id == bindparam("task_id"),
+    models.Task.user_id == bindparam("user_id")
+)
+
+
+def _update_task_row(
     db: Session,
     task_id: int,
     user_id: int,
-    task_update: schemas.TaskUpdate
+    values: dict,
+    expected_version: Optional[int] = None
 ) -> Optional[models.Task]:
     """
-    Actualiza los datos de una tarea.
-    Implementa TaskService.updateTask() del diagrama (RF5).
+    Concurrencia optimista: UPDATE ... WHERE id AND user_id AND version
+    que incrementa version y retorna la fila (sin cargar la entidad antes).
+    Solo se leen estado, fecha límite y versión para los rollups de analytics.
+    Lanza VersionConflict si la versión no es expected_version (If-Match) o
+    si otra escritura la cambió entre la lectura y el UPDATE.
     """
-    db_task = get_task_by_id(db, task_id, user_id)
-    
-    if not db_task:
+    params = {"task_id": task_id, "user_id": user_id}
+    current = db.execute(_TASK_VERSION, params).one_or_none()
+    if current is None:
         return None
+    if expected_version is not None and expected_version != current.version:
+        raise VersionConflict(current.version)
     
-    # Actualizar solo los campos proporcionados
-    update_data = task_update.model_dump(exclude_unset=True)
-    
-    for field, value in update_data.items():
-        setattr(db_task, field, value)
+    changed_at = datetime.utcnow()
+    stmt = (
+        update(models.Task)
+        .where(
+            models.Task.id == task_id,
+            models.Task.user_id == user_id,
+            models.Task.version == current.version
+        )
+        .values(**values, updated_at=changed_at, version=models.Task.version + 1)
+        .returning(models.Task)
+    )
+    db_task = db.execute(stmt).scalars().first()
+    if db_task is None:
+        latest = db.execute(_TASK_VERSION, params).one_or_none()
+        if latest is None:
+            return None
+        raise VersionConflict(latest.version)
     
-    db_task.updated_at = datetime.utcnow()
+    analytics.task_changed(
+        db, user_id, current.status, current.due_date,
+        db_task.status, db_task.due_date, changed_at
+    )
+    if db_task.status != current.status:
+        action = "completed" if db_task.status == "completed" else "reopened"
+    else:
+        action = "updated"
+    activity.record(db, task_id, user_id, action, values)
     db.commit()
     db.refresh(db_task)
     
     return db_task
 
 
-def mark_task_completed(db: Session, task_id: int, user_id: int) -> Optional[models.Task]:
+def update_task(
+    db: Session,
+    task_id: int,
+    user_id: int,
+    task_update: schemas.TaskUpdate,
+    expected_version: Optional[int] = None
+) -> Optional[models.Task]:
     """
-    Marca una tarea como completada.
-    Implementa TaskService.markCompleted() del diagrama (RF6).
+    Actualiza los datos de una tarea.
+    Implementa TaskService.updateTask() del diagrama (RF5).
     """
-    db_task = get_task_by_id(db, task_id, user_id)
-    
-    if not db_task:
-        return None
+    # Actualizar solo los campos proporcionados
+    update_data = task_update.model_dump(exclude_unset=True)
+    db_task = _update_task_row(db, task_id, user_id, update_data, expected_version)
     
-    db_task.status = "completed"
-    db_task.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(db_task)
+    if db_task and "title" in update_data:
+        typeahead.index.task_saved(user_id, db_task.id, db_task.title)
     
     return db_task
 
 
-def mark_task_pending(db: Session, task_id: int, user_id: int) -> Optional[models.Task]:
+def mark_task_completed(
+    db: Session, task_id: int, user_id: int, expected_version: Optional[int] = None
+) -> Optional[models.Task]:
+    """
+    Marca una tarea como completada.
+    Implementa TaskService.markCompleted() del diagrama (RF6).
+    """
+    return _update_task_row(db, task_id, user_id, {"status": "completed"}, expected_version)
+
+
+def mark_task_pending(
+    db: Session, task_id: int, user_id: int, expected_version: Optional[int] = None
+) -> Optional[models.Task]:
     """Revierte una tarea a estado pendiente (RF6)"""
-    db_task = get_task_by_id(db, task_id, user_id)
-    
-    if not db_task:
-        return None
-    
-    db_task.status = "pending"
-    db_task.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(db_task)
-    
-    return db_task
+    return _update_task_row(db, task_id, user_id, {"status": "pending"}, expected_version)
 
 
 def delete_task(db: Session, task_id: int, user_id: int) -> bool:
@@ -176,22 +390,29 @@ def delete_task(db: Session, task_id: int, user_id: int) -> bool:
     if not db_task:
         return False
     
+    analytics.task_deleted(db, user_id, db_task.status, db_task.due_date)
+    activity.record(db, task_id, user_id, "deleted")
     db.delete(db_task)
     db.commit()
+    typeahead.index.task_removed(user_id, task_id)
+    labels.index.task_removed(user_id, task_id)
     
     return True
 
 
+_TASK_STATISTICS = select(
+    func.count(models.Task.id),
+    func.sum(case((models.Task.status == "completed", 1), else_=0))
+).where(models.Task.user_id == bindparam("user_id"))
+
+
 def get_task_statistics(db: Session, user_id: int) -> dict:
     """
     Obtiene estadísticas de tareas del usuario (RF14).
     Retorna total, completadas y pendientes.
     """
-    total = db.query(models.Task).filter(models.Task.user_id == user_id).count()
-    completed = db.query(models.Task).filter(
-        models.Task.user_id == user_id,
-        models.Task.status == "completed"
-    ).count()
+    total, completed = db.execute(_TASK_STATISTICS, {"user_id": user_id}).one()
+    completed = completed or 0
     pending = total - completed
     
     return {
@@ -201,6 +422,89 @@ def get_task_statistics(db: Session, user_id: int) -> dict:
     }
 
 
+def get_task_history(
+    db: Session,
+    task_id: int,
+    user_id: int,
+    limit: int = 50,
+    before: Optional[Tuple[datetime, int]] = None
+) -> List[models.TaskActivity]:
+    """
+    Historial de una tarea, del cambio más reciente al más antiguo.
+    Paginación por keyset sobre ix_task_activity_task_ts: `before` es el
+    (ts, id) del último registro de la página anterior.
+    """
+    entry = models.TaskActivity
+    stmt = select(entry).where(entry.task_id == task_id, entry.user_id == user_id)
+    if before is not None:
+        stmt = stmt.where(tuple_(entry.ts, entry.id) < tuple_(*before))
+    
+    return list(db.execute(stmt.order_by(entry.ts.desc(), entry.id.desc()).limit(limit)).scalars())
+
+
+# ========== LABEL CRUD ==========
+
+def create_label(db: Session, label: schemas.LabelCreate, user_id: int) -> models.Label:
+    """Crea una etiqueta del usuario (el nombre es único por usuario)"""
+    db_label = models.Label(user_id=user_id, name=label.name, color=label.color)
+    db.add(db_label)
+    db.commit()
+    db.refresh(db_label)
+    labels.index.label_saved(user_id, db_label.id, db_label.name)
+    return db_label
+
+
+def get_labels(db: Session, user_id: int) -> List[models.Label]:
+    """Etiquetas del usuario ordenadas por nombre"""
+    stmt = select(models.Label).where(models.Label.user_id == user_id).order_by(models.Label.name)
+    return list(db.execute(stmt).scalars())
+
+
+def get_label_by_name(db: Session, user_id: int, name: str) -> Optional[models.Label]:
+    """Obtiene una etiqueta por nombre"""
+    stmt = select(models.Label).where(models.Label.user_id == user_id, models.Label.name == name)
+    return db.execute(stmt).scalars().first()
+
+
+def delete_label(db: Session, label_id: int, user_id: int) -> bool:
+    """Elimina una etiqueta; la relación Label.tasks (secondary) borra sus filas de task_labels"""
+    db_label = db.get(models.Label, label_id)
+    if not db_label or db_label.user_id != user_id:
+        return False
+    
+    db.delete(db_label)
+    db.commit()
+    labels.index.label_removed(user_id, label_id)
+    return True
+
+
+def set_task_labels(
+    db: Session, task_id: int, user_id: int, label_ids: Sequence[int]
+) -> Optional[models.Task]:
+    """
+    Reemplaza las etiquetas de una tarea.
+    Retorna None si la tarea no existe; ValueError si alguna etiqueta no es del usuario.
+    """
+    db_task = get_task_by_id(db, task_id, user_id, include=("labels",))
+    if not db_task:
+        return None
+    
+    wanted = set(label_ids)
+    found = db.execute(
+        select(models.Label).where(models.Label.user_id == user_id, models.Label.id.in_(wanted))
+    ).scalars().all() if wanted else []
+    if len(found) != len(wanted):
+        missing = sorted(wanted - {label.id for label in found})
+        raise ValueError(f"Etiquetas inexistentes: {missing}")
+    
+    db_task.labels = sorted(found, key=lambda label: label.name)
+    activity.record(db, task_id, user_id, "updated", {"labels": [label.name for label in db_task.labels]})
+    db.commit()
+    db.refresh(db_task)
+    labels.index.task_labels_set(user_id, task_id, wanted)
+    return db_task
+
+
 # ========== REMINDER CRUD ==========
 
 def create_reminder(db: Session, reminder: schemas.ReminderCreate, user_id: int) -> Optional[models.Reminder]:
@@ -216,6 +520,7 @@ def create_reminder(db: Session, reminder: schemas.ReminderCreate, user_id: int)
     
     db_reminder = models.Reminder(
         task_id=reminder.task_id,
+        user_id=user_id,
         remind_at=reminder.remind_at
     )
     db.add(db_reminder)
@@ -225,11 +530,31 @@ def create_reminder(db: Session, reminder: schemas.ReminderCreate, user_id: int)
     return db_reminder
 
 
-def get_reminders_by_user(db: Session, user_id: int) -> List[models.Reminder]:
-    """Obtiene todos los recordatorios de un usuario"""
-    return db.query(models.Reminder).join(models.Task).filter(
-        models.Task.user_id == user_id
-    ).all()
+def get_reminders_by_user(
+    db: Session,
+    user_id: int,
+    remind_from: Optional[datetime] = None,
+    remind_to: Optional[datetime] = None,
+    limit: Optional[int] = None
+) -> List[models.Reminder]:
+    """
+    Obtiene los recordatorios de un usuario ordenados por fecha.
+    Opcionalmente solo los de la ventana [remind_from, remind_to).
+    Rango sobre ix_reminders_user_remind_at: sin JOIN a tasks ni ordenamiento aparte.
+    """
+    query = db.query(models.Reminder).filter(
+        models.Reminder.user_id == user_id
+    )
+    if remind_from:
+        query = query.filter(models.Reminder.remind_at >= remind_from)
+    if remind_to:
+        query = query.filter(models.Reminder.remind_at < remind_to)
+    
+    query = query.order_by(models.Reminder.remind_at.asc())
+    if limit:
+        query = query.limit(limit)
+    
+    return query.all()
 
 
 # ========== NOTIFICATION CRUD ==========
@@ -250,6 +575,8 @@ def create_notification(
         type=notification_type
     )
     db.add(db_notification)
+    db.flush()
+    _add_unread(db, user_id, 1)
     db.commit()
     db.refresh(db_notification)
     
@@ -261,3 +588,101 @@ def get_notifications_by_user(db: Session, user_id: int, limit: int = 50) -> Lis
     return db.query(models.Notification).filter(
         models.Notification.user_id == user_id
     ).order_by(models.Notification.sent_at.desc()).limit(limit).all()
+
+
+def _add_unread(db: Session, user_id: int, delta: int):
+    """
+    Suma delta al contador de no leídas del usuario (upsert; sin commit).
+    El cambio en notifications ya debe estar en la sesión (flush): si el
+    usuario aún no tiene fila de contador se siembra con COUNT(*) de sus no
+    leídas, que ya lo incluye. El contador nunca queda por debajo de 0.
+    """
+    table = models.NotificationCounter
+    notification = models.Notification
+    unread_now = select(func.count()).select_from(notification).where(
+        notification.user_id == user_id,
+        notification.is_read.is_(False)
+    ).scalar_subquery()
+    insert_for = postgresql.insert if db.get_bind(table).dialect.name == "postgresql" else sqlite.insert
+    stmt = insert_for(table).values(user_id=user_id, unread=unread_now)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[table.user_id],
+        set_={"unread": case((table.unread + delta < 0, 0), else_=table.unread + delta)}
+    ))
+
+
+_UNREAD_COUNT = select(models.NotificationCounter.unread).where(
+    models.NotificationCounter.user_id == bindparam("user_id")
+)
+
+
+def get_unread_count(db: Session, user_id: int) -> int:
+    """Notificaciones no leídas del usuario (lectura por clave primaria del contador)"""
+    return db.execute(_UNREAD_COUNT, {"user_id": user_id}).scalar() or 0
+
+
+def mark_notifications_read(
+    db: Session,
+    user_id: int,
+    up_to_id: Optional[int] = None,
+    before: Optional[datetime] = None
+) -> int:
+    """
+    Marca como leídas las no leídas del usuario con id <= up_to_id y/o
+    sent_at <= before (todas si no se indica ninguno) en un solo UPDATE,
+    y descuenta las filas afectadas del contador. Retorna cuántas marcó.
+    """
+    notification = models.Notification
+    stmt = update(notification).where(
+        notification.user_id == user_id,
+        notification.is_read.is_(False)
+    )
+    if up_to_id is not None:
+        stmt = stmt.where(notification.id <= up_to_id)
+    if before is not None:
+        stmt = stmt.where(notification.sent_at <= before)
+    
+    marked = db.execute(
+        stmt.values(is_read=True, read_at=datetime.utcnow()).execution_options(synchronize_session=False)
+    ).rowcount
+    if marked:
+        _add_unread(db, user_id, -marked)
+    db.commit()
+    
+    return marked
+
+
+# ========== DASHBOARD ==========
+
+# Total, completadas y vencidas en una sola pasada por las tareas del usuario
+_DASHBOARD_COUNTS = select(
+    func.count(models.Task.id),
+    func.sum(case((models.Task.status == "completed", 1), else_=0)),
+    func.sum(case(
+        ((models.Task.status == "pending") & (models.Task.due_date < bindparam("now")), 1),
+        else_=0
+    ))
+).where(models.Task.user_id == bindparam("user_id"))
+
+
+def get_dashboard(db: Session, user_id: int, now: datetime, limit: int = 5) -> dict:
+    """
+    Datos de la pantalla de inicio con una sola sesión: contadores (una
+    sentencia), próximas tareas pendientes, próximos recordatorios,
+    últimas notificaciones (`limit` de cada una) y no leídas.
+    """
+    total, completed, overdue = db.execute(_DASHBOARD_COUNTS, {"user_id": user_id, "now": now}).one()
+    completed = completed or 0
+    
+    return {
+        "stats": {
+            "total": total,
+            "pending": total - completed,
+            "completed": completed,
+            "overdue": overdue or 0
+        },
+        "upcoming": get_tasks_due_between(db, user_id, now, None, limit=limit),
+        "reminders": get_reminders_by_user(db, user_id, remind_from=now, limit=limit),
+        "notifications": get_notifications_by_user(db, user_id, limit),
+        "unread_notifications": get_unread_count(db, user_id)
+    }
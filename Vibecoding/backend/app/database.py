@@ -3,28 +3,97 @@ database.py
 -----------
 Configuración de la base de datos usando SQLAlchemy.
 Implementa el patrón de conexión con SQLite para persistencia.
+Opcionalmente reparte los datos por usuario en varios shards (ver sharding.py).
 """
 
+import functools
+import os
+
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from . import sharding, slow_queries, tracing
 
 # URL de conexión a SQLite (archivo local)
 DATABASE_URL = "sqlite:///./quicktask.db"
 
-# Engine: gestiona la conexión con la BD
-# check_same_thread=False es necesario para SQLite con FastAPI (multi-threading)
-engine = create_engine(
-    DATABASE_URL, 
-    connect_args={"check_same_thread": False}
-)
+# Sharding por usuario: 0 = desactivado (una sola BD)
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0"))
+SHARD_URL_TEMPLATE = os.getenv("SHARD_URL_TEMPLATE", "sqlite:///./quicktask_shard_{shard}.db")
 
-# SessionLocal: factory para crear sesiones de BD
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Réplica de solo lectura para los GET (vacío = todo va al primario)
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL", "")
+
+
+def create_db_engine(url: str):
+    """Crea un engine; check_same_thread=False es necesario para SQLite con FastAPI"""
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    engine = create_engine(url, connect_args=connect_args)
+    if slow_queries.THRESHOLD_MS > 0:
+        slow_queries.instrument_engine(engine)
+    if tracing.TRACING_ENABLED:
+        tracing.instrument_engine(engine)
+    return engine
+
+
+# Engine: gestiona la conexión con la BD (con sharding, el directorio de usuarios)
+engine = create_db_engine(DATABASE_URL)
 
 # Base: clase base para los modelos ORM
 Base = declarative_base()
 
+# SessionLocal: factory para crear sesiones de BD
+if SHARD_COUNT > 0:
+    router = sharding.ShardRouter(
+        engine,
+        [create_db_engine(SHARD_URL_TEMPLATE.format(shard=i)) for i in range(SHARD_COUNT)],
+        Base.metadata,
+    )
+    SessionLocal = sessionmaker(
+        class_=sharding.RoutingSession, router=router, autocommit=False, autoflush=False
+    )
+else:
+    router = None
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# ReplicaSessionLocal: sesiones de lectura contra la réplica (ver replicas.py).
+# Con sharding cada shard sería su propio primario; las lecturas quedan en él.
+if REPLICA_DATABASE_URL and router is None:
+    replica_engine = create_db_engine(REPLICA_DATABASE_URL)
+    ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+else:
+    replica_engine = None
+    ReplicaSessionLocal = None
+
+
+def init_db():
+    """Crea las tablas (en el directorio y en cada shard si hay sharding)"""
+    if router is not None:
+        router.create_all()
+    else:
+        Base.metadata.create_all(bind=engine)
+
+
+def _shard_session(shard: int) -> Session:
+    db = SessionLocal()
+    sharding.route_to_shard(db, shard)
+    return db
+
+
+def shard_session_factories():
+    """Una factory de sesiones por shard (o solo SessionLocal sin sharding)"""
+    if router is None:
+        return [SessionLocal]
+    return [functools.partial(_shard_session, i) for i in range(len(router.shards))]
+
+
+def clone_session(db: Session) -> Session:
+    """Nueva sesión con el mismo destino que db (para trabajo en segundo plano)"""
+    if isinstance(db, sharding.RoutingSession):
+        return sharding.RoutingSession(router=db.router, autoflush=False, info=dict(db.info))
+    return Session(bind=db.get_bind(), autoflush=False)
+
 
 def get_db():
     """
@@ -0,0 +1,32 @@
+"""
+debug.py
+--------
+Protección de los endpoints de diagnóstico (/api/_debug/...).
+
+Solo existen si DEBUG_ADMIN_TOKEN está configurado; la petición debe
+traer ese valor en el header X-Debug-Token.
+"""
+
+import hmac
+import os
+from typing import Optional
+
+from fastapi import Header, HTTPException, status
+
+# Vacío = endpoints de diagnóstico desactivados (responden 404)
+DEBUG_ADMIN_TOKEN = os.getenv("DEBUG_ADMIN_TOKEN", "")
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """Compara en tiempo constante con DEBUG_ADMIN_TOKEN (en bytes: admite headers no ASCII)"""
+    return bool(DEBUG_ADMIN_TOKEN) and token is not None and hmac.compare_digest(
+        token.encode("utf-8"), DEBUG_ADMIN_TOKEN.encode("utf-8")
+    )
+
+
+def require_debug_token(x_debug_token: Optional[str] = Header(None)):
+    """Dependency de los endpoints /api/_debug"""
+    if not DEBUG_ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not is_admin_token(x_debug_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Token de diagnóstico inválido")
@@ -0,0 +1,548 @@
+"""
+delivery.py
+-----------
+Pipeline de entrega de notificaciones (patrón outbox).
+Un worker reclama por lotes las notificaciones pendientes y las envía por
+email (pool de conexiones SMTP persistentes) o push (HTTP con pool de conexiones).
+Los fallos se reintentan con backoff exponencial hasta pasar al estado 'dead'.
+"""
+
+import http.client
+import json
+import logging
+import os
+import queue
+import smtplib
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Callable, Dict, List, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+from sqlalchemy import select, update, and_, or_
+from sqlalchemy.orm import Session
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# Configuración (variables de entorno)
+WORKER_ENABLED = os.getenv("NOTIFICATION_WORKER_ENABLED", "false").lower() == "true"
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "25"))
+SMTP_USER = os.getenv("SMTP_USER")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "false").lower() == "true"
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+SMTP_FROM = os.getenv("SMTP_FROM", "no-reply@quicktask.local")
+PUSH_GATEWAY_URL = os.getenv("PUSH_GATEWAY_URL")
+PUSH_POOL_SIZE = int(os.getenv("PUSH_POOL_SIZE", "4"))
+
+
+class DeliveryError(Exception):
+    """Error de entrega de una notificación (se reintenta según el backoff)"""
+
+
+class OutboxItem(NamedTuple):
+    """Notificación reclamada por el worker, lista para enviar"""
+    id: int
+    user_id: int
+    email: str
+    type: str
+    message: str
+    attempts: int
+    claim_token: str
+
+
+# ========== EMAIL (SMTP) ==========
+
+class _SMTPLease:
+    """Conexión SMTP prestada por el pool durante el envío de un lote"""
+
+    def __init__(self, pool: "SMTPConnectionPool", smtp: smtplib.SMTP):
+        self.pool = pool
+        self.smtp = smtp
+
+    def reconnect(self):
+        """Descarta la conexión actual (rota) y abre una nueva"""
+        self.pool._close(self.smtp)
+        self.smtp = None
+        self.smtp = self.pool._connect()
+
+
+class SMTPConnectionPool:
+    """
+    Pool de conexiones SMTP persistentes.
+    Evita pagar connect + EHLO + STARTTLS + AUTH por cada mensaje:
+    las conexiones se reutilizan entre lotes y se validan con NOOP si llevan inactivas.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 25,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        starttls: bool = False,
+        size: int = 2,
+        timeout: float = 10.0,
+        max_idle: float = 30.0
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.connections_opened = 0
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        smtp.ehlo()
+        if self.starttls:
+            smtp.starttls()
+            smtp.ehlo()
+        if self.username:
+            smtp.login(self.username, self.password or "")
+        self.connections_opened += 1
+        return smtp
+
+    def _close(self, smtp: Optional[smtplib.SMTP]):
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+    def _checkout(self) -> smtplib.SMTP:
+        while True:
+            try:
+                smtp, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - last_used > self.max_idle and not self._is_alive(smtp):
+                self._close(smtp)
+                continue
+            return smtp
+
+    @staticmethod
+    def _is_alive(smtp: smtplib.SMTP) -> bool:
+        try:
+            return smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    @contextmanager
+    def connection(self):
+        """Presta una conexión del pool; se devuelve al terminar si sigue sana"""
+        self._slots.acquire()
+        lease = None
+        try:
+            lease = _SMTPLease(self, self._checkout())
+            yield lease
+        except (smtplib.SMTPServerDisconnected, OSError):
+            if lease is not None:
+                self._close(lease.smtp)
+                lease.smtp = None
+            raise
+        finally:
+            if lease is not None and lease.smtp is not None:
+                self._idle.put((lease.smtp, time.monotonic()))
+            self._slots.release()
+
+    def close_all(self):
+        """Cierra todas las conexiones inactivas del pool"""
+        while True:
+            try:
+                smtp, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(smtp)
+
+
+class SMTPEmailSender:
+    """
+    Sender de notificaciones tipo 'email'.
+    Envía todo el lote de forma consecutiva sobre una misma sesión SMTP del pool.
+    """
+
+    def __init__(self, pool: SMTPConnectionPool, from_addr: str = SMTP_FROM, subject: str = "QuickTask"):
+        self.pool = pool
+        self.from_addr = from_addr
+        self.subject = subject
+
+    def _build_message(self, item: OutboxItem) -> EmailMessage:
+        if not item.email:
+            raise DeliveryError(f"El usuario {item.user_id} no tiene email")
+        message = EmailMessage()
+        message["From"] = self.from_addr
+        message["To"] = item.email
+        message["Subject"] = self.subject
+        message.set_content(item.message)
+        return message
+
+    def _send_one(self, lease: _SMTPLease, item: OutboxItem) -> Optional[Exception]:
+        # Un mensaje que no se puede construir falla solo su item, no el lote
+        try:
+            message = self._build_message(item)
+        except (DeliveryError, ValueError, TypeError) as exc:
+            return exc
+        for attempt in (0, 1):
+            try:
+                lease.smtp.send_message(message)
+                return None
+            except (smtplib.SMTPServerDisconnected, OSError) as exc:
+                # Conexión caída a mitad de lote: reconectar una vez y reintentar
+                if attempt:
+                    return exc
+                try:
+                    lease.reconnect()
+                except (smtplib.SMTPException, OSError) as connect_exc:
+                    return connect_exc
+            except smtplib.SMTPException as exc:
+                return exc
+        return None
+
+    def send_batch(self, items: List[OutboxItem]) -> List[Optional[Exception]]:
+        """Retorna, por cada item, None si se envió o la excepción del fallo"""
+        with self.pool.connection() as lease:
+            return [self._send_one(lease, item) for item in items]
+
+
+# ========== PUSH (HTTP) ==========
+
+class HTTPConnectionPool:
+    """Pool de conexiones HTTP keep-alive hacia un único host"""
+
+    def __init__(self, url: str, size: int = 4, timeout: float = 5.0):
+        parts = urlsplit(url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path or "/"
+        self.timeout = timeout
+        self.connections_opened = 0
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _acquire(self) -> http.client.HTTPConnection:
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        connection_class = (
+            http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        )
+        self.connections_opened += 1
+        return connection_class(self.host, self.port, timeout=self.timeout)
+
+    def _release(self, conn: Optional[http.client.HTTPConnection]):
+        if conn is not None:
+            self._idle.put(conn)
+        self._slots.release()
+
+    def request(self, method: str, body: bytes, headers: Dict[str, str]):
+        """Envía una petición reutilizando conexiones; reintenta una vez si la conexión estaba cerrada"""
+        for attempt in (0, 1):
+            conn = self._acquire()
+            try:
+                conn.request(method, self.path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                self._release(None)
+                if attempt:
+                    raise
+                continue
+            self._release(None if response.will_close else conn)
+            return response.status, data
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class HTTPPushSender:
+    """
+    Sender de notificaciones tipo 'push' contra un gateway HTTP.
+    Cualquier objeto con send_batch(items) puede sustituirlo (p. ej. FCM/APNs).
+    """
+
+    def __init__(self, pool: HTTPConnectionPool):
+        self.pool = pool
+
+    def _send_one(self, item: OutboxItem) -> Optional[Exception]:
+        body = json.dumps({
+            "notification_id": item.id,
+            "user_id": item.user_id,
+            "message": item.message
+        }).encode("utf-8")
+        try:
+            status_code, _ = self.pool.request(
+                "POST", body, {"Content-Type": "application/json"}
+            )
+        except (http.client.HTTPException, OSError) as exc:
+            return exc
+        if 200 <= status_code < 300:
+            return None
+        return DeliveryError(f"Gateway push respondió HTTP {status_code}")
+
+    def send_batch(self, items: List[OutboxItem]) -> List[Optional[Exception]]:
+        return [self._send_one(item) for item in items]
+
+
+# ========== WORKER ==========
+
+class OutboxWorker:
+    """
+    Worker del outbox de notificaciones.
+
+    Reclama lotes con un UPDATE condicional (status + claim_token), envía cada
+    lote con el sender de su tipo y registra el resultado:
+    - éxito -> 'sent'
+    - fallo -> 'pending' con next_attempt_at = ahora + backoff exponencial
+    - fallo tras max_attempts -> 'dead' (dead-letter)
+    Las reclamaciones abandonadas (worker caído) se recuperan tras lease_seconds.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        senders: Dict[str, object],
+        batch_size: int = 100,
+        max_attempts: int = 5,
+        backoff_base: float = 30.0,
+        backoff_max: float = 3600.0,
+        lease_seconds: float = 300.0,
+        poll_interval: float = 1.0
+    ):
+        self.session_factory = session_factory
+        self.senders = senders
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def backoff(self, attempts: int) -> timedelta:
+        """Espera antes del intento número attempts + 1"""
+        seconds = min(self.backoff_base * (2 ** (attempts - 1)), self.backoff_max)
+        return timedelta(seconds=seconds)
+
+    def _claimable(self, now: datetime):
+        notification = models.Notification
+        return or_(
+            and_(notification.status == "pending", notification.next_attempt_at <= now),
+            and_(
+                notification.status == "sending",
+                notification.claimed_at < now - timedelta(seconds=self.lease_seconds)
+            )
+        )
+
+    def claim_batch(self, db: Session) -> List[OutboxItem]:
+        """Reclama hasta batch_size notificaciones y las retorna listas para enviar"""
+        notification = models.Notification
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+
+        candidates = (
+            select(notification.id)
+            .where(self._claimable(now))
+            .order_by(notification.next_attempt_at)
+            .limit(self.batch_size)
+        )
+        # La condición se repite fuera de la subconsulta para que dos workers
+        # concurrentes nunca reclamen la misma fila
+        db.execute(
+            update(notification)
+            .where(notification.id.in_(candidates), self._claimable(now))
+            .values(status="sending", claim_token=token, claimed_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+        rows = db.execute(
+            select(
+                notification.id,
+                notification.user_id,
+                notification.type,
+                notification.message,
+                notification.attempts
+            )
+            .where(notification.claim_token == token)
+            .order_by(notification.id)
+        ).all()
+        # Los emails se consultan aparte: con sharding los usuarios viven en el directorio
+        user_ids = {row.user_id for row in rows}
+        emails = dict(db.execute(
+            select(models.User.id, models.User.email).where(models.User.id.in_(user_ids))
+        ).all()) if user_ids else {}
+        return [
+            OutboxItem(row.id, row.user_id, emails.get(row.user_id), row.type, row.message, row.attempts, token)
+            for row in rows
+        ]
+
+    def _dispatch(self, items: List[OutboxItem]) -> Dict[int, Optional[Exception]]:
+        results: Dict[int, Optional[Exception]] = {}
+        by_type: Dict[str, List[OutboxItem]] = {}
+        for item in items:
+            by_type.setdefault(item.type, []).append(item)
+
+        for notification_type, group in by_type.items():
+            sender = self.senders.get(notification_type)
+            if sender is None:
+                error = DeliveryError(f"No hay sender configurado para '{notification_type}'")
+                results.update({item.id: error for item in group})
+                continue
+            try:
+                outcomes = sender.send_batch(group)
+            except Exception as exc:  # el lote completo falla (p. ej. SMTP caído)
+                outcomes = [exc] * len(group)
+            results.update({item.id: outcome for item, outcome in zip(group, outcomes)})
+
+        return results
+
+    def _record_results(self, db: Session, items: List[OutboxItem], results: Dict[int, Optional[Exception]]):
+        """
+        Guarda el resultado de cada envío. Solo escribe filas que aún tienen
+        el claim_token del lote: si el lease venció y otro worker las
+        reclamó, su estado no se pisa.
+        """
+        notification = models.Notification
+        now = datetime.utcnow()
+
+        sent_ids = [item.id for item in items if results.get(item.id) is None]
+        if sent_ids:
+            db.execute(
+                update(notification)
+                .where(notification.id.in_(sent_ids), notification.claim_token == items[0].claim_token)
+                .values(status="sent", delivered_at=now, claim_token=None, last_error=None)
+                .execution_options(synchronize_session=False)
+            )
+
+        for item in items:
+            error = results.get(item.id)
+            if error is None:
+                continue
+            attempts = item.attempts + 1
+            values = {
+                "attempts": attempts,
+                "claim_token": None,
+                "last_error": f"{type(error).__name__}: {error}"[:500]
+            }
+            if attempts >= self.max_attempts:
+                values["status"] = "dead"
+                logger.warning("Notificación %s movida a dead-letter: %s", item.id, values["last_error"])
+            else:
+                values["status"] = "pending"
+                values["next_attempt_at"] = now + self.backoff(attempts)
+            db.execute(
+                update(notification)
+                .where(notification.id == item.id, notification.claim_token == item.claim_token)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+
+        db.commit()
+
+    def run_once(self) -> int:
+        """Procesa un lote. Retorna cuántas notificaciones se procesaron"""
+        db = self.session_factory()
+        try:
+            items = self.claim_batch(db)
+            if not items:
+                return 0
+            results = self._dispatch(items)
+            self._record_results(db, items, results)
+            return len(items)
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                processed = self.run_once()
+            except Exception:
+                logger.exception("Error en el worker de notificaciones")
+                processed = 0
+            # Si el lote vino lleno probablemente hay más trabajo: no esperar
+            if processed < self.batch_size:
+                self._stop.wait(self.poll_interval)
+
+    def start(self):
+        """Arranca el worker en un hilo de fondo"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="notification-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Detiene el worker esperando a que termine el lote en curso"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+# ========== CONFIGURACIÓN DESDE ENTORNO ==========
+
+_workers: List[OutboxWorker] = []
+
+
+def build_senders_from_env() -> Dict[str, object]:
+    """Construye los senders configurados en variables de entorno"""
+    senders: Dict[str, object] = {
+        "email": SMTPEmailSender(SMTPConnectionPool(
+            SMTP_HOST,
+            SMTP_PORT,
+            username=SMTP_USER,
+            password=SMTP_PASSWORD,
+            starttls=SMTP_STARTTLS,
+            size=SMTP_POOL_SIZE
+        ))
+    }
+    if PUSH_GATEWAY_URL:
+        senders["push"] = HTTPPushSender(HTTPConnectionPool(PUSH_GATEWAY_URL, size=PUSH_POOL_SIZE))
+    return senders
+
+
+def start_workers(session_factories: List[Callable[[], Session]]) -> List[OutboxWorker]:
+    """
+    Arranca los workers globales del outbox (usado en el startup de la app).
+    Con sharding hay uno por shard; todos comparten los pools de conexiones.
+    """
+    if not _workers:
+        senders = build_senders_from_env()
+        _workers.extend(OutboxWorker(factory, senders) for factory in session_factories)
+    for worker in _workers:
+        worker.start()
+    return list(_workers)
+
+
+def stop_workers():
+    """Detiene los workers globales y cierra los pools de conexiones"""
+    if not _workers:
+        return
+    for worker in _workers:
+        worker.stop()
+    for sender in _workers[0].senders.values():
+        pool = getattr(sender, "pool", None)
+        if pool is not None:
+            pool.close_all()
+    _workers.clear()
@@ -0,0 +1,83 @@
+"""
+export.py
+---------
+Serialización en streaming para la exportación de tareas (NDJSON / CSV).
+Los generadores consumen filas a medida que llegan del cursor y emiten
+bloques de bytes, de modo que la memoria no crece con el número de tareas.
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator
+
+# Columnas exportadas (en orden)
+EXPORT_FIELDS = ("id", "title", "description", "status", "due_date", "created_at", "updated_at")
+
+# Tamaño aproximado de cada bloque emitido al cliente
+CHUNK_SIZE = 64 * 1024
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _format_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _buffered(lines: Iterable[str]) -> Iterator[bytes]:
+    """Agrupa líneas en bloques de ~CHUNK_SIZE bytes"""
+    buffer = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield "".join(buffer).encode("utf-8")
+            buffer.clear()
+            size = 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def _ndjson_lines(rows: Iterable) -> Iterator[str]:
+    for row in rows:
+        record = {field: _format_value(value) for field, value in zip(EXPORT_FIELDS, row)}
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def _csv_lines(rows: Iterable) -> Iterator[str]:
+    # Un único StringIO reutilizado para formatear cada fila
+    out = io.StringIO()
+    writer = csv.writer(out)
+
+    writer.writerow(EXPORT_FIELDS)
+    yield out.getvalue()
+
+    for row in rows:
+        out.seek(0)
+        out.truncate()
+        writer.writerow([_format_value(value) for value in row])
+        yield out.getvalue()
+
+
+def stream_tasks(rows: Iterable, export_format: str) -> Iterator[bytes]:
+    """Serializa filas (en el orden de EXPORT_FIELDS) al formato pedido"""
+    lines = _ndjson_lines(rows) if export_format == "ndjson" else _csv_lines(rows)
+    return _buffered(lines)
+
+
+def gzip_stream(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Comprime al vuelo un flujo de bytes en formato gzip"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,272 @@
+"""
+group_commit.py
+---------------
+Group commit de escrituras pequeñas y concurrentes.
+
+Cada alta o cambio de estado hace su propio COMMIT, y con carga el fsync
+domina. Con GROUP_COMMIT_ENABLED=true las mutaciones de crud se envían a
+un hilo escritor por base de datos que junta las que llegan dentro de una
+ventana corta (GROUP_COMMIT_WINDOW_MS, o GROUP_COMMIT_MAX_BATCH operaciones)
+y las confirma en una sola transacción de SQLite.
+
+- Cada operación corre en su propio SAVEPOINT: si falla, solo ella se
+  deshace y su llamador recibe la excepción.
+- Si el COMMIT del grupo falla, todos los llamadores del grupo reciben el error.
+- La durabilidad se controla con GROUP_COMMIT_SYNCHRONOUS (PRAGMA synchronous);
+  solo afecta a los COMMIT de grupo: la conexión vuelve al pool con su valor previo.
+"""
+
+import contextvars
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import labels, sharding, typeahead
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("GROUP_COMMIT_ENABLED", "false").lower() == "true"
+WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "2"))
+MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "64"))
+# FULL / NORMAL / OFF; vacío = no tocar el valor de la conexión
+SYNCHRONOUS = os.getenv("GROUP_COMMIT_SYNCHRONOUS", "").upper() or None
+
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+class _Operation(NamedTuple):
+    fn: Callable[..., Any]
+    args: tuple
+    kwargs: dict
+    future: Future
+    user_id: Optional[int] = None
+    # Contexto de la petición (span activo de tracing, etc.)
+    context: Optional[contextvars.Context] = None
+
+
+class _GroupCommitMixin:
+    """
+    Dentro de un grupo, commit() de crud solo hace flush: el COMMIT real
+    lo emite el escritor una vez por grupo.
+    """
+
+    in_group = False
+
+    def commit(self):
+        if self.in_group:
+            self.flush()
+        else:
+            super().commit()
+
+
+class GroupSession(_GroupCommitMixin, Session):
+    pass
+
+
+class GroupRoutingSession(_GroupCommitMixin, sharding.RoutingSession):
+    pass
+
+
+def _restore_synchronous(dbapi_connection, connection_record):
+    """Listener de checkin: deja la conexión con el synchronous que tenía antes del grupo"""
+    previous = connection_record.info.pop("group_commit_synchronous", None)
+    if previous is not None and dbapi_connection is not None:
+        dbapi_connection.execute(f"PRAGMA synchronous={previous}")
+
+
+class GroupCommitWriter:
+    """Hilo escritor de una base de datos (o de un shard)"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        window: float = WINDOW_MS / 1000,
+        max_batch: int = MAX_BATCH,
+        synchronous: Optional[str] = SYNCHRONOUS
+    ):
+        if synchronous is not None and synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"PRAGMA synchronous inválido: {synchronous}")
+        self.session_factory = session_factory
+        self.window = window
+        self.max_batch = max_batch
+        self.synchronous = synchronous
+        self.batches = 0
+        self.operations = 0
+        self._queue: "queue.SimpleQueue[Optional[_Operation]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable[..., Any], *args, user_id: Optional[int] = None, **kwargs) -> Future:
+        """
+        Encola fn(session, *args, **kwargs); el Future se resuelve tras el COMMIT del grupo.
+        user_id identifica al usuario de la petición original (session.info['user_id']).
+        """
+        future: Future = Future()
+        self._queue.put(_Operation(fn, args, kwargs, future, user_id, contextvars.copy_context()))
+        return future
+
+    def stop(self, timeout: float = 5.0):
+        """Procesa lo pendiente y detiene el hilo"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _collect(self, first: _Operation) -> List[Optional[_Operation]]:
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                operation = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(operation)
+            if operation is None:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            stopping = batch[-1] is None
+            self._commit_batch([operation for operation in batch if operation is not None])
+            if stopping:
+                return
+
+    def _use_synchronous(self, connection):
+        """
+        Fija PRAGMA synchronous para el COMMIT del grupo. Es un valor por
+        conexión y la conexión vuelve al pool compartido: el valor anterior
+        se restaura al devolverla (ver _restore_synchronous).
+        """
+        if not event.contains(connection.engine, "checkin", _restore_synchronous):
+            event.listen(connection.engine, "checkin", _restore_synchronous)
+        dbapi_connection = connection.connection.dbapi_connection
+        connection.connection.info.setdefault(
+            "group_commit_synchronous", dbapi_connection.execute("PRAGMA synchronous").fetchone()[0]
+        )
+        dbapi_connection.execute(f"PRAGMA synchronous={self.synchronous}")
+
+    def _commit_batch(self, batch: List[_Operation]):
+        session = self.session_factory()
+        outcomes = []
+        try:
+            if session.get_bind().dialect.name == "sqlite":
+                connection = session.connection()
+                if self.synchronous:
+                    self._use_synchronous(connection)
+                # pysqlite no abre transacción antes de un SAVEPOINT: sin BEGIN
+                # explícito cada RELEASE confirmaría su operación por separado
+                connection.exec_driver_sql("BEGIN IMMEDIATE")
+            session.in_group = True
+            for operation in batch:
+                if not operation.future.set_running_or_notify_cancel():
+                    continue
+                session.info["user_id"] = operation.user_id
+                try:
+                    with session.begin_nested():
+                        if operation.context is not None:
+                            result = operation.context.run(operation.fn, session, *operation.args, **operation.kwargs)
+                        else:
+                            result = operation.fn(session, *operation.args, **operation.kwargs)
+                    outcomes.append((operation, result, None))
+                except Exception as exc:
+                    outcomes.append((operation, None, exc))
+            session.in_group = False
+            session.commit()
+        except Exception as exc:
+            logger.exception("Falló el COMMIT de un grupo de %s operaciones", len(batch))
+            session.rollback()
+            session.close()
+            for operation in batch:
+                # Las operaciones ya actualizaron cachés en memoria que ahora no son válidas
+                if operation.user_id is not None:
+                    typeahead.index.invalidate(operation.user_id)
+                    labels.index.invalidate(operation.user_id)
+                if not operation.future.done():
+                    operation.future.set_exception(exc)
+            return
+
+        # Los objetos se entregan desconectados y con sus atributos ya cargados
+        session.expunge_all()
+        session.close()
+        self.batches += 1
+        self.operations += len(outcomes)
+        for operation, result, error in outcomes:
+            if error is not None:
+                operation.future.set_exception(error)
+            else:
+                operation.future.set_result(result)
+
+
+# ========== API PARA LOS ENDPOINTS ==========
+
+_writers: Dict[tuple, GroupCommitWriter] = {}
+_writers_lock = threading.Lock()
+
+SESSION_OPTIONS = {"autoflush": False, "expire_on_commit": False}
+
+
+def session_target(db: Session) -> Tuple[tuple, Callable[[], Session]]:
+    """
+    Base de datos a la que apunta la sesión (uno por shard): una clave
+    estable y una fábrica de sesiones propias sobre ella, para escritores
+    en segundo plano.
+    """
+    if isinstance(db, sharding.RoutingSession):
+        shard = db.info.get("shard")
+        if shard is None:
+            shard = db.router.shard_for_user(db.info["user_id"])
+        router = db.router
+        key = ("shard", id(router), shard)
+
+        def factory():
+            return GroupRoutingSession(router=router, info={"shard": shard}, **SESSION_OPTIONS)
+    else:
+        bind = db.get_bind()
+        key = ("bind", id(bind))
+
+        def factory():
+            return GroupSession(bind=bind, **SESSION_OPTIONS)
+
+    return key, factory
+
+
+def writer_for(db: Session) -> GroupCommitWriter:
+    """Escritor de la base de datos a la que apunta la sesión (uno por shard)"""
+    key, factory = session_target(db)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = GroupCommitWriter(factory)
+        return writer
+
+
+def run(db: Session, fn: Callable[..., Any], *args, **kwargs):
+    """
+    Ejecuta una mutación de crud: fn(db, *args, **kwargs).
+    Con group commit habilitado se ejecuta en el escritor y se espera su grupo.
+    """
+    if not ENABLED:
+        return fn(db, *args, **kwargs)
+    return writer_for(db).submit(fn, *args, user_id=db.info.get("user_id"), **kwargs).result()
+
+
+def shutdown():
+    """Detiene los escritores (usado en el apagado de la app)"""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.stop()
@@ -0,0 +1,277 @@
+"""
+idempotency.py
+--------------
+Soporte del header Idempotency-Key en los POST de creación.
+
+Los reintentos de redes móviles inestables duplicaban tareas, recordatorios
+y notificaciones. Con Idempotency-Key la primera respuesta de cada
+(usuario, clave) se guarda en un store con TTL y los reintentos la
+reciben tal cual, sin ejecutar el endpoint ni tocar la BD.
+
+- Memoria (por defecto) o Redis (IDEMPOTENCY_REDIS_URL) como store.
+- Duplicados concurrentes esperan a que termine la primera petición; su
+  marca "en curso" se renueva mientras la original corre, así que un
+  reintento nunca ejecuta la escritura dos veces por lenta que sea.
+- Reusar la clave con otro cuerpo retorna 422.
+- La respuesta se repite en el formato (JSON / MessagePack) que negocia el
+  reintento, no en el que negoció la primera petición.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import msgpack
+
+from . import auth, negotiation
+
+IDEMPOTENT_PATHS = frozenset({"/api/tasks", "/api/reminders", "/api/notifications"})
+
+TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+# Tiempo máximo que un duplicado espera a la petición original
+WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+REDIS_URL = os.getenv("IDEMPOTENCY_REDIS_URL", "")
+
+MAX_KEY_LENGTH = 255
+IN_FLIGHT = "in_flight"
+COMPLETED = "completed"
+
+
+# ========== STORES ==========
+
+class MemoryStore:
+    """Store en memoria con TTL y tamaño acotado (un solo proceso)"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _live(self, key: str) -> Optional[bytes]:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        if item[0] <= time.monotonic():
+            del self._items[key]
+            return None
+        return item[1]
+
+    def _put(self, key: str, value: bytes, ttl: float):
+        self._items[key] = (time.monotonic() + ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._live(key)
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """Guarda solo si la clave no existe (SET NX). Retorna si se guardó"""
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._put(key, value, ttl)
+            return True
+
+    def set(self, key: str, value: bytes, ttl: float):
+        with self._lock:
+            self._put(key, value, ttl)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._items.pop(key, None)
+
+
+class RedisStore:
+    """Store sobre un cliente compatible con Redis (compartido entre procesos)"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return bool(self.client.set(key, value, nx=True, px=int(ttl * 1000)))
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self.client.set(key, value, px=int(ttl * 1000))
+
+    def delete(self, key: str):
+        self.client.delete(key)
+
+
+def build_store_from_env():
+    """Redis si IDEMPOTENCY_REDIS_URL está configurado (requiere el paquete redis)"""
+    if REDIS_URL:
+        import redis
+        return RedisStore(redis.Redis.from_url(REDIS_URL))
+    return MemoryStore()
+
+
+# ========== MIDDLEWARE ==========
+
+def _json_response(status: int, detail: str) -> Tuple[int, list, bytes]:
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    return status, [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())], body
+
+
+class IdempotencyMiddleware:
+    """
+    Middleware ASGI de Idempotency-Key para los POST de IDEMPOTENT_PATHS.
+    Las peticiones sin el header (o sin token válido) pasan sin cambios.
+    """
+
+    def __init__(self, app, store=None, ttl: float = TTL_SECONDS, wait: float = WAIT_SECONDS):
+        self.app = app
+        self.store = store if store is not None else build_store_from_env()
+        self.ttl = ttl
+        self.wait = wait
+        # Duplicados en este proceso esperan a un evento en vez de sondear el store
+        self._waiters: Dict[str, asyncio.Event] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in IDEMPOTENT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(b"idempotency-key", b"").decode("latin-1").strip()
+        user_id = auth.token_subject(headers.get(b"authorization", b""))
+        if not idempotency_key or user_id is None:
+            await self.app(scope, receive, send)
+            return
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            await self._send(send, *_json_response(400, "Idempotency-Key demasiado larga"))
+            return
+
+        body = await self._read_body(receive)
+        fingerprint = hashlib.sha256(scope["path"].encode() + b"\0" + body).hexdigest()
+        key = f"idempotency:{user_id}:{idempotency_key}"
+
+        in_flight = msgpack.packb({"state": IN_FLIGHT, "fingerprint": fingerprint})
+        deadline = time.monotonic() + self.wait
+        while True:
+            if self.store.add(key, in_flight, self.wait * 2):
+                await self._run_first(key, fingerprint, in_flight, scope, receive, body, send)
+                return
+            record = await self._wait_for(key, deadline)
+            # None: la original falló con 5xx y liberó la clave -> reintentar como primera
+            if record is not None or time.monotonic() >= deadline:
+                break
+
+        if record is None or record["state"] != COMPLETED:
+            await self._send(send, *_json_response(409, "Una petición con esta Idempotency-Key sigue en curso"))
+        elif record["fingerprint"] != fingerprint:
+            await self._send(send, *_json_response(422, "Idempotency-Key reutilizada con otro cuerpo"))
+        else:
+            await self._send(send, *self._replay(record))
+
+    @staticmethod
+    def _replay(record: dict) -> Tuple[int, list, bytes]:
+        """Respuesta guardada, convertida al formato que negoció el reintento"""
+        headers = [tuple(item) for item in record["headers"]]
+        body = record["body"]
+        stored, wanted = record.get("format", "json"), negotiation.response_format.get()
+        content_type = dict(headers).get(b"content-type", b"").decode("latin-1")
+        if stored != wanted and body and content_type.startswith(negotiation.media_type(stored)):
+            body = negotiation.convert_body(body, stored, wanted)
+            rewritten = {
+                b"content-type": negotiation.media_type(wanted).encode(),
+                b"content-length": str(len(body)).encode(),
+            }
+            headers = [(name, rewritten.get(name, value)) for name, value in headers]
+        return record["status"], headers + [(b"idempotent-replayed", b"true")], body
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    @staticmethod
+    async def _send(send, status: int, headers: list, body: bytes):
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _keep_in_flight(self, key: str, in_flight: bytes):
+        """Renueva la marca "en curso" mientras la petición original siga corriendo"""
+        while True:
+            await asyncio.sleep(self.wait / 2)
+            self.store.set(key, in_flight, self.wait * 2)
+
+    async def _run_first(self, key: str, fingerprint: str, in_flight: bytes, scope, receive, body: bytes, send):
+        """Ejecuta la petición original, guardando su respuesta al terminar"""
+        event = self._waiters[key] = asyncio.Event()
+        # Si el proceso muere, la marca caduca sola (TTL = 2 x wait)
+        heartbeat = asyncio.ensure_future(self._keep_in_flight(key, in_flight))
+        sent_body = False
+        captured = {"status": 500, "headers": [], "body": []}
+
+        async def replay_receive():
+            nonlocal sent_body
+            if sent_body:  # el cuerpo ya se leyó: solo queda esperar la desconexión
+                return await receive()
+            sent_body = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def capturing_send(message):
+            if message["type"] == "http.response.start":
+                captured["status"] = message["status"]
+                captured["headers"] = [list(item) for item in message.get("headers", [])]
+            elif message["type"] == "http.response.body":
+                captured["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capturing_send)
+        finally:
+            heartbeat.cancel()
+            if captured["status"] < 500:
+                self.store.set(key, msgpack.packb({
+                    "state": COMPLETED,
+                    "fingerprint": fingerprint,
+                    "format": negotiation.response_format.get(),
+                    "status": captured["status"],
+                    "headers": captured["headers"],
+                    "body": b"".join(captured["body"]),
+                }, use_bin_type=True), self.ttl)
+            else:
+                # Los errores del servidor no se cachean: el cliente puede reintentar
+                self.store.delete(key)
+            self._waiters.pop(key, None)
+            event.set()
+
+    async def _wait_for(self, key: str, deadline: float) -> Optional[dict]:
+        """
+        Espera a que la petición original termine y retorna su registro
+        (en curso si se agotó el tiempo, None si la clave quedó libre).
+        """
+        while True:
+            raw = self.store.get(key)
+            if raw is None:
+                return None
+            record = msgpack.unpackb(raw, raw=False)
+            remaining = deadline - time.monotonic()
+            if record["state"] == COMPLETED or remaining <= 0:
+                return record
+            event = self._waiters.get(key)
+            if event is not None:
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+            else:  # la original corre en otro proceso
+                await asyncio.sleep(min(0.05, remaining))
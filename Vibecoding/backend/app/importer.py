@@ -0,0 +1,495 @@
+"""
+importer.py
+-----------
+Importación masiva de tareas desde CSV, NDJSON o MessagePack en streaming.
+El cuerpo se procesa de forma incremental (también dentro de multipart/form-data),
+cada fila se valida con las reglas de TaskCreate y las filas válidas se insertan
+en transacciones por bloques con inserts masivos de Core.
+"""
+
+import codecs
+import csv
+import json
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import IO, AsyncIterator, Dict, List, Optional, Tuple
+
+import msgpack
+from multipart.multipart import MultipartParser, parse_options_header
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import crud, schemas
+
+# Filas insertadas por transacción
+IMPORT_CHUNK_SIZE = 1000
+
+# Máximo de errores por fila que se reportan (el contador sigue aumentando)
+MAX_REPORTED_ERRORS = 1000
+
+# Cuerpos mayores a este tamaño se procesan en segundo plano (respuesta 202)
+BACKGROUND_THRESHOLD = 5 * 1024 * 1024
+
+# Trabajos recordados en memoria para consultar su progreso
+MAX_TRACKED_JOBS = 200
+
+FORMATS_BY_MEDIA_TYPE = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/json-lines": "ndjson",
+    "application/msgpack": "msgpack",
+    "application/x-msgpack": "msgpack",
+}
+
+
+class ImportFormatError(ValueError):
+    """El cuerpo de la importación no tiene un formato soportado"""
+
+
+# ========== TRABAJOS ==========
+
+class ImportJob:
+    """Estado y progreso de una importación"""
+
+    def __init__(self, user_id: int, total_bytes: Optional[int] = None):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.status = "running"
+        self.processed = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+        self.bytes_received = 0
+        self.total_bytes = total_bytes
+        self.detail: Optional[str] = None
+        self.started_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+
+    def add_error(self, row: int, messages: List[str]):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "errors": messages})
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "processed": self.processed,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": list(self.errors),
+            "bytes_received": self.bytes_received,
+            "total_bytes": self.total_bytes,
+            "detail": self.detail,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobRegistry:
+    """Registro en memoria (acotado) de trabajos de importación"""
+
+    def __init__(self, max_jobs: int = MAX_TRACKED_JOBS):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, ImportJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, user_id: int, total_bytes: Optional[int] = None) -> ImportJob:
+        job = ImportJob(user_id, total_bytes)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id: str, user_id: int) -> Optional[ImportJob]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or job.user_id != user_id:
+            return None
+        return job
+
+
+jobs = JobRegistry()
+
+
+# ========== DECODIFICADORES INCREMENTALES ==========
+
+class _LineSplitter:
+    """Convierte bloques de bytes arbitrarios en líneas completas de texto"""
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._pending = ""
+
+    def feed(self, data: bytes, final: bool = False) -> List[str]:
+        text = self._pending + self._decoder.decode(data, final)
+        lines = text.split("\n")
+        self._pending = "" if final else lines.pop()
+        return [line.rstrip("\r") for line in lines]
+
+
+class NDJSONDecoder:
+    """Decodifica un objeto JSON por línea"""
+
+    def __init__(self):
+        self._lines = _LineSplitter()
+        self._line_no = 0
+
+    def _decode(self, lines: List[str]) -> List[Tuple[int, object]]:
+        records = []
+        for line in lines:
+            self._line_no += 1
+            if not line.strip():
+                continue
+            try:
+                records.append((self._line_no, json.loads(line)))
+            except ValueError as exc:
+                records.append((self._line_no, exc))
+        return records
+
+    def feed(self, data: bytes) -> List[Tuple[int, object]]:
+        return self._decode(self._lines.feed(data))
+
+    def close(self) -> List[Tuple[int, object]]:
+        return self._decode(self._lines.feed(b"", final=True))
+
+
+class CSVDecoder:
+    """
+    Decodifica CSV con cabecera en diccionarios.
+    Une líneas físicas mientras haya comillas abiertas (campos multilínea).
+    """
+
+    def __init__(self):
+        self._lines = _LineSplitter()
+        self._record: List[str] = []
+        self._quotes = 0
+        self._header: Optional[List[str]] = None
+        self._row_no = 0
+
+    def _decode(self, lines: List[str]) -> List[Tuple[int, object]]:
+        records = []
+        for line in lines:
+            self._record.append(line)
+            self._quotes += line.count('"')
+            if self._quotes % 2:
+                continue
+            text = "\n".join(self._record)
+            self._record = []
+            self._quotes = 0
+            if not text.strip():
+                continue
+            try:
+                values = next(csv.reader([text]))
+            except csv.Error as exc:
+                self._row_no += 1
+                records.append((self._row_no, exc))
+                continue
+            if self._header is None:
+                self._header = [name.strip() for name in values]
+                continue
+            self._row_no += 1
+            records.append((self._row_no, {
+                name: (value if value != "" else None)
+                for name, value in zip(self._header, values)
+            }))
+        return records
+
+    def feed(self, data: bytes) -> List[Tuple[int, object]]:
+        return self._decode(self._lines.feed(data))
+
+    def close(self) -> List[Tuple[int, object]]:
+        lines = self._lines.feed(b"", final=True)
+        if self._record:
+            # Comillas sin cerrar al final: se intenta decodificar lo acumulado
+            lines.append("")
+            self._quotes = 0
+        return self._decode(lines)
+
+
+class MsgpackDecoder:
+    """
+    Decodifica una secuencia de mapas MessagePack concatenados (streaming).
+    También acepta un array de mapas, aunque este se acumula completo en memoria.
+    """
+
+    def __init__(self):
+        self._unpacker = msgpack.Unpacker(raw=False)
+        self._row_no = 0
+
+    def _decode(self) -> List[Tuple[int, object]]:
+        records = []
+        try:
+            for obj in self._unpacker:
+                for item in (obj if isinstance(obj, list) else [obj]):
+                    self._row_no += 1
+                    records.append((self._row_no, item))
+        except (ValueError, msgpack.FormatError, msgpack.StackError) as exc:
+            raise ImportFormatError(f"MessagePack inválido tras la fila {self._row_no}: {exc}")
+        return records
+
+    def feed(self, data: bytes) -> List[Tuple[int, object]]:
+        self._unpacker.feed(data)
+        return self._decode()
+
+    def close(self) -> List[Tuple[int, object]]:
+        return self._decode()
+
+
+class MultipartExtractor:
+    """
+    Extrae en streaming el contenido del archivo de un multipart/form-data.
+    Usa el primer part con nombre 'file' o con filename; ignora el resto.
+    """
+
+    def __init__(self, boundary: bytes):
+        self.content_type: Optional[str] = None
+        self.filename: Optional[str] = None
+        self._chunks: List[bytes] = []
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        self._in_file = False
+        self._done = False
+        self._parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        is_file = options.get(b"name") == b"file" or b"filename" in options
+        self._in_file = is_file and not self._done
+        if self._in_file:
+            filename = options.get(b"filename")
+            self.filename = filename.decode("utf-8", "replace") if filename else None
+            content_type, _ = parse_options_header(self._headers.get(b"content-type", b""))
+            self.content_type = content_type.decode("latin-1") or None
+
+    def _on_part_data(self, data, start, end):
+        if self._in_file:
+            self._chunks.append(data[start:end])
+
+    def _on_part_end(self):
+        if self._in_file:
+            self._done = True
+            self._in_file = False
+
+    def feed(self, data: bytes) -> bytes:
+        self._parser.write(data)
+        payload = b"".join(self._chunks)
+        self._chunks.clear()
+        return payload
+
+
+def _detect_format(media_type: Optional[str], filename: Optional[str]) -> Optional[str]:
+    if media_type in FORMATS_BY_MEDIA_TYPE:
+        return FORMATS_BY_MEDIA_TYPE[media_type]
+    if filename:
+        lowered = filename.lower()
+        if lowered.endswith(".csv"):
+            return "csv"
+        if lowered.endswith((".ndjson", ".jsonl")):
+            return "ndjson"
+        if lowered.endswith(".msgpack"):
+            return "msgpack"
+    return None
+
+
+# ========== IMPORTADOR ==========
+
+class TaskImporter:
+    """
+    Importa tareas a partir de bloques de bytes del cuerpo de la petición.
+
+    feed() decodifica y valida (solo CPU) y retorna True cuando hay un bloque
+    de filas listo; flush() lo inserta en una transacción. Así el llamador
+    decide en qué hilo se ejecuta el acceso a la BD.
+    """
+
+    def __init__(
+        self,
+        job: ImportJob,
+        db: Session,
+        content_type: str,
+        import_format: Optional[str] = None,
+        chunk_size: Optional[int] = None
+    ):
+        self.job = job
+        self.db = db
+        self.chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+        self._rows: List[Tuple[int, dict]] = []
+        self._format = import_format
+        self._decoder = None
+        self._multipart: Optional[MultipartExtractor] = None
+
+        media_type, options = parse_options_header(content_type or "")
+        media_type = media_type.decode("latin-1")
+        if media_type == "multipart/form-data":
+            boundary = options.get(b"boundary")
+            if not boundary:
+                raise ImportFormatError("multipart/form-data sin boundary")
+            self._multipart = MultipartExtractor(boundary)
+        elif self._format is None:
+            self._format = _detect_format(media_type, None)
+            if self._format is None:
+                raise ImportFormatError("Formato no soportado: use CSV, NDJSON o MessagePack")
+        if self._format is not None:
+            self._decoder = self._make_decoder(self._format)
+
+    @staticmethod
+    def _make_decoder(import_format: str):
+        if import_format == "csv":
+            return CSVDecoder()
+        if import_format == "ndjson":
+            return NDJSONDecoder()
+        if import_format == "msgpack":
+            return MsgpackDecoder()
+        raise ImportFormatError("Formato no soportado: use CSV, NDJSON o MessagePack")
+
+    def _ensure_decoder(self):
+        if self._decoder is None:
+            import_format = _detect_format(self._multipart.content_type, self._multipart.filename)
+            if import_format is None:
+                raise ImportFormatError("No se pudo determinar el formato del archivo (CSV, NDJSON o MessagePack)")
+            self._format = import_format
+            self._decoder = self._make_decoder(import_format)
+
+    def _accept(self, records: List[Tuple[int, object]]):
+        for row_no, record in records:
+            self.job.processed += 1
+            if isinstance(record, Exception):
+                self.job.add_error(row_no, [f"Fila inválida: {record}"])
+                continue
+            if not isinstance(record, dict):
+                self.job.add_error(row_no, ["Cada fila debe ser un objeto"])
+                continue
+            try:
+                row = schemas.TaskImportRow.model_validate(record)
+            except ValidationError as exc:
+                self.job.add_error(row_no, [
+                    f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+                    for error in exc.errors()
+                ])
+                continue
+            self._rows.append((row_no, row.model_dump()))
+
+    def feed(self, data: bytes) -> bool:
+        """Procesa un bloque del cuerpo. Retorna True si conviene llamar a flush()"""
+        self.job.bytes_received += len(data)
+        if self._multipart is not None:
+            data = self._multipart.feed(data)
+            if not data:
+                return False
+        self._ensure_decoder()
+        self._accept(self._decoder.feed(data))
+        return len(self._rows) >= self.chunk_size
+
+    def flush(self, final: bool = False):
+        """
+        Inserta las filas válidas acumuladas en bloques completos de chunk_size.
+        Con final=True inserta también el último bloque parcial.
+        """
+        while len(self._rows) >= self.chunk_size or (final and self._rows):
+            chunk = self._rows[:self.chunk_size]
+            del self._rows[:self.chunk_size]
+            try:
+                self.job.inserted += crud.bulk_create_tasks(
+                    self.db, self.job.user_id, [values for _, values in chunk]
+                )
+            except Exception as exc:
+                self.db.rollback()
+                for row_no, _ in chunk:
+                    self.job.add_error(row_no, [f"Error al insertar: {type(exc).__name__}"])
+
+    def finish(self):
+        """Procesa el resto del cuerpo, inserta lo pendiente y cierra el trabajo"""
+        if self._decoder is None:
+            raise ImportFormatError("El multipart no contiene un archivo 'file'")
+        self._accept(self._decoder.close())
+        self.flush(final=True)
+        self.job.status = "completed"
+        self.job.finished_at = datetime.utcnow()
+
+    def fail(self, exc: Exception):
+        self.job.status = "failed"
+        self.job.detail = str(exc) or type(exc).__name__
+        self.job.finished_at = datetime.utcnow()
+        self.db.rollback()
+
+
+# ========== EJECUCIÓN ==========
+
+async def import_stream(task_importer: TaskImporter, stream: AsyncIterator[bytes]):
+    """
+    Importa mientras se recibe el cuerpo.
+    La decodificación corre en el event loop y los inserts en el threadpool.
+    """
+    try:
+        async for data in stream:
+            if task_importer.feed(data):
+                await run_in_threadpool(task_importer.flush)
+        await run_in_threadpool(task_importer.finish)
+    except Exception as exc:
+        task_importer.fail(exc)
+        raise
+
+
+async def spool_body(stream: AsyncIterator[bytes]) -> IO[bytes]:
+    """Vuelca el cuerpo a un archivo temporal (en memoria hasta 1 MB)"""
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    async for data in stream:
+        spool.write(data)
+    spool.seek(0)
+    return spool
+
+
+def _run_spooled(task_importer: TaskImporter, spool: IO[bytes]):
+    try:
+        for data in iter(lambda: spool.read(64 * 1024), b""):
+            if task_importer.feed(data):
+                task_importer.flush()
+        task_importer.finish()
+    except Exception as exc:
+        task_importer.fail(exc)
+    finally:
+        spool.close()
+        task_importer.db.close()
+
+
+def start_background(task_importer: TaskImporter, spool: IO[bytes]) -> threading.Thread:
+    """Procesa un cuerpo ya volcado a disco en un hilo de fondo"""
+    thread = threading.Thread(
+        target=_run_spooled,
+        args=(task_importer, spool),
+        name=f"task-import-{task_importer.job.id}",
+        daemon=True
+    )
+    thread.start()
+    return thread
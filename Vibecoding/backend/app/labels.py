@@ -0,0 +1,246 @@
+"""
+labels.py
+---------
+Índice en memoria de etiquetas para filtrar GET /api/tasks?labels=...
+
+Cada usuario tiene un bitmap de ids de tarea por etiqueta; una combinación
+de etiquetas (todas / alguna) es un AND / OR de bitmaps, sin apilar un JOIN
+a task_labels por etiqueta. El resultado se pasa a get_tasks como lista de
+ids y se combina en SQL con status, search y el resto de filtros.
+
+Los bitmaps son al estilo roaring: los ids se agrupan en bloques de 2^16
+y cada bloque es un entero de Python usado como conjunto de bits, así que
+ids dispersos (shards, ids globales) no reservan memoria para los huecos.
+
+Como typeahead.py: carga perezosa al primer uso, crud los mantiene en las
+escrituras y un LRU limita cuántos usuarios hay en memoria (local al proceso).
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+
+MAX_USERS = 1000
+# Cargas que se reintentan si una escritura del usuario llega mientras tanto
+LOAD_ATTEMPTS = 3
+
+_CHUNK_BITS = 16
+_LOW_MASK = (1 << _CHUNK_BITS) - 1
+
+
+class Bitmap:
+    """Conjunto de enteros no negativos en bloques de 2^16 bits"""
+
+    __slots__ = ("chunks",)
+
+    def __init__(self, values: Iterable[int] = ()):
+        self.chunks: Dict[int, int] = {}
+        for value in values:
+            self.add(value)
+
+    def add(self, value: int):
+        high = value >> _CHUNK_BITS
+        self.chunks[high] = self.chunks.get(high, 0) | (1 << (value & _LOW_MASK))
+
+    def discard(self, value: int):
+        high = value >> _CHUNK_BITS
+        bits = self.chunks.get(high)
+        if bits is None:
+            return
+        bits &= ~(1 << (value & _LOW_MASK))
+        if bits:
+            self.chunks[high] = bits
+        else:
+            del self.chunks[high]
+
+    def __contains__(self, value: int) -> bool:
+        return bool(self.chunks.get(value >> _CHUNK_BITS, 0) >> (value & _LOW_MASK) & 1)
+
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        result = Bitmap()
+        small, large = sorted((self.chunks, other.chunks), key=len)
+        for high, bits in small.items():
+            common = bits & large.get(high, 0)
+            if common:
+                result.chunks[high] = common
+        return result
+
+    def __or__(self, other: "Bitmap") -> "Bitmap":
+        result = Bitmap()
+        result.chunks = dict(self.chunks)
+        for high, bits in other.chunks.items():
+            result.chunks[high] = result.chunks.get(high, 0) | bits
+        return result
+
+    def __len__(self) -> int:
+        return sum(bits.bit_count() for bits in self.chunks.values())
+
+    def __iter__(self) -> Iterator[int]:
+        """Valores en orden ascendente"""
+        for high in sorted(self.chunks):
+            bits, base = self.chunks[high], high << _CHUNK_BITS
+            while bits:
+                lowest = bits & -bits
+                yield base + lowest.bit_length() - 1
+                bits ^= lowest
+
+
+class UserLabels:
+    """Etiquetas de un usuario: nombre -> id y bitmap de tareas por etiqueta"""
+
+    def __init__(self, labels=(), assignments=()):
+        self.ids: Dict[str, int] = {}
+        self.bitmaps: Dict[int, Bitmap] = {}
+        for label_id, name in labels:
+            self.add_label(label_id, name)
+        for task_id, label_id in assignments:
+            self.bitmaps[label_id].add(task_id)
+
+    def add_label(self, label_id: int, name: str):
+        self.ids[name] = label_id
+        self.bitmaps.setdefault(label_id, Bitmap())
+
+    def remove_label(self, label_id: int):
+        self.bitmaps.pop(label_id, None)
+        self.ids = {name: other for name, other in self.ids.items() if other != label_id}
+
+    def set_task_labels(self, task_id: int, label_ids: Iterable[int]):
+        self.remove_task(task_id)
+        for label_id in label_ids:
+            bitmap = self.bitmaps.get(label_id)
+            if bitmap is not None:
+                bitmap.add(task_id)
+
+    def remove_task(self, task_id: int):
+        for bitmap in self.bitmaps.values():
+            bitmap.discard(task_id)
+
+    def match(self, names: Sequence[str], mode: str = "all") -> Bitmap:
+        """
+        Tareas con todas (mode='all') o alguna (mode='any') de las etiquetas.
+        Un nombre desconocido deja vacío 'all' y se ignora en 'any'.
+        """
+        bitmaps = [self.bitmaps[self.ids[name]] for name in names if name in self.ids]
+        if not bitmaps or (mode == "all" and len(bitmaps) < len(set(names))):
+            return Bitmap()
+        result = bitmaps[0]
+        for bitmap in bitmaps[1:]:
+            result = result & bitmap if mode == "all" else result | bitmap
+        return result
+
+
+class LabelIndex:
+    """Índices por usuario con carga perezosa y LRU"""
+
+    def __init__(self, max_users: int = MAX_USERS):
+        self.max_users = max_users
+        self._users: "OrderedDict[int, UserLabels]" = OrderedDict()
+        # user_id -> [cargas en curso, escrituras recibidas durante ellas]
+        self._loading: Dict[int, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def for_user(self, db: Session, user_id: int) -> UserLabels:
+        """
+        Índice del usuario, cargándolo si hace falta. Como en typeahead.py, una
+        carga durante la que llegó una escritura se descarta y se repite.
+        """
+        for _ in range(LOAD_ATTEMPTS):
+            with self._lock:
+                index = self._users.get(user_id)
+                if index is not None:
+                    self._users.move_to_end(user_id)
+                    return index
+                state = self._loading.setdefault(user_id, [0, 0])
+                state[0] += 1
+                writes = state[1]
+
+            try:
+                index = self._load(db, user_id)
+            except BaseException:
+                with self._lock:
+                    self._end_load(user_id)
+                raise
+
+            with self._lock:
+                if self._end_load(user_id) == writes:
+                    # Otra petición pudo cargarlo mientras tanto: se conserva el existente
+                    index = self._users.setdefault(user_id, index)
+                    self._users.move_to_end(user_id)
+                    while len(self._users) > self.max_users:
+                        self._users.popitem(last=False)
+                    return index
+        # Escrituras continuas: se responde con la última carga sin guardarla
+        return index
+
+    @staticmethod
+    def _load(db: Session, user_id: int) -> UserLabels:
+        label, task_labels = models.Label, models.task_labels
+        labels = db.execute(select(label.id, label.name).where(label.user_id == user_id)).all()
+        assignments = db.execute(
+            select(task_labels.c.task_id, task_labels.c.label_id)
+            .join(label, label.id == task_labels.c.label_id)
+            .where(label.user_id == user_id)
+        ).all()
+        return UserLabels(labels, assignments)
+
+    def _end_load(self, user_id: int) -> int:
+        """Cierra una carga en curso; retorna las escrituras vistas (con el lock tomado)"""
+        state = self._loading[user_id]
+        state[0] -= 1
+        if not state[0]:
+            del self._loading[user_id]
+        return state[1]
+
+    def match(self, db: Session, user_id: int, names: Sequence[str], mode: str = "all") -> List[int]:
+        """Ids (ascendentes) de las tareas del usuario que cumplen el filtro de etiquetas"""
+        index = self.for_user(db, user_id)
+        with self._lock:
+            return list(index.match(names, mode))
+
+    def _changed(self, user_id: int):
+        """Registra una escritura del usuario para las cargas en curso (con el lock tomado)"""
+        state = self._loading.get(user_id)
+        if state is not None:
+            state[1] += 1
+
+    # Mantenimiento desde crud: solo se actualizan índices ya cargados
+
+    def _update(self, user_id: int, method: str, *args):
+        with self._lock:
+            self._changed(user_id)
+            index = self._users.get(user_id)
+            if index is not None:
+                getattr(index, method)(*args)
+
+    def label_saved(self, user_id: int, label_id: int, name: str):
+        self._update(user_id, "add_label", label_id, name)
+
+    def label_removed(self, user_id: int, label_id: int):
+        self._update(user_id, "remove_label", label_id)
+
+    def task_labels_set(self, user_id: int, task_id: int, label_ids: Iterable[int]):
+        self._update(user_id, "set_task_labels", task_id, list(label_ids))
+
+    def task_removed(self, user_id: int, task_id: int):
+        self._update(user_id, "remove_task", task_id)
+
+    def invalidate(self, user_id: int):
+        """Descarta el índice (se recarga en el próximo uso)"""
+        with self._lock:
+            self._changed(user_id)
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+    def __len__(self):
+        return len(self._users)
+
+
+index = LabelIndex()
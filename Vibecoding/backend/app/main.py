@@ -5,17 +5,49 @@ Aplicación principal de FastAPI.
 Define los endpoints de la API REST de QuickTask.
 """
 
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import Optional
-from datetime import timedelta
+from typing import Optional, Tuple
+from datetime import date, datetime, timedelta
+from contextlib import asynccontextmanager
+import base64
+
+from . import models, schemas, crud, auth, delivery, export, importer, analytics, negotiation, group_commit, replicas, idempotency, typeahead, tracing, debug, profiling, memory, slow_queries, singleflight, admission, activity, labels
+from .database import get_db, init_db, clone_session, shard_session_factories
+
+# Crear tablas en la BD (directorio y shards si hay sharding)
+init_db()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Ciclo de vida de la aplicación.
+    Arranca el worker de entrega de notificaciones (si está habilitado)
+    y lo detiene al apagar el servidor, junto con los escritores de group commit
+    y de actividad, el exportador de trazas y el seguimiento de memoria.
+    """
+    # El threadpool de los endpoints síncronos acompaña al límite total de admisión
+    if admission.ADMISSION_ENABLED:
+        admission.apply_thread_limit()
+    if delivery.WORKER_ENABLED:
+        delivery.start_workers(shard_session_factories())
+    # Trazas: exportador JSONL u OTLP según TRACING_EXPORTER
+    if tracing.TRACING_ENABLED:
+        tracing.configure()
+    # Snapshots de tracemalloc y picos por ruta (ver /api/_debug/memory)
+    if memory.MEMORY_TRACKING_ENABLED:
+        memory.tracker.start()
+    yield
+    memory.tracker.stop()
+    delivery.stop_workers()
+    group_commit.shutdown()
+    # Después del group commit: sus últimos grupos todavía encolan actividad
+    activity.shutdown()
+    tracing.shutdown()
 
-from . import models, schemas, crud, auth
-from .database import engine, get_db
-
-# Crear tablas en la BD
-models.Base.metadata.create_all(bind=engine)
 
 # Inicializar FastAPI
 app = FastAPI(
@@ -23,7 +55,9 @@ app = FastAPI(
     description="API REST para gestión de tareas personales",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
+    default_response_class=negotiation.NegotiatedJSONResponse
 )
 
 # Configurar CORS (permitir requests desde frontend)
@@ -35,6 +69,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Idempotency-Key en los POST de creación (dentro de la negociación: se guarda sin comprimir)
+app.add_middleware(idempotency.IdempotencyMiddleware)
+
+# Control de admisión por clase de ruta (dentro del single-flight: solo ocupa lugar
+# la ejecución compartida, no cada petición agrupada; ver /api/_debug/admission)
+app.add_middleware(admission.AdmissionMiddleware)
+
+# GET idénticos concurrentes comparten una ejecución (dentro de la negociación)
+app.add_middleware(singleflight.SingleFlightMiddleware)
+
+# Negociación de formato (JSON / MessagePack) y compresión br/gzip de respuestas grandes
+app.add_middleware(negotiation.ContentNegotiationMiddleware, minimum_size=negotiation.MINIMUM_COMPRESS_SIZE)
+
+# Endpoint de origen para el registro de consultas lentas
+app.add_middleware(slow_queries.EndpointContextMiddleware)
+
+# Pico de memoria por ruta en una fracción de las peticiones (MEMORY_TRACKING_ENABLED)
+app.add_middleware(memory.MemoryMiddleware)
+
+# Perfilado bajo demanda (X-Profile o PROFILING_SAMPLE_RATE; ver /api/_debug/profiles)
+app.add_middleware(profiling.ProfilingMiddleware)
+
+# Span por petición (el más externo, para medir también los demás middlewares)
+app.add_middleware(tracing.TracingMiddleware)
+
 
 # ========== ENDPOINTS DE AUTENTICACIÓN ==========
 
@@ -96,6 +155,83 @@ def get_current_user_info(current_user: models.User = Depends(auth.get_current_u
 
 # ========== ENDPOINTS DE TAREAS ==========
 
+def parse_task_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Valida ?fields= y retorna la proyección (siempre incluye id), o None si no se pidió"""
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(schemas.TASK_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Campos desconocidos en fields: {', '.join(sorted(unknown))}"
+        )
+    requested.add("id")
+    return tuple(name for name in schemas.TASK_FIELDS if name in requested)
+
+
+def parse_task_include(include: Optional[str]) -> Tuple[str, ...]:
+    """Valida ?include= (recursos relacionados a embeber)"""
+    if not include:
+        return ()
+    requested = {name.strip() for name in include.split(",") if name.strip()}
+    unknown = requested - set(schemas.TASK_INCLUDES)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Recursos desconocidos en include: {', '.join(sorted(unknown))}"
+        )
+    return tuple(name for name in schemas.TASK_INCLUDES if name in requested)
+
+
+def task_etag(version: int) -> str:
+    """ETag de una tarea: su versión"""
+    return f'"{version}"'
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """Versión esperada según If-Match ("3", W/"3" o 3); None si no se envió o es *"""
+    if not if_match or if_match.strip() == "*":
+        return None
+    value = if_match.strip().removeprefix("W/").strip('"')
+    if not value.isdigit():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="If-Match debe ser la versión de la tarea (su ETag)"
+        )
+    return int(value)
+
+
+def change_task(db: Session, response: Response, fn, task_id: int, user_id: int, *args, if_match: Optional[str] = None):
+    """
+    Ejecuta una mutación de tarea con concurrencia optimista.
+    404 si no existe, 409 (con el ETag actual) si la versión no coincide.
+    """
+    try:
+        task = group_commit.run(db, fn, task_id, user_id, *args, expected_version=parse_if_match(if_match))
+    except crud.VersionConflict as conflict:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="La tarea fue modificada por otra petición; vuelva a leerla",
+            headers={"ETag": task_etag(conflict.current_version)}
+        )
+    
+    if not task:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tarea no encontrada"
+        )
+    
+    response.headers["ETag"] = task_etag(task.version)
+    return task
+
+
+def project_tasks(tasks, fields: Optional[Tuple[str, ...]], include: Tuple[str, ...] = ()) -> list:
+    """Serializa tareas con el modelo derivado de la proyección y los includes"""
+    model = schemas.task_projection(fields, include)
+    return [model.model_validate(task).model_dump(mode="json") for task in tasks]
+
+
 @app.post("/api/tasks", response_model=schemas.TaskResponse, status_code=status.HTTP_201_CREATED)
 def create_task(
     task: schemas.TaskCreate,
@@ -107,17 +243,24 @@ def create_task(
     
     El usuario autenticado puede crear tareas con título, descripción y fecha límite opcional.
     """
-    new_task = crud.create_task(db, task, current_user.id)
+    new_task = group_commit.run(db, crud.create_task, task, current_user.id)
     return new_task
 
 
 @app.get("/api/tasks", response_model=schemas.TaskListResponse)
 def list_tasks(
-    status: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
     order_by: str = "created_at",
     search: Optional[str] = None,
+    due_from: Optional[datetime] = None,
+    due_to: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    label_filter: Optional[str] = Query(None, alias="labels"),
+    labels_mode: str = "all",
     current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(replicas.get_read_db),
+    primary_db: Session = Depends(get_db)
 ):
     """
     RF8, RF9, RF13: Listar tareas con filtros y búsqueda.
@@ -128,9 +271,17 @@ def list_tasks(
     - status: Filtrar por estado (pending|completed)
     - order_by: Ordenar por (created_at|due_date)
     - search: Buscar por palabras clave
-    """
+    - due_from / due_to: Rango de fecha límite [due_from, due_to)
+    - fields: Campos a retornar por tarea, separados por coma (p. ej. id,title,status,due_date)
+    - include: Recursos relacionados a embeber (reminder, labels)
+    - labels: Nombres de etiqueta separados por coma
+    - labels_mode: all (todas las etiquetas, por defecto) | any (alguna)
+    """
+    projection = parse_task_fields(fields)
+    includes = parse_task_include(include)
+    
     # Validar status
-    if status and status not in ["pending", "completed"]:
+    if status_filter and status_filter not in ["pending", "completed"]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Status debe ser 'pending' o 'completed'"
@@ -143,10 +294,36 @@ def list_tasks(
             detail="order_by debe ser 'created_at' o 'due_date'"
         )
     
+    # Validar labels_mode
+    if labels_mode not in ["all", "any"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="labels_mode debe ser 'all' o 'any'"
+        )
+    
+    # Filtro por etiquetas: se resuelve en el índice en memoria y llega a SQL como ids.
+    # El índice se comparte entre peticiones, así que se carga del primario (no de la réplica)
+    task_ids = None
+    if label_filter:
+        names = list(dict.fromkeys(name.strip() for name in label_filter.split(",") if name.strip()))
+        task_ids = labels.index.match(primary_db, current_user.id, names, labels_mode)
+    
     # Obtener tareas del usuario autenticado
-    tasks = crud.get_tasks(db, current_user.id, status, order_by, search)
+    tasks = crud.get_tasks(
+        db, current_user.id, status_filter, order_by, search, due_from, due_to,
+        fields=projection, include=includes, task_ids=task_ids
+    )
     stats = crud.get_task_statistics(db, current_user.id)
     
+    if projection or includes:
+        # Respuesta directa: el response_model completo no aplica a la proyección
+        return negotiation.NegotiatedJSONResponse({
+            "tasks": project_tasks(tasks, projection, includes),
+            "total": stats["total"],
+            "pending": stats["pending"],
+            "completed": stats["completed"]
+        })
+    
     return {
         "tasks": tasks,
         "total": stats["total"],
@@ -155,16 +332,229 @@ def list_tasks(
     }
 
 
+@app.get("/api/tasks/upcoming", response_model=list[schemas.TaskResponse])
+def list_upcoming_tasks(
+    hours: int = Query(24, ge=1, le=24 * 365),
+    limit: int = Query(50, ge=1, le=500),
+    fields: Optional[str] = None,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(replicas.get_read_db)
+):
+    """
+    Tareas pendientes que vencen en las próximas `hours` horas (por defecto 24h),
+    ordenadas por fecha límite. Admite ?fields= como GET /api/tasks.
+    """
+    projection = parse_task_fields(fields)
+    tasks = crud.get_upcoming_tasks(db, current_user.id, datetime.utcnow(), hours, limit, fields=projection)
+    if projection:
+        return negotiation.NegotiatedJSONResponse(project_tasks(tasks, projection))
+    return tasks
+
+
+@app.get("/api/tasks/overdue", response_model=list[schemas.TaskResponse])
+def list_overdue_tasks(
+    limit: int = Query(50, ge=1, le=500),
+    fields: Optional[str] = None,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(replicas.get_read_db)
+):
+    """
+    Tareas pendientes cuya fecha límite ya pasó (las más atrasadas primero).
+    Admite ?fields= como GET /api/tasks.
+    """
+    projection = parse_task_fields(fields)
+    tasks = crud.get_overdue_tasks(db, current_user.id, datetime.utcnow(), limit, fields=projection)
+    if projection:
+        return negotiation.NegotiatedJSONResponse(project_tasks(tasks, projection))
+    return tasks
+
+
+@app.get("/api/tasks/suggest", response_model=list[schemas.TaskSuggestion])
+def suggest_tasks(
+    prefix: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Autocompletado de títulos: tareas con una palabra que empieza por `prefix`
+    (sin distinguir mayúsculas ni tildes). Se responde desde el índice en
+    memoria del usuario; la BD (primario) solo se consulta al cargarlo.
+    """
+    suggestions = typeahead.index.suggest(db, current_user.id, prefix, limit)
+    return [{"id": task_id, "title": title} for task_id, title in suggestions]
+
+
+@app.get("/api/tasks/analytics", response_model=schemas.TaskAnalyticsResponse)
+def task_analytics(
+    granularity: str = "day",
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(replicas.get_read_db)
+):
+    """
+    RF14: Estadísticas de tareas en el tiempo.
+    
+    Se sirve desde los rollups diarios por usuario (sin agrupar todas las tareas).
+    
+    Parámetros:
+    - granularity: Agrupación (day|week)
+    - from / to: Rango de fechas (por defecto los últimos 30 días o 12 semanas)
+    """
+    if granularity not in ["day", "week"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="granularity debe ser 'day' o 'week'"
+        )
+    
+    date_to = date_to or datetime.utcnow().date()
+    if date_from is None:
+        date_from = date_to - (timedelta(days=29) if granularity == "day" else timedelta(weeks=11))
+    
+    step_days = 7 if granularity == "week" else 1
+    if date_from > date_to or (date_to - date_from).days // step_days >= analytics.MAX_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Rango inválido (máximo {analytics.MAX_BUCKETS} intervalos)"
+        )
+    
+    buckets = analytics.get_buckets(db, current_user.id, granularity, date_from, date_to)
+    
+    return {
+        "granularity": granularity,
+        "start": analytics.bucket_start(date_from, granularity),
+        "end": date_to,
+        "buckets": buckets
+    }
+
+
+@app.get("/api/tasks/export")
+def export_tasks(
+    format: str = "ndjson",
+    gzip: bool = False,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Exportar todas las tareas del usuario en streaming.
+    
+    Las filas se leen con un cursor del servidor y se escriben a medida que
+    llegan, por lo que la memoria se mantiene constante.
+    
+    Parámetros:
+    - format: Formato de salida (ndjson|csv)
+    - gzip: Comprimir al vuelo (descarga .gz)
+    """
+    if format not in export.MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format debe ser 'ndjson' o 'csv'"
+        )
+    
+    rows = crud.iter_tasks_for_export(db, current_user.id)
+    body = export.stream_tasks(rows, format)
+    filename = f"tasks.{format}"
+    media_type = export.MEDIA_TYPES[format]
+    
+    if gzip:
+        body = export.gzip_stream(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+    
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@app.post("/api/tasks/import", response_model=schemas.ImportJobResponse)
+async def import_tasks(
+    request: Request,
+    response: Response,
+    format: Optional[str] = None,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Importación masiva de tareas desde CSV, NDJSON o MessagePack.
+    
+    Acepta el archivo como cuerpo directo (text/csv, application/x-ndjson,
+    application/msgpack) o dentro de multipart/form-data (campo 'file'). El cuerpo se procesa en
+    streaming, cada fila se valida como TaskCreate y se inserta por bloques.
+    
+    Con 'Prefer: respond-async' (o cuerpos muy grandes) responde 202 con el
+    id del trabajo; el progreso se consulta en /api/tasks/import/{job_id}.
+    """
+    content_length = request.headers.get("content-length", "")
+    total_bytes = int(content_length) if content_length.isdigit() else None
+    background = (
+        "respond-async" in request.headers.get("prefer", "")
+        or (total_bytes or 0) > importer.BACKGROUND_THRESHOLD
+    )
+    
+    job = importer.jobs.create(current_user.id, total_bytes)
+    session = clone_session(db) if background else db
+    
+    try:
+        task_importer = importer.TaskImporter(
+            job, session, request.headers.get("content-type", ""), format
+        )
+        if background:
+            spool = await importer.spool_body(request.stream())
+            importer.start_background(task_importer, spool)
+            response.status_code = status.HTTP_202_ACCEPTED
+            response.headers["Location"] = f"/api/tasks/import/{job.id}"
+        else:
+            await importer.import_stream(task_importer, request.stream())
+    except importer.ImportFormatError as exc:
+        if background:
+            session.close()
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=str(exc)
+        )
+    
+    return job.to_dict()
+
+
+@app.get("/api/tasks/import/{job_id}", response_model=schemas.ImportJobResponse)
+def get_import_job(
+    job_id: str,
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """
+    Consultar el progreso de una importación masiva.
+    """
+    job = importer.jobs.get(job_id, current_user.id)
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Importación no encontrada"
+        )
+    
+    return job.to_dict()
+
+
 @app.get("/api/tasks/{task_id}", response_model=schemas.TaskResponse)
 def get_task(
     task_id: int,
+    response: Response,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
     current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(replicas.get_read_db)
 ):
     """
     Obtener detalle de una tarea específica.
+    Admite ?fields= para retornar solo algunos campos e ?include=reminder
+    para embeber su recordatorio. El ETag es la versión (para If-Match).
     """
-    task = crud.get_task_by_id(db, task_id, current_user.id)
+    projection = parse_task_fields(fields)
+    includes = parse_task_include(include)
+    task = crud.get_task_by_id(db, task_id, current_user.id, fields=projection, include=includes)
     
     if not task:
         raise HTTPException(
@@ -172,62 +562,147 @@ def get_task(
             detail="Tarea no encontrada"
         )
     
+    # Con ?fields= la versión solo está cargada si se pidió
+    headers = {"ETag": task_etag(task.version)} if projection is None or "version" in projection else {}
+    if projection or includes:
+        return negotiation.NegotiatedJSONResponse(project_tasks([task], projection, includes)[0], headers=headers)
+    response.headers.update(headers)
     return task
 
 
-@app.put("/api/tasks/{task_id}", response_model=schemas.TaskResponse)
-def update_task(
+def encode_history_cursor(entry: models.TaskActivity) -> str:
+    """Cursor opaco con el (ts, id) del último registro de la página"""
+    raw = f"{entry.ts.isoformat()}|{entry.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_history_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    if not cursor:
+        return None
+    try:
+        ts, entry_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(ts), int(entry_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor inválido"
+        )
+
+
+@app.get("/api/tasks/{task_id}/history", response_model=schemas.TaskHistoryResponse)
+def get_task_history(
     task_id: int,
-    task_update: schemas.TaskUpdate,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
     current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(replicas.get_read_db)
 ):
     """
-    RF5: Actualizar datos de una tarea.
+    Historial de cambios de una tarea (creación, ediciones, completada,
+    reabierta, eliminada), del más reciente al más antiguo.
     
-    Permite modificar título, descripción, fecha límite y estado.
+    Paginado por cursor: pase `next_cursor` como ?cursor= para la página
+    siguiente. Se escribe en lotes, así que un cambio puede tardar hasta
+    ACTIVITY_FLUSH_INTERVAL_MS en aparecer.
     """
-    updated_task = crud.update_task(db, task_id, current_user.id, task_update)
+    before = decode_history_cursor(cursor)
+    entries = crud.get_task_history(db, task_id, current_user.id, limit + 1, before)
     
-    if not updated_task:
+    if not entries and before is None and not crud.get_task_by_id(db, task_id, current_user.id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Tarea no encontrada"
         )
     
-    return updated_task
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    return {
+        "items": entries,
+        "next_cursor": encode_history_cursor(entries[-1]) if has_more else None
+    }
+
+
+@app.put("/api/tasks/{task_id}", response_model=schemas.TaskResponse)
+def update_task(
+    task_id: int,
+    task_update: schemas.TaskUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    RF5: Actualizar datos de una tarea.
+    
+    Permite modificar título, descripción, fecha límite y estado.
+    Con If-Match (el ETag / version de la tarea) la edición solo se aplica
+    si nadie la modificó desde entonces; si no, responde 409.
+    """
+    return change_task(db, response, crud.update_task, task_id, current_user.id, task_update, if_match=if_match)
 
 
 @app.post("/api/tasks/{task_id}/complete", response_model=schemas.TaskResponse)
 def complete_task(
     task_id: int,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    RF6: Marcar tarea como completada (admite If-Match).
+    """
+    return change_task(db, response, crud.mark_task_completed, task_id, current_user.id, if_match=if_match)
+
+
+@app.post("/api/tasks/{task_id}/pending", response_model=schemas.TaskResponse)
+def revert_task_to_pending(
+    task_id: int,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user: models.User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    RF6: Marcar tarea como completada.
+    RF6: Revertir tarea a estado pendiente (admite If-Match).
     """
-    task = crud.mark_task_completed(db, task_id, current_user.id)
+    return change_task(db, response, crud.mark_task_pending, task_id, current_user.id, if_match=if_match)
+
+
+@app.delete("/api/tasks/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_task(
+    task_id: int,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    RF7: Eliminar permanentemente una tarea.
+    """
+    success = group_commit.run(db, crud.delete_task, task_id, current_user.id)
     
-    if not task:
+    if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Tarea no encontrada"
         )
     
-    return task
+    return None
 
 
-@app.post("/api/tasks/{task_id}/pending", response_model=schemas.TaskResponse)
-def revert_task_to_pending(
+@app.put("/api/tasks/{task_id}/labels")
+def set_task_labels(
     task_id: int,
+    update: schemas.TaskLabelsUpdate,
     current_user: models.User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    RF6: Revertir tarea a estado pendiente.
+    Reemplaza las etiquetas de una tarea. Responde la tarea con sus etiquetas.
     """
-    task = crud.mark_task_pending(db, task_id, current_user.id)
+    try:
+        task = group_commit.run(db, crud.set_task_labels, task_id, current_user.id, update.label_ids)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
     
     if not task:
         raise HTTPException(
@@ -235,24 +710,55 @@ def revert_task_to_pending(
             detail="Tarea no encontrada"
         )
     
-    return task
+    return negotiation.NegotiatedJSONResponse(project_tasks([task], None, ("labels",))[0])
 
 
-@app.delete("/api/tasks/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_task(
-    task_id: int,
+# ========== ENDPOINTS DE ETIQUETAS ==========
+
+@app.post("/api/labels", response_model=schemas.LabelResponse, status_code=status.HTTP_201_CREATED)
+def create_label(
+    label: schemas.LabelCreate,
     current_user: models.User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    RF7: Eliminar permanentemente una tarea.
+    Crea una etiqueta para clasificar tareas (GET /api/tasks?labels=...).
+    """
+    if crud.get_label_by_name(db, current_user.id, label.name):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Ya existe una etiqueta con ese nombre"
+        )
+    
+    return group_commit.run(db, crud.create_label, label, current_user.id)
+
+
+@app.get("/api/labels", response_model=list[schemas.LabelResponse])
+def list_labels(
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(replicas.get_read_db)
+):
+    """
+    Lista las etiquetas del usuario ordenadas por nombre.
+    """
+    return crud.get_labels(db, current_user.id)
+
+
+@app.delete("/api/labels/{label_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_label(
+    label_id: int,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
     """
-    success = crud.delete_task(db, task_id, current_user.id)
+    Elimina una etiqueta; las tareas que la tenían la pierden.
+    """
+    success = group_commit.run(db, crud.delete_label, label_id, current_user.id)
     
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Tarea no encontrada"
+            detail="Etiqueta no encontrada"
         )
     
     return None
@@ -271,7 +777,7 @@ def create_reminder(
     
     Programa una notificación para la fecha/hora especificada.
     """
-    new_reminder = crud.create_reminder(db, reminder, current_user.id)
+    new_reminder = group_commit.run(db, crud.create_reminder, reminder, current_user.id)
     
     if not new_reminder:
         raise HTTPException(
@@ -284,13 +790,20 @@ def create_reminder(
 
 @app.get("/api/reminders", response_model=list[schemas.ReminderResponse])
 def list_reminders(
+    remind_from: Optional[datetime] = Query(None, alias="from"),
+    remind_to: Optional[datetime] = Query(None, alias="to"),
+    limit: Optional[int] = Query(None, ge=1, le=500),
     current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(replicas.get_read_db)
 ):
     """
-    Listar todos los recordatorios del usuario.
+    Listar los recordatorios del usuario ordenados por fecha.
+    
+    Parámetros:
+    - from / to: Ventana de fechas [from, to)
+    - limit: Máximo de recordatorios a retornar
     """
-    reminders = crud.get_reminders_by_user(db, current_user.id)
+    reminders = crud.get_reminders_by_user(db, current_user.id, remind_from, remind_to, limit)
     return reminders
 
 
@@ -315,8 +828,9 @@ def create_notification(
             detail="No puedes crear notificaciones para otros usuarios"
         )
     
-    new_notification = crud.create_notification(
-        db, 
+    new_notification = group_commit.run(
+        db,
+        crud.create_notification,
         notification.user_id, 
         notification.message, 
         notification.type
@@ -328,7 +842,7 @@ def create_notification(
 def list_notifications(
     limit: int = 50,
     current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(replicas.get_read_db)
 ):
     """
     Listar las notificaciones más recientes del usuario.
@@ -337,6 +851,130 @@ def list_notifications(
     return notifications
 
 
+@app.get("/api/notifications/unread-count", response_model=schemas.UnreadCountResponse)
+def get_unread_notifications_count(
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(replicas.get_read_db)
+):
+    """
+    Cantidad de notificaciones no leídas (para el badge).
+    Se lee del contador del usuario, sin recorrer sus notificaciones.
+    """
+    return {"unread": crud.get_unread_count(db, current_user.id)}
+
+
+@app.post("/api/notifications/mark-read", response_model=schemas.MarkReadResponse)
+def mark_notifications_read(
+    mark: schemas.NotificationMarkRead,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Marca como leídas, en un solo UPDATE, las notificaciones hasta `up_to_id`
+    y/o hasta `before` (todas si no se envía ninguno).
+    """
+    marked = group_commit.run(db, crud.mark_notifications_read, current_user.id, mark.up_to_id, mark.before)
+    return {"marked": marked, "unread": crud.get_unread_count(db, current_user.id)}
+
+
+# ========== ENDPOINT DE DASHBOARD ==========
+
+@app.get("/api/dashboard", response_model=schemas.DashboardResponse)
+def get_dashboard(
+    request: Request,
+    limit: int = Query(5, ge=1, le=50),
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(replicas.get_read_db)
+):
+    """
+    Pantalla de inicio en una sola petición: usuario, contadores (incluidas
+    las vencidas), próximas tareas, próximos recordatorios y últimas
+    notificaciones (`limit` de cada lista).
+    
+    Autentica una vez y usa una sola sesión. Responde con ETag; si el
+    cliente envía If-None-Match con el mismo valor se retorna 304 sin cuerpo.
+    """
+    data = crud.get_dashboard(db, current_user.id, datetime.utcnow(), limit)
+    content = schemas.DashboardResponse.model_validate(
+        {"user": current_user, **data}, from_attributes=True
+    ).model_dump(mode="json")
+    
+    etag = negotiation.entity_tag(content)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if negotiation.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return negotiation.NegotiatedJSONResponse(content, headers=headers)
+
+
+# ========== ENDPOINTS DE DIAGNÓSTICO ==========
+# Requieren DEBUG_ADMIN_TOKEN en el header X-Debug-Token (404 si no está configurado)
+
+@app.get("/api/_debug/profiles", dependencies=[Depends(debug.require_debug_token)])
+def list_profiles():
+    """
+    Perfiles guardados (sin las pilas), del más reciente al más antiguo.
+    """
+    return profiling.store.summaries()
+
+
+@app.get("/api/_debug/profiles/{request_id}", dependencies=[Depends(debug.require_debug_token)])
+def get_profile(request_id: str, format: str = "json"):
+    """
+    Perfil de una petición. Con ?format=collapsed retorna las pilas en texto
+    (una por línea con su número de muestras), listo para flamegraph.pl o speedscope.
+    """
+    if format not in ["json", "collapsed"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format debe ser 'json' o 'collapsed'"
+        )
+    
+    profile = profiling.store.get(request_id)
+    if not profile:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Perfil no encontrado"
+        )
+    
+    if format == "collapsed":
+        return PlainTextResponse(profiling.to_collapsed(profile))
+    return profile
+
+
+@app.get("/api/_debug/memory", dependencies=[Depends(debug.require_debug_token)])
+def memory_report(snapshot: bool = False):
+    """
+    Informe de memoria: RSS, memoria trazada, líneas que más crecieron entre
+    los dos últimos snapshots, picos por ruta e historial.
+    Con ?snapshot=true toma un snapshot en el momento (si el seguimiento está activo).
+    """
+    if snapshot and memory.tracker.running:
+        memory.tracker.take_snapshot()
+    return memory.tracker.report()
+
+
+@app.get("/api/_debug/slow-queries", dependencies=[Depends(debug.require_debug_token)])
+def slow_query_report(limit: int = Query(20, ge=1, le=500)):
+    """
+    Consultas que superaron SLOW_QUERY_THRESHOLD_MS, de mayor a menor tiempo total,
+    con sus endpoints de origen, parámetros redactados y plan de ejecución.
+    """
+    return {
+        "threshold_ms": slow_queries.log.threshold_ms,
+        "queries": slow_queries.log.top(limit),
+    }
+
+
+@app.get("/api/_debug/admission", dependencies=[Depends(debug.require_debug_token)])
+def admission_report():
+    """
+    Estado del control de admisión: límites, peticiones activas y en cola,
+    admitidas, rechazadas (cola llena / plazo vencido) y tiempos de espera por clase.
+    """
+    admission.controller.reload_if_changed()
+    return admission.controller.metrics()
+
+
 # ========== ENDPOINT DE ESTADO ==========
 
 @app.get("/")
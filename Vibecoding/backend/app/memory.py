@@ -0,0 +1,216 @@
+"""
+memory.py
+---------
+Seguimiento de memoria opcional para procesos de larga duración.
+
+Los workers crecen en RSS durante días sin que se sepa qué lo causa.
+Con MEMORY_TRACKING_ENABLED:
+- se toman snapshots de tracemalloc cada MEMORY_SNAPSHOT_INTERVAL_SECONDS
+  y se comparan con el anterior (líneas que más memoria sumaron)
+- una fracción de las peticiones mide su pico de asignación por ruta
+- /api/_debug/memory muestra el informe
+
+detect_growth() la usa también benchmarks/soak.py para fallar si la
+memoria no deja de crecer.
+"""
+
+import os
+import random
+import threading
+import time
+import tracemalloc
+from collections import deque
+from typing import Dict, List, Optional, Sequence
+
+MEMORY_TRACKING_ENABLED = os.getenv("MEMORY_TRACKING_ENABLED", "false").lower() == "true"
+SNAPSHOT_INTERVAL_SECONDS = float(os.getenv("MEMORY_SNAPSHOT_INTERVAL_SECONDS", "300"))
+# Fracción de peticiones con medición de pico (una a la vez: el pico de tracemalloc es global)
+ROUTE_SAMPLE_RATE = float(os.getenv("MEMORY_ROUTE_SAMPLE_RATE", "0.01"))
+TRACE_FRAMES = int(os.getenv("MEMORY_TRACE_FRAMES", "1"))
+TOP_N = 20
+MAX_HISTORY = 288
+
+_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def rss_bytes() -> Optional[int]:
+    """RSS actual del proceso (Linux), o None si no se puede leer"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def detect_growth(samples: Sequence[float], tolerance: float, min_samples: int = 4) -> bool:
+    """
+    True si la memoria sigue creciendo: la pendiente por mínimos cuadrados
+    supera `tolerance` por muestra y la segunda mitad está por encima de la primera.
+    Un calentamiento seguido de una meseta no cuenta como fuga.
+    """
+    if len(samples) < min_samples:
+        return False
+    n = len(samples)
+    mean_x = (n - 1) / 2
+    mean_y = sum(samples) / n
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(samples)) / sum(
+        (x - mean_x) ** 2 for x in range(n)
+    )
+    half = n // 2
+    return slope > tolerance and min(samples[half:]) > max(samples[:half])
+
+
+# ========== TRACKER ==========
+
+class MemoryTracker:
+    """Snapshots periódicos de tracemalloc y picos por ruta"""
+
+    def __init__(self, interval: float = SNAPSHOT_INTERVAL_SECONDS, frames: int = TRACE_FRAMES,
+                 top_n: int = TOP_N):
+        self.interval = interval
+        self.frames = frames
+        self.top_n = top_n
+        self.history: deque = deque(maxlen=MAX_HISTORY)
+        self.top_growth: List[dict] = []
+        self.routes: Dict[str, dict] = {}
+        self._previous = None
+        self._started_tracemalloc = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # Solo una petición mide su pico a la vez
+        self._route_slot = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self.running:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracemalloc = True
+        self._previous = self._snapshot()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-tracker", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._previous = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.take_snapshot()
+
+    @staticmethod
+    def _snapshot():
+        return tracemalloc.take_snapshot().filter_traces(_FILTERS)
+
+    def take_snapshot(self) -> dict:
+        """Toma un snapshot, lo compara con el anterior y lo agrega al historial"""
+        snapshot = self._snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        entry = {"time": time.time(), "traced_bytes": current, "traced_peak_bytes": peak, "rss_bytes": rss_bytes()}
+        with self._lock:
+            if self._previous is not None:
+                self.top_growth = [
+                    {
+                        "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                        "size_diff_bytes": stat.size_diff,
+                        "size_bytes": stat.size,
+                        "count_diff": stat.count_diff,
+                    }
+                    for stat in snapshot.compare_to(self._previous, "lineno")[:self.top_n]
+                    if stat.size_diff > 0
+                ]
+            self._previous = snapshot
+            self.history.append(entry)
+        return entry
+
+    # Picos por ruta
+
+    def begin_request(self) -> bool:
+        """Reserva la medición de pico para esta petición (si toca y está libre)"""
+        if not self.running or random.random() >= ROUTE_SAMPLE_RATE:
+            return False
+        if not self._route_slot.acquire(blocking=False):
+            return False
+        tracemalloc.reset_peak()
+        return True
+
+    def end_request(self, route: str, baseline: int):
+        try:
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            self._route_slot.release()
+        allocated = max(0, peak - baseline)
+        with self._lock:
+            stats = self.routes.setdefault(route, {"samples": 0, "max_peak_bytes": 0, "total_peak_bytes": 0})
+            stats["samples"] += 1
+            stats["total_peak_bytes"] += allocated
+            stats["max_peak_bytes"] = max(stats["max_peak_bytes"], allocated)
+
+    def report(self) -> dict:
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (None, None)
+        with self._lock:
+            routes = {
+                route: {
+                    "samples": stats["samples"],
+                    "max_peak_bytes": stats["max_peak_bytes"],
+                    "mean_peak_bytes": stats["total_peak_bytes"] // stats["samples"],
+                }
+                for route, stats in sorted(self.routes.items(), key=lambda item: -item[1]["max_peak_bytes"])
+            }
+            history = list(self.history)
+            top_growth = list(self.top_growth)
+        return {
+            "enabled": self.running,
+            "rss_bytes": rss_bytes(),
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "growing": detect_growth([entry["traced_bytes"] for entry in history], tolerance=0),
+            "top_growth": top_growth,
+            "routes": routes,
+            "history": history,
+        }
+
+
+tracker = MemoryTracker()
+
+
+# ========== MIDDLEWARE ==========
+
+class MemoryMiddleware:
+    """Middleware ASGI que mide el pico de asignación de peticiones muestreadas"""
+
+    def __init__(self, app, memory_tracker: MemoryTracker = tracker):
+        self.app = app
+        self.tracker = memory_tracker
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.tracker.running or not self.tracker.begin_request():
+            await self.app(scope, receive, send)
+            return
+
+        baseline, _ = tracemalloc.get_traced_memory()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # El router deja en el scope la ruta con sus parámetros sin resolver
+            route = scope.get("route")
+            path = getattr(route, "path", None) or scope["path"]
+            self.tracker.end_request(f"{scope['method']} {path}", baseline)
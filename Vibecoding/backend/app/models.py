@@ -5,7 +5,7 @@ Modelos ORM de SQLAlchemy que representan las entidades del sistema.
 Basado en el diseño de base de datos de QuickTask.
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, CheckConstraint
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Boolean, CheckConstraint, Index, Table, UniqueConstraint, event, select
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -43,6 +43,9 @@ class Task(Base):
     
     __table_args__ = (
         CheckConstraint("status IN ('pending', 'completed')", name='check_status'),
+        # Ventanas de vencimiento: próximas / vencidas (pendientes) y rangos de due_date
+        Index("ix_tasks_user_status_due", "user_id", "status", "due_date"),
+        Index("ix_tasks_user_due", "user_id", "due_date"),
     )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -53,6 +56,8 @@ class Task(Base):
     due_date = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Concurrencia optimista: cada UPDATE exige la versión leída y la incrementa
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     # Relación con User
     owner = relationship("User", back_populates="tasks")
@@ -60,10 +65,47 @@ class Task(Base):
     # Relación con Reminder (1:1 opcional)
     reminder = relationship("Reminder", back_populates="task", uselist=False, cascade="all, delete-orphan")
 
+    # Etiquetas (N:M vía task_labels)
+    labels = relationship("Label", secondary="task_labels", back_populates="tasks", order_by="Label.name")
+
     def __repr__(self):
         return f"<Task(id={self.id}, title={self.title}, status={self.status})>"
 
 
+# Asociación tarea-etiqueta
+task_labels = Table(
+    "task_labels",
+    Base.metadata,
+    Column("task_id", Integer, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True),
+    Column("label_id", Integer, ForeignKey("labels.id", ondelete="CASCADE"), primary_key=True),
+    # Tareas de una etiqueta (carga del índice de etiquetas)
+    Index("ix_task_labels_label", "label_id", "task_id"),
+)
+
+
+class Label(Base):
+    """
+    Modelo de Etiqueta.
+    Etiquetas de un usuario que se asignan a sus tareas (N:M).
+    """
+    __tablename__ = "labels"
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "name", name="uq_labels_user_name"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    name = Column(String, nullable=False)
+    color = Column(String, nullable=True)  # p. ej. #ff8800
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    tasks = relationship("Task", secondary="task_labels", back_populates="labels")
+
+    def __repr__(self):
+        return f"<Label(id={self.id}, name={self.name}, user_id={self.user_id})>"
+
+
 class Reminder(Base):
     """
     Modelo de Recordatorio.
@@ -71,8 +113,15 @@ class Reminder(Base):
     """
     __tablename__ = "reminders"
 
+    __table_args__ = (
+        # Ventana de recordatorios de un usuario, ya ordenada por remind_at
+        Index("ix_reminders_user_remind_at", "user_id", "remind_at"),
+    )
+
     id = Column(Integer, primary_key=True, autoincrement=True)
     task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), unique=True, nullable=False)
+    # Copia de tasks.user_id: la ventana se resuelve sin JOIN a tasks
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     remind_at = Column(DateTime, nullable=False)
     is_sent = Column(Boolean, default=False)
 
@@ -83,6 +132,13 @@ class Reminder(Base):
         return f"<Reminder(id={self.id}, task_id={self.task_id}, remind_at={self.remind_at})>"
 
 
+@event.listens_for(Reminder, "before_insert")
+def _reminder_user_from_task(mapper, connection, target):
+    """Completa user_id desde la tarea si no se indicó"""
+    if target.user_id is None:
+        target.user_id = connection.scalar(select(Task.user_id).where(Task.id == target.task_id))
+
+
 class Notification(Base):
     """
     Modelo de Notificación.
@@ -92,6 +148,14 @@ class Notification(Base):
     
     __table_args__ = (
         CheckConstraint("type IN ('email', 'push')", name='check_notification_type'),
+        CheckConstraint(
+            "status IN ('pending', 'sending', 'sent', 'dead')",
+            name='check_notification_status'
+        ),
+        # Índice del outbox: el worker reclama por estado y fecha de próximo intento
+        Index("ix_notifications_outbox", "status", "next_attempt_at"),
+        # Marcado masivo como leídas: no leídas de un usuario por id
+        Index("ix_notifications_user_unread", "user_id", "is_read", "id"),
     )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -100,8 +164,82 @@ class Notification(Base):
     type = Column(String, nullable=False)  # email | push
     sent_at = Column(DateTime, default=datetime.utcnow)
 
+    # Estado de entrega (outbox): pending | sending | sent | dead
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    claim_token = Column(String, nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
+    delivered_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+
+    # Estado de lectura (el contador por usuario está en notification_counters)
+    is_read = Column(Boolean, nullable=False, default=False, server_default="0")
+    read_at = Column(DateTime, nullable=True)
+
     # Relación con User
     user = relationship("User", back_populates="notifications")
 
     def __repr__(self):
         return f"<Notification(id={self.id}, type={self.type}, user_id={self.user_id})>"
+
+
+class NotificationCounter(Base):
+    """
+    Notificaciones no leídas por usuario.
+    Lo mantienen de forma incremental crear y marcar como leídas (ver crud.py).
+    """
+    __tablename__ = "notification_counters"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    unread = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<NotificationCounter(user_id={self.user_id}, unread={self.unread})>"
+
+
+class TaskActivity(Base):
+    """
+    Historial de cambios de tareas (solo se agregan filas).
+    Lo escribe en lotes el escritor en segundo plano de activity.py; sin FK a
+    tasks para que el historial sobreviva a la eliminación de la tarea.
+    """
+    __tablename__ = "task_activity"
+
+    __table_args__ = (
+        CheckConstraint(
+            "action IN ('created', 'updated', 'completed', 'reopened', 'deleted')",
+            name='check_activity_action'
+        ),
+        # Historial de una tarea, paginado por (ts, id)
+        Index("ix_task_activity_task_ts", "task_id", "ts"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    task_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    action = Column(String, nullable=False)
+    changes = Column(String, nullable=True)  # JSON con los campos modificados
+    ts = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<TaskActivity(task_id={self.task_id}, action={self.action}, ts={self.ts})>"
+
+
+class TaskDailyStat(Base):
+    """
+    Rollup diario de actividad de tareas por usuario.
+    Lo mantienen de forma incremental las mutaciones de crud (ver analytics.py).
+    """
+    __tablename__ = "task_daily_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    created = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+    reopened = Column(Integer, nullable=False, default=0)
+    due = Column(Integer, nullable=False, default=0)  # tareas con vencimiento ese día
+    due_pending = Column(Integer, nullable=False, default=0)  # de ellas, aún pendientes
+
+    def __repr__(self):
+        return f"<TaskDailyStat(user_id={self.user_id}, day={self.day}, created={self.created})>"
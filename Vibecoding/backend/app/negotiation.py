@@ -0,0 +1,228 @@
+"""
+negotiation.py
+--------------
+Negociación de contenido y compresión de respuestas.
+- Accept: application/msgpack -> respuestas en MessagePack (más compactas y rápidas de parsear)
+- Accept-Encoding: br / gzip -> compresión de respuestas grandes
+- ETag / If-None-Match -> validadores débiles para respuestas cacheables
+Se implementa como middleware ASGI puro más una clase de respuesta por defecto.
+"""
+
+import hashlib
+import json
+import zlib
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+import msgpack
+from fastapi.responses import JSONResponse
+
+try:  # Brotli es opcional: sin él solo se ofrece gzip
+    import brotli
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+
+# Tamaño mínimo (bytes) para comprimir una respuesta
+MINIMUM_COMPRESS_SIZE = 1024
+
+COMPRESSIBLE_TYPES = ("application/json", "application/msgpack", "text/")
+
+# Formato de respuesta negociado para la petición en curso
+response_format: ContextVar[str] = ContextVar("response_format", default="json")
+
+
+def _parse_accept(header: str) -> List[Tuple[str, float]]:
+    """Parsea un header Accept/Accept-Encoding en [(valor, q)]"""
+    items = []
+    for part in header.split(","):
+        pieces = part.strip().split(";")
+        value = pieces[0].strip().lower()
+        if not value:
+            continue
+        quality = 1.0
+        for param in pieces[1:]:
+            name, _, raw = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(raw)
+                except ValueError:
+                    quality = 0.0
+        items.append((value, quality))
+    return items
+
+
+def preferred_format(accept: str) -> str:
+    """Retorna 'msgpack' si el cliente lo prefiere (o lo acepta en igualdad) sobre JSON"""
+    msgpack_q = json_q = 0.0
+    for value, quality in _parse_accept(accept):
+        if value in MSGPACK_MEDIA_TYPES:
+            msgpack_q = max(msgpack_q, quality)
+        elif value in ("application/json", "application/*", "*/*"):
+            json_q = max(json_q, quality)
+    return "msgpack" if msgpack_q > 0 and msgpack_q >= json_q else "json"
+
+
+def preferred_encoding(accept_encoding: str) -> Optional[str]:
+    """Elige br o gzip según Accept-Encoding (br tiene prioridad en empate)"""
+    qualities = dict(_parse_accept(accept_encoding))
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_q = None, 0.0
+    for encoding in candidates:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_q:
+            best, best_q = encoding, quality
+    return best
+
+
+def entity_tag(content) -> str:
+    """
+    ETag débil del contenido (ya serializable a JSON) en el formato negociado.
+    Es débil porque la compresión cambia los bytes pero no la representación.
+    """
+    canonical = json.dumps(content, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    digest = hashlib.sha256(f"{response_format.get()}:{canonical}".encode("utf-8")).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Comparación débil de If-None-Match (lista de etags o *) contra etag"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+class NegotiatedJSONResponse(JSONResponse):
+    """
+    Respuesta por defecto de la API.
+    Serializa a MessagePack cuando la petición lo negoció, y a JSON en otro caso.
+    """
+
+    def render(self, content) -> bytes:
+        if response_format.get() == "msgpack":
+            self.media_type = MSGPACK_MEDIA_TYPE
+            return msgpack.packb(content, use_bin_type=True)
+        return super().render(content)
+
+    def init_headers(self, headers=None):
+        super().init_headers(headers)
+        # El cuerpo depende del header Accept (caches intermedias)
+        self.raw_headers.append((b"vary", b"Accept"))
+
+
+def convert_body(body: bytes, source: str, target: str) -> bytes:
+    """Re-serializa un cuerpo JSON <-> MessagePack (p. ej. una respuesta guardada)"""
+    if source == target:
+        return body
+    content = msgpack.unpackb(body, raw=False) if source == "msgpack" else json.loads(body)
+    if target == "msgpack":
+        return msgpack.packb(content, use_bin_type=True)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def media_type(response_format_name: str) -> str:
+    """Content-Type de un formato negociado"""
+    return MSGPACK_MEDIA_TYPE if response_format_name == "msgpack" else "application/json"
+
+
+class _Compressor:
+    """
+    Compresores reutilizables.
+    El estado inicial de zlib se crea una vez y se copia por respuesta,
+    evitando reinicializar las tablas de deflate en cada petición.
+    """
+
+    def __init__(self, gzip_level: int = 6, brotli_quality: int = 4):
+        self._gzip_template = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+        self.brotli_quality = brotli_quality
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        compressor = self._gzip_template.copy()
+        return compressor.compress(body) + compressor.flush()
+
+
+class ContentNegotiationMiddleware:
+    """
+    Middleware ASGI de negociación.
+    - Fija el formato de respuesta (JSON / MessagePack) según Accept.
+    - Comprime respuestas completas (no streaming) de al menos minimum_size bytes.
+    """
+
+    def __init__(self, app, minimum_size: int = MINIMUM_COMPRESS_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compressor = _Compressor()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {}
+        for name, value in scope["headers"]:
+            if name in (b"accept", b"accept-encoding"):
+                headers[name] = value.decode("latin-1")
+
+        token = response_format.set(preferred_format(headers.get(b"accept", "")))
+        encoding = preferred_encoding(headers.get(b"accept-encoding", ""))
+        try:
+            if encoding is None:
+                await self.app(scope, receive, send)
+            else:
+                await self.app(scope, receive, self._compressing_send(send, encoding))
+        finally:
+            response_format.reset(token)
+
+    def _compressing_send(self, send, encoding: str):
+        state = {"start": None, "passthrough": False}
+
+        async def wrapped_send(message):
+            if state["passthrough"]:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                return
+
+            start = state["start"]
+            body = message.get("body", b"")
+            if message.get("more_body", False) or not self._should_compress(start, body):
+                # Respuestas en streaming o pequeñas se envían tal cual
+                state["passthrough"] = True
+                await send(start)
+                await send(message)
+                return
+
+            compressed = self.compressor.compress(body, encoding)
+            headers = [
+                (name, value) for name, value in start["headers"]
+                if name not in (b"content-length", b"vary")
+            ]
+            headers += [
+                (b"content-encoding", encoding.encode("latin-1")),
+                (b"content-length", str(len(compressed)).encode("latin-1")),
+                (b"vary", b"Accept, Accept-Encoding"),
+            ]
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        return wrapped_send
+
+    def _should_compress(self, start, body: bytes) -> bool:
+        if len(body) < self.minimum_size:
+            return False
+        content_type = b""
+        for name, value in start["headers"]:
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value
+        return content_type.decode("latin-1").startswith(COMPRESSIBLE_TYPES)
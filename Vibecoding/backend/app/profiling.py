@@ -0,0 +1,225 @@
+"""
+profiling.py
+------------
+Perfilado bajo demanda de peticiones individuales, sin redesplegar.
+
+Una petición se perfila si trae el header X-Profile con DEBUG_ADMIN_TOKEN
+o si cae en la fracción PROFILING_SAMPLE_RATE. Mientras dura, un hilo
+muestrea las pilas (sys._current_frames) cada PROFILING_INTERVAL_MS, como
+pyinstrument. Muestrear otros hilos captura también los endpoints
+síncronos, que FastAPI ejecuta en su threadpool (sys.setprofile solo vería
+el hilo del event loop).
+
+Solo se cuentan los hilos que ejecutan trabajo de la petición perfilada:
+la petición marca su contexto (contextvars), que asyncio y el threadpool de
+AnyIO propagan, y el muestreador busca en cada pila el contexto que el hilo
+está corriendo. Con uvloop el paso de las tareas no tiene frame de Python,
+así que solo se atribuye lo que corre en el threadpool.
+
+Las pilas se guardan agregadas en formato "collapsed" (entrada de
+flamegraph.pl / speedscope), indexadas por un id generado en el servidor,
+y se consultan en /api/_debug/profiles. Se perfila una petición a la vez.
+Desactivado, el middleware solo deja pasar la petición.
+"""
+
+import contextvars
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional
+
+from . import debug
+
+SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "1"))
+MAX_PROFILES = int(os.getenv("PROFILING_MAX_PROFILES", "50"))
+
+MAX_DEPTH = 64
+# Hilos detenidos en estas funciones de la stdlib están esperando, no trabajando
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py")
+
+# Marca de la petición perfilada; se hereda en las tareas y trabajos del threadpool
+_profiled: contextvars.ContextVar = contextvars.ContextVar("profiled_request", default=None)
+
+
+# ========== PERFILADOR ==========
+
+def _label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame) -> Optional[str]:
+    """Pila como 'raíz;...;hoja', o None si el hilo está esperando"""
+    if frame.f_code.co_filename.endswith(_IDLE_FILES):
+        return None
+    labels = []
+    while frame is not None and len(labels) < MAX_DEPTH:
+        labels.append(_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def running_context(frame) -> Optional[contextvars.Context]:
+    """
+    Contexto que ejecuta la pila: el de un trabajo del threadpool de AnyIO
+    (WorkerThread.run: context.run(...)) o el de un paso de asyncio
+    (Handle._run: self._context.run(...)). None si no se encuentra.
+    """
+    while frame is not None:
+        if frame.f_code.co_name in ("run", "_run"):
+            scope = frame.f_locals
+            context = scope.get("context")
+            if not isinstance(context, contextvars.Context):
+                context = getattr(scope.get("self"), "_context", None)
+            if isinstance(context, contextvars.Context):
+                return context
+        frame = frame.f_back
+    return None
+
+
+class SamplingProfiler:
+    """
+    Perfilador estadístico: cuenta cuántas veces aparece cada pila.
+    Con `marker`, solo muestrea los hilos cuyo contexto lleva esa marca.
+    """
+
+    def __init__(self, interval: float = INTERVAL_MS / 1000, marker: Optional[object] = None):
+        self.interval = interval
+        self.marker = marker
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if self.marker is not None and not self._belongs(frame):
+                    continue
+                stack = collapse_stack(frame)
+                if stack is not None:
+                    self.samples[stack] += 1
+
+    def _belongs(self, frame) -> bool:
+        context = running_context(frame)
+        return context is not None and context.get(_profiled) is self.marker
+
+
+# ========== ALMACÉN DE PERFILES ==========
+
+class ProfileStore:
+    """Últimos perfiles por id (los más antiguos se descartan)"""
+
+    def __init__(self, max_profiles: int = MAX_PROFILES):
+        self.max_profiles = max_profiles
+        self._profiles: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: dict):
+        with self._lock:
+            self._profiles[profile["request_id"]] = profile
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+    def get(self, request_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._profiles.get(request_id)
+
+    def summaries(self) -> List[dict]:
+        """Perfiles sin las pilas, del más reciente al más antiguo"""
+        with self._lock:
+            return [
+                {key: value for key, value in profile.items() if key != "stacks"}
+                for profile in reversed(self._profiles.values())
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+store = ProfileStore()
+
+
+def to_collapsed(profile: dict) -> str:
+    """Texto 'pila cuenta' por línea (formato de flamegraph.pl)"""
+    return "".join(f"{stack} {count}\n" for stack, count in profile["stacks"].items())
+
+
+# ========== MIDDLEWARE ==========
+
+class ProfilingMiddleware:
+    """Middleware ASGI que perfila las peticiones pedidas o muestreadas"""
+
+    def __init__(self, app, profile_store: ProfileStore = store):
+        self.app = app
+        self.store = profile_store
+        self._busy = threading.Lock()
+
+    def _wanted(self, headers: Dict[bytes, bytes]) -> bool:
+        token = headers.get(b"x-profile")
+        if token is not None and debug.is_admin_token(token.decode("latin-1")):
+            return True
+        return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (debug.DEBUG_ADMIN_TOKEN or SAMPLE_RATE > 0):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        if not self._wanted(headers) or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        # El id lo genera el servidor: un X-Request-ID del cliente no puede pisar otro perfil
+        request_id = uuid.uuid4().hex
+        client_request_id = headers.get(b"x-request-id", b"").decode("latin-1")[:64] or None
+        status_code = 500
+
+        async def profiled_send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", request_id.encode())]}
+            await send(message)
+
+        marker = object()
+        token = _profiled.set(marker)
+        profiler = SamplingProfiler(marker=marker)
+        started_at = time.time()
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, profiled_send)
+        finally:
+            samples = profiler.stop()
+            _profiled.reset(token)
+            self._busy.release()
+            self.store.add({
+                "request_id": request_id,
+                "client_request_id": client_request_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status_code,
+                "started_at": started_at,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                "interval_ms": profiler.interval * 1000,
+                "samples": sum(samples.values()),
+                "stacks": dict(samples.most_common()),
+            })
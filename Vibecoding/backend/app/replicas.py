@@ -0,0 +1,104 @@
+"""
+replicas.py
+-----------
+Enrutado de lecturas a una réplica (REPLICA_DATABASE_URL).
+
+Los GET usan get_read_db: reciben una sesión de la réplica, salvo que el
+usuario haya escrito hace menos de READ_AFTER_WRITE_SECONDS segundos; en
+ese caso leen del primario y ven sus propios cambios (read-your-writes)
+aunque la réplica vaya retrasada. Las escrituras siempre usan get_db.
+
+El pin se registra al confirmar cualquier sesión que haya escrito para un
+usuario (session.info['user_id'], fijado por get_current_user). Es local
+al proceso: con varios workers conviene enrutar por usuario (sticky).
+"""
+
+import os
+import threading
+import time
+from typing import Dict
+
+from fastapi import Depends
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import auth, database, models
+from .database import get_db
+from .sharding import route_to_user
+
+# Ventana tras una escritura en la que el usuario lee del primario
+READ_AFTER_WRITE_SECONDS = float(os.getenv("READ_AFTER_WRITE_SECONDS", "5"))
+
+
+class ReadPins:
+    """Usuarios que escribieron recientemente y deben leer del primario"""
+
+    def __init__(self, seconds: float = READ_AFTER_WRITE_SECONDS):
+        self.seconds = seconds
+        self._until: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def pin(self, user_id: int):
+        with self._lock:
+            self._until[user_id] = time.monotonic() + self.seconds
+
+    def is_pinned(self, user_id: int) -> bool:
+        until = self._until.get(user_id)
+        if until is None:
+            return False
+        if until > time.monotonic():
+            return True
+        with self._lock:
+            if self._until.get(user_id) == until:
+                del self._until[user_id]
+        return False
+
+    def clear(self):
+        with self._lock:
+            self._until.clear()
+
+
+pins = ReadPins()
+
+
+# ========== REGISTRO DE ESCRITURAS ==========
+
+@event.listens_for(Session, "after_flush")
+def _remember_writer(session, flush_context):
+    user_id = session.info.get("user_id")
+    if user_id is not None:
+        session.info.setdefault("written_users", set()).add(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _pin_writers(session):
+    for user_id in session.info.pop("written_users", ()):
+        pins.pin(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_writers(session):
+    session.info.pop("written_users", None)
+
+
+# ========== DEPENDENCY ==========
+
+def get_read_db(
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Dependency para endpoints de solo lectura.
+    Entrega la réplica si está configurada y el usuario no tiene un pin
+    de lectura tras escritura; en otro caso, la sesión del primario.
+    """
+    if database.ReplicaSessionLocal is None or pins.is_pinned(current_user.id):
+        yield db
+        return
+
+    replica = database.ReplicaSessionLocal()
+    route_to_user(replica, current_user.id)
+    try:
+        yield replica
+    finally:
+        replica.close()
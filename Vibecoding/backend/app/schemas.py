@@ -5,9 +5,12 @@ Esquemas Pydantic para validación de datos de entrada/salida.
 Define los contratos de la API REST.
 """
 
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
-from datetime import datetime
+import json
+
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, create_model, field_validator
+from typing import Optional, Tuple, Type
+from datetime import date, datetime
+from functools import lru_cache
 
 
 # ========== USER SCHEMAS ==========
@@ -62,6 +65,11 @@ class TaskUpdate(BaseModel):
     status: Optional[str] = Field(None, pattern="^(pending|completed)$")
 
 
+class TaskImportRow(TaskCreate):
+    """Fila de importación masiva: reglas de TaskCreate más el estado opcional"""
+    status: str = Field("pending", pattern="^(pending|completed)$")
+
+
 class TaskResponse(TaskBase):
     """Schema de respuesta con datos completos de tarea"""
     id: int
@@ -69,11 +77,47 @@ class TaskResponse(TaskBase):
     created_at: datetime
     updated_at: datetime
     user_id: int
+    version: int
 
     class Config:
         from_attributes = True
 
 
+# Campos seleccionables con ?fields= (en el orden de TaskResponse)
+TASK_FIELDS = tuple(TaskResponse.model_fields)
+
+# Recursos relacionados embebibles con ?include=
+TASK_INCLUDES = ("reminder", "labels")
+
+
+@lru_cache(maxsize=128)
+def task_projection(fields: Optional[Tuple[str, ...]], include: Tuple[str, ...] = ()) -> Type[BaseModel]:
+    """
+    Modelo de respuesta con solo los campos pedidos en ?fields= (todos si es None)
+    y los recursos de ?include= anidados. Se deriva de TaskResponse y se cachea.
+    """
+    fields = fields or TASK_FIELDS
+    definitions = {
+        name: (TaskResponse.model_fields[name].annotation, TaskResponse.model_fields[name])
+        for name in fields
+    }
+    if "reminder" in include:
+        definitions["reminder"] = (Optional[ReminderResponse], None)
+    if "labels" in include:
+        definitions["labels"] = (list[LabelResponse], [])
+    return create_model(
+        "TaskResponse_" + "_".join(fields + include),
+        __config__=ConfigDict(from_attributes=True),
+        **definitions
+    )
+
+
+class TaskSuggestion(BaseModel):
+    """Sugerencia de autocompletado de títulos"""
+    id: int
+    title: str
+
+
 class TaskListResponse(BaseModel):
     """Schema para listado paginado de tareas"""
     tasks: list[TaskResponse]
@@ -82,6 +126,68 @@ class TaskListResponse(BaseModel):
     completed: int
 
 
+class AnalyticsBucket(BaseModel):
+    """Contadores de tareas de un intervalo (día o semana)"""
+    period_start: date
+    created: int
+    completed: int
+    reopened: int
+    due: int
+    overdue: int
+
+
+class TaskAnalyticsResponse(BaseModel):
+    """Series temporales de actividad de tareas (RF14 extendido)"""
+    granularity: str
+    start: date
+    end: date
+    buckets: list[AnalyticsBucket]
+
+
+class ImportRowError(BaseModel):
+    """Error de validación o inserción de una fila importada"""
+    row: int
+    errors: list[str]
+
+
+class ImportJobResponse(BaseModel):
+    """Estado y progreso de una importación masiva de tareas"""
+    job_id: str
+    status: str  # running | completed | failed
+    processed: int
+    inserted: int
+    failed: int
+    errors: list[ImportRowError]
+    bytes_received: int
+    total_bytes: Optional[int] = None
+    detail: Optional[str] = None
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+class TaskActivityResponse(BaseModel):
+    """Un cambio del historial de una tarea"""
+    id: int
+    task_id: int
+    action: str  # created | updated | completed | reopened | deleted
+    changes: Optional[dict] = None
+    ts: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @field_validator("changes", mode="before")
+    @classmethod
+    def _parse_changes(cls, value):
+        # Se guarda como JSON en texto
+        return json.loads(value) if isinstance(value, str) else value
+
+
+class TaskHistoryResponse(BaseModel):
+    """Página del historial; next_cursor es None en la última"""
+    items: list[TaskActivityResponse]
+    next_cursor: Optional[str] = None
+
+
 # ========== REMINDER SCHEMAS ==========
 
 class ReminderCreate(BaseModel):
@@ -101,6 +207,29 @@ class ReminderResponse(BaseModel):
         from_attributes = True
 
 
+# ========== LABEL SCHEMAS ==========
+
+class LabelCreate(BaseModel):
+    """Schema para crear etiqueta"""
+    name: str = Field(..., min_length=1, max_length=50, pattern=r"^[^,]+$")
+    color: Optional[str] = Field(None, pattern="^#[0-9a-fA-F]{6}$")
+
+
+class LabelResponse(BaseModel):
+    """Schema de respuesta de etiqueta"""
+    id: int
+    name: str
+    color: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class TaskLabelsUpdate(BaseModel):
+    """Etiquetas de una tarea (reemplaza las actuales)"""
+    label_ids: list[int] = Field(..., max_length=50)
+
+
 # ========== NOTIFICATION SCHEMAS ==========
 
 class NotificationCreate(BaseModel):
@@ -117,11 +246,56 @@ class NotificationResponse(BaseModel):
     message: str
     type: str
     sent_at: datetime
+    status: str
+    attempts: int
+    delivered_at: Optional[datetime] = None
+    is_read: bool
+    read_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
 
+class NotificationMarkRead(BaseModel):
+    """
+    Marcado masivo como leídas: hasta un id y/o hasta una fecha (inclusive).
+    Sin ninguno de los dos se marcan todas.
+    """
+    up_to_id: Optional[int] = Field(None, ge=1)
+    before: Optional[datetime] = None
+
+
+class UnreadCountResponse(BaseModel):
+    """Contador de notificaciones no leídas"""
+    unread: int
+
+
+class MarkReadResponse(BaseModel):
+    """Resultado del marcado masivo"""
+    marked: int
+    unread: int
+
+
+# ========== DASHBOARD SCHEMAS ==========
+
+class DashboardStats(BaseModel):
+    """Contadores de tareas del usuario"""
+    total: int
+    pending: int
+    completed: int
+    overdue: int
+
+
+class DashboardResponse(BaseModel):
+    """Pantalla de inicio en una sola respuesta"""
+    user: UserResponse
+    stats: DashboardStats
+    upcoming: list[TaskResponse]
+    reminders: list[ReminderResponse]
+    notifications: list[NotificationResponse]
+    unread_notifications: int
+
+
 # ========== GENERAL SCHEMAS ==========
 
 class MessageResponse(BaseModel):
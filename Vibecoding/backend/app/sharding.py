@@ -0,0 +1,314 @@
+"""
+sharding.py
+-----------
+Particionado (sharding) de datos por usuario sobre varias bases de datos.
+
+- Directorio: la BD principal conserva la tabla users, la ubicación de cada
+  usuario (user_shards) y los bloques de ids globales (id_blocks).
+- Shards: tareas, recordatorios, notificaciones y demás datos por usuario
+  viven en una de N bases, elegida por user_id.
+
+El enrutado ocurre en RoutingSession.get_bind(): get_db entrega una sesión
+enrutable y get_current_user la fija al usuario autenticado, de modo que
+crud y los endpoints no cambian.
+"""
+
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import (
+    Column, Integer, MetaData, String, Table, delete, event, func, insert,
+    inspect, select, update
+)
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Mapper, Session, object_mapper
+from sqlalchemy.sql.util import find_tables
+
+# Tablas propias del directorio (no existen en modo sin sharding)
+directory_metadata = MetaData()
+
+user_shards = Table(
+    "user_shards",
+    directory_metadata,
+    Column("user_id", Integer, primary_key=True),
+    Column("shard", Integer, nullable=False),
+)
+
+id_blocks = Table(
+    "id_blocks",
+    directory_metadata,
+    Column("name", String, primary_key=True),
+    Column("next_id", Integer, nullable=False),
+)
+
+# Tablas que se quedan en el directorio; el resto se reparte por usuario
+DIRECTORY_TABLES = frozenset({"users", "user_shards", "id_blocks"})
+
+# Ids reservados por cada acceso al directorio
+ID_BLOCK_SIZE = 1000
+
+
+class ShardRoutingError(RuntimeError):
+    """La sesión intentó acceder a datos de un shard sin usuario ni shard fijado"""
+
+
+# ========== IDS GLOBALES ==========
+
+class IdAllocator:
+    """
+    Reparte ids únicos entre todos los shards (esquema hi/lo).
+    Reserva bloques en id_blocks del directorio y los consume en memoria,
+    así un usuario puede moverse de shard sin colisiones de clave primaria.
+    """
+
+    def __init__(self, router: "ShardRouter", block_size: int = ID_BLOCK_SIZE):
+        self.router = router
+        self.block_size = block_size
+        self._blocks: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def _current_max(self, name: str) -> int:
+        engines = list(self.router.shards) + [self.router.directory_engine]
+        current = 0
+        for engine in engines:
+            if not inspect(engine).has_table(name):
+                continue
+            with engine.connect() as conn:
+                value = conn.execute(select(func.max(self.router.metadata.tables[name].c.id))).scalar()
+            current = max(current, value or 0)
+        return current
+
+    def _reserve(self, name: str, size: int) -> int:
+        """Reserva [start, start + size) de forma atómica en el directorio"""
+        with self.router.directory_engine.begin() as conn:
+            # El UPDATE primero toma el lock de escritura: lectura y reserva son atómicas
+            result = conn.execute(
+                update(id_blocks)
+                .where(id_blocks.c.name == name)
+                .values(next_id=id_blocks.c.next_id + size)
+            )
+            if result.rowcount:
+                return conn.execute(
+                    select(id_blocks.c.next_id).where(id_blocks.c.name == name)
+                ).scalar() - size
+            start = self._current_max(name) + 1
+            conn.execute(insert(id_blocks).values(name=name, next_id=start + size))
+            return start
+
+    def allocate(self, name: str, count: int) -> List[int]:
+        """Retorna count ids nuevos para la tabla"""
+        with self._lock:
+            block = self._blocks.setdefault(name, [0, 0])  # [siguiente, fin)
+            if block[1] - block[0] < count:
+                size = max(self.block_size, count)
+                start = self._reserve(name, size)
+                block[0], block[1] = start, start + size
+            ids = list(range(block[0], block[0] + count))
+            block[0] += count
+            return ids
+
+
+# ========== ROUTER ==========
+
+class ShardRouter:
+    """Conoce el directorio, los shards y en qué shard vive cada usuario"""
+
+    def __init__(self, directory_engine: Engine, shard_engines: List[Engine], metadata: MetaData):
+        if not shard_engines:
+            raise ValueError("Se necesita al menos un shard")
+        self.directory_engine = directory_engine
+        self.shards = list(shard_engines)
+        self.metadata = metadata
+        self.ids = IdAllocator(self)
+        self._placements: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def shard_tables(self) -> List[Table]:
+        """Tablas repartidas por usuario, en orden de dependencias"""
+        return [t for t in self.metadata.sorted_tables if t.name not in DIRECTORY_TABLES]
+
+    def create_all(self):
+        """Crea las tablas del directorio y de cada shard"""
+        directory_tables = [t for t in self.metadata.sorted_tables if t.name in DIRECTORY_TABLES]
+        self.metadata.create_all(bind=self.directory_engine, tables=directory_tables)
+        directory_metadata.create_all(bind=self.directory_engine)
+        for engine in self.shards:
+            self.metadata.create_all(bind=engine, tables=self.shard_tables)
+
+    def default_shard(self, user_id: int) -> int:
+        return user_id % len(self.shards)
+
+    def shard_for_user(self, user_id: int) -> int:
+        """Shard del usuario: ubicación explícita del directorio o hash por defecto"""
+        shard = self._placements.get(user_id)
+        if shard is not None:
+            return shard
+        with self.directory_engine.connect() as conn:
+            shard = conn.execute(
+                select(user_shards.c.shard).where(user_shards.c.user_id == user_id)
+            ).scalar()
+        if shard is None or shard >= len(self.shards):
+            shard = self.default_shard(user_id)
+        with self._lock:
+            self._placements[user_id] = shard
+        return shard
+
+    def engine_for_user(self, user_id: int) -> Engine:
+        return self.shards[self.shard_for_user(user_id)]
+
+    def place_user(self, user_id: int, shard: int):
+        """Registra la ubicación explícita de un usuario en el directorio"""
+        with self.directory_engine.begin() as conn:
+            updated = conn.execute(
+                update(user_shards).where(user_shards.c.user_id == user_id).values(shard=shard)
+            ).rowcount
+            if not updated:
+                conn.execute(insert(user_shards).values(user_id=user_id, shard=shard))
+        with self._lock:
+            self._placements[user_id] = shard
+
+    def forget(self, user_id: Optional[int] = None):
+        """Invalida la caché de ubicaciones (tras un rebalanceo)"""
+        with self._lock:
+            if user_id is None:
+                self._placements.clear()
+            else:
+                self._placements.pop(user_id, None)
+
+
+# ========== SESIÓN ENRUTABLE ==========
+
+def _tables_of(mapper, clause) -> List[Table]:
+    if mapper is not None:
+        if not isinstance(mapper, Mapper):
+            mapper = inspect(mapper)
+        return list(mapper.tables)
+    if clause is not None:
+        return [t for t in find_tables(clause, include_crud=True) if isinstance(t, Table)]
+    return []
+
+
+class RoutingSession(Session):
+    """
+    Sesión que elige el engine por sentencia:
+    - solo tablas del directorio -> directorio
+    - cualquier otra -> shard del usuario fijado (info['user_id']) o shard fijado (info['shard'])
+    """
+
+    def __init__(self, router: ShardRouter = None, **kwargs):
+        super().__init__(**kwargs)
+        self.router = router
+
+    def get_bind(self, mapper=None, *, clause=None, **kwargs):
+        tables = _tables_of(mapper, clause)
+        if tables and all(table.name in DIRECTORY_TABLES for table in tables):
+            return self.router.directory_engine
+
+        shard = self.info.get("shard")
+        if shard is not None:
+            return self.router.shards[shard]
+        user_id = self.info.get("user_id")
+        if user_id is None:
+            raise ShardRoutingError(
+                "Sesión sin usuario: use route_to_user() antes de acceder a datos por usuario"
+            )
+        return self.router.engine_for_user(user_id)
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _assign_global_ids(session, flush_context, instances):
+    """Asigna ids globales a las filas nuevas de tablas repartidas"""
+    for obj in session.new:
+        table = object_mapper(obj).local_table
+        if table.name in DIRECTORY_TABLES or "id" not in table.c or getattr(obj, "id", None) is not None:
+            continue
+        obj.id = session.router.ids.allocate(table.name, 1)[0]
+
+
+def route_to_user(db: Session, user_id: int):
+    """Asocia la sesión a un usuario; con sharding además la fija a su shard"""
+    db.info["user_id"] = user_id
+
+
+def route_to_shard(db: Session, shard: int):
+    """Fija la sesión a un shard concreto (workers y tareas de mantenimiento)"""
+    if isinstance(db, RoutingSession):
+        db.info["shard"] = shard
+
+
+def assign_ids(db: Session, table: Table, rows: List[dict]):
+    """Asigna ids globales a filas de un insert masivo de Core (no-op sin sharding)"""
+    if isinstance(db, RoutingSession) and table.name not in DIRECTORY_TABLES:
+        for row, new_id in zip(rows, db.router.ids.allocate(table.name, len(rows))):
+            row["id"] = new_id
+
+
+# ========== MIGRACIÓN Y REBALANCEO ==========
+
+def _user_filter(table: Table, user_id: int, task_ids: List[int]):
+    if "user_id" in table.c:
+        return table.c.user_id == user_id
+    if "task_id" in table.c:
+        return table.c.task_id.in_(task_ids)
+    return None
+
+
+def move_user(tables: Iterable[Table], source: Engine, target: Engine, user_id: int) -> int:
+    """
+    Copia los datos de un usuario de un engine a otro conservando los ids.
+    Retorna el número de filas copiadas. El llamador actualiza la ubicación
+    y después borra el origen con delete_user_data().
+    """
+    tables = list(tables)
+    moved = 0
+    with source.connect() as src:
+        task_table = next(t for t in tables if t.name == "tasks")
+        task_ids = [row[0] for row in src.execute(
+            select(task_table.c.id).where(task_table.c.user_id == user_id)
+        )]
+        with target.begin() as dst:
+            for table in tables:
+                condition = _user_filter(table, user_id, task_ids)
+                if condition is None or not inspect(source).has_table(table.name):
+                    continue
+                rows = [dict(row._mapping) for row in src.execute(select(table).where(condition))]
+                if rows:
+                    dst.execute(insert(table), rows)
+                    moved += len(rows)
+    return moved
+
+
+def delete_user_data(tables: Iterable[Table], engine: Engine, user_id: int):
+    """Borra los datos de un usuario de un engine (hijas antes que padres)"""
+    tables = list(tables)
+    with engine.begin() as conn:
+        task_table = next(t for t in tables if t.name == "tasks")
+        task_ids = [row[0] for row in conn.execute(
+            select(task_table.c.id).where(task_table.c.user_id == user_id)
+        )]
+        for table in reversed(tables):
+            condition = _user_filter(table, user_id, task_ids)
+            if condition is not None and inspect(engine).has_table(table.name):
+                conn.execute(delete(table).where(condition))
+
+
+def rebalance(source: ShardRouter, target: ShardRouter, user_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    Mueve a cada usuario de su shard en `source` a su shard por defecto en `target`
+    (mismo directorio, distinto número de shards). Retorna {user_id: filas movidas}.
+    """
+    moved = {}
+    for user_id in user_ids:
+        old_engine = source.engine_for_user(user_id)
+        new_shard = target.default_shard(user_id)
+        new_engine = target.shards[new_shard]
+        if old_engine.url == new_engine.url:
+            target.place_user(user_id, new_shard)
+            continue
+        # 1) copiar, 2) apuntar el directorio al nuevo shard, 3) borrar del origen
+        moved[user_id] = move_user(target.shard_tables, old_engine, new_engine, user_id)
+        target.place_user(user_id, new_shard)
+        delete_user_data(target.shard_tables, old_engine, user_id)
+    source.forget()
+    return moved
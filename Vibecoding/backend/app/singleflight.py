@@ -0,0 +1,169 @@
+"""
+singleflight.py
+---------------
+Agrupación de lecturas idénticas concurrentes (single-flight).
+
+Los dashboards abren varias pestañas y los clientes repiten el mismo
+GET /api/tasks?... en el mismo instante; cada uno ejecutaba las mismas
+consultas. Con este middleware, los GET idénticos que llegan mientras uno
+está en curso (mismo usuario, ruta, query string y formato de respuesta)
+esperan a esa ejecución y reciben una copia de su respuesta.
+
+- La ejecución compartida corre en su propia tarea: si el cliente que la
+  inició se desconecta, los demás siguen esperándola; solo se cancela
+  cuando ya no queda nadie esperando.
+- Read-your-writes: cada escritura de un usuario (al empezar y al terminar)
+  cambia su generación, que forma parte de la clave, así que una lectura
+  posterior a una escritura nunca reutiliza una ejecución anterior a ella.
+"""
+
+import asyncio
+import os
+from typing import Dict, Optional
+
+from . import auth, negotiation
+
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+
+# Lecturas que se agrupan (las exportaciones en streaming y los diagnósticos no)
+COALESCED_PATHS = frozenset({
+    "/api/tasks",
+    "/api/tasks/upcoming",
+    "/api/tasks/overdue",
+    "/api/tasks/analytics",
+    "/api/tasks/suggest",
+    "/api/reminders",
+    "/api/notifications",
+    "/api/notifications/unread-count",
+    "/api/dashboard",
+})
+COALESCED_PREFIXES = ("/api/tasks/",)
+EXCLUDED_PREFIXES = ("/api/tasks/export", "/api/tasks/import")
+
+SHARED_HEADER = (b"x-singleflight", b"shared")
+
+# Ejecuciones iniciadas y peticiones que se sumaron a una ya en curso
+counters = {"started": 0, "coalesced": 0}
+
+
+def is_coalesced(path: str) -> bool:
+    if path in COALESCED_PATHS:
+        return True
+    return path.startswith(COALESCED_PREFIXES) and not path.startswith(EXCLUDED_PREFIXES)
+
+
+class _Flight:
+    """Una ejecución en curso y cuántas peticiones la esperan"""
+
+    __slots__ = ("task", "waiters", "response")
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        self.response: Optional[dict] = None
+
+
+class SingleFlightMiddleware:
+    """
+    Middleware ASGI de single-flight para los GET autenticados de COALESCED_PATHS.
+    Debe ir dentro de ContentNegotiationMiddleware (la respuesta capturada
+    es la del formato ya elegido, antes de comprimir).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._flights: Dict[tuple, _Flight] = {}
+        self._generations: Dict[str, int] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not SINGLEFLIGHT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        user = auth.token_subject(headers.get(b"authorization", b""))
+        if user is None:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] != "GET":
+            await self._write(user, scope, receive, send)
+            return
+        if not is_coalesced(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        key = (
+            user, self._generations.get(user, 0), scope["path"], scope["query_string"],
+            negotiation.response_format.get(), headers.get(b"if-none-match"),
+        )
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            # El scope es el de la primera petición: los middlewares externos ven la ruta resuelta
+            flight.task = asyncio.create_task(self._execute(scope, flight))
+            flight.task.add_done_callback(lambda _: self._finish(key, flight))
+            counters["started"] += 1
+        else:
+            counters["coalesced"] += 1
+
+        flight.waiters += 1
+        try:
+            await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            # Este cliente dejó de esperar; la ejecución sigue si hay otros
+            if not flight.task.done() and flight.waiters == 1:
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+        response = flight.response
+        start_headers = list(response["headers"])
+        if shared:
+            start_headers.append(SHARED_HEADER)
+        await send({"type": "http.response.start", "status": response["status"], "headers": start_headers})
+        await send({"type": "http.response.body", "body": response["body"]})
+
+    def _finish(self, key: tuple, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _bump(self, user: str):
+        self._generations[user] = self._generations.get(user, 0) + 1
+
+    async def _write(self, user: str, scope, receive, send):
+        """Las escrituras invalidan las ejecuciones en curso del usuario para lecturas futuras"""
+        self._bump(user)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._bump(user)
+
+    async def _execute(self, scope, flight: _Flight):
+        """Ejecuta la petición sin cliente propio, capturando la respuesta completa"""
+        request_sent = False
+        captured = {"status": 500, "headers": [], "body": []}
+
+        async def shared_receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            # No hay un cliente único al que vigilar: se espera hasta la cancelación
+            await asyncio.Event().wait()
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                captured["status"] = message["status"]
+                captured["headers"] = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                captured["body"].append(message.get("body", b""))
+
+        await self.app(scope, shared_receive, capture)
+        flight.response = {
+            "status": captured["status"],
+            "headers": captured["headers"],
+            "body": b"".join(captured["body"]),
+        }
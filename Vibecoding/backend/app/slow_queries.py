@@ -0,0 +1,218 @@
+"""
+slow_queries.py
+---------------
+Registro de consultas lentas con su plan de ejecución.
+
+Cada sentencia que supera SLOW_QUERY_THRESHOLD_MS se registra con:
+- el SQL normalizado (espacios y listas IN colapsadas)
+- los parámetros redactados (los textos solo muestran su longitud)
+- la duración y el endpoint que la originó
+- el plan capturado con EXPLAIN QUERY PLAN (SQLite) o EXPLAIN (PostgreSQL)
+
+Se conserva un top-N por tiempo total en memoria, expuesto en
+/api/_debug/slow-queries, para que regresiones como un LIKE que recorre
+toda la tabla aparezcan de inmediato. El plan se captura una sola vez por
+sentencia normalizada.
+"""
+
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# 0 = desactivado
+THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+TOP_N = int(os.getenv("SLOW_QUERY_TOP_N", "50"))
+
+MAX_SQL_LENGTH = 2000
+_EXPLAIN_PREFIX = {"sqlite": "EXPLAIN QUERY PLAN ", "postgresql": "EXPLAIN "}
+_EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")
+
+_WHITESPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))+\s*\)")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+# Scope ASGI de la petición en curso (para saber el endpoint de origen)
+_scope: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("slow_query_scope", default=None)
+
+
+def normalize_sql(statement: str) -> str:
+    """SQL sin literales ni listas IN variables, en una línea"""
+    sql = _STRING.sub("?", statement)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("(?, ...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()[:MAX_SQL_LENGTH]
+
+
+def _redact(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__} len={len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def redact_parameters(parameters):
+    """Parámetros sin textos ni binarios (pueden ser emails, hashes o descripciones)"""
+    if isinstance(parameters, dict):
+        return {key: _redact(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (list, tuple, dict)):
+            return f"<executemany x{len(parameters)}>"
+        return [_redact(value) for value in parameters]
+    return _redact(parameters)
+
+
+def current_endpoint() -> Optional[str]:
+    scope = _scope.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    return f"{scope['method']} {getattr(route, 'path', None) or scope['path']}"
+
+
+# ========== REGISTRO ==========
+
+class SlowQueryLog:
+    """Consultas lentas agregadas por SQL normalizado (top-N por tiempo total)"""
+
+    def __init__(self, threshold_ms: float = THRESHOLD_MS, top_n: int = TOP_N):
+        self.threshold_ms = threshold_ms
+        self.top_n = top_n
+        self._entries: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def needs_plan(self, sql: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(sql)
+            return entry is None or entry["plan"] is None
+
+    def record(self, sql: str, duration_ms: float, parameters, endpoint: Optional[str],
+               plan: Optional[List[str]] = None):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(sql)
+            if entry is None:
+                entry = self._entries[sql] = {
+                    "sql": sql, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "endpoints": [], "plan": None, "full_scan": False, "first_seen": now,
+                }
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["last_ms"] = duration_ms
+            entry["last_seen"] = now
+            entry["last_parameters"] = parameters
+            if endpoint and endpoint not in entry["endpoints"]:
+                entry["endpoints"].append(endpoint)
+            if plan is not None:
+                entry["plan"] = plan
+                entry["full_scan"] = any(_is_full_scan(line) for line in plan)
+            # Se poda al doble del top-N para no reordenar en cada registro
+            if len(self._entries) > 2 * self.top_n:
+                for stale in sorted(self._entries.values(), key=lambda e: e["total_ms"])[:-self.top_n]:
+                    del self._entries[stale["sql"]]
+
+    def top(self, limit: Optional[int] = None) -> List[dict]:
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda e: -e["total_ms"])
+            return [
+                {**entry, "total_ms": round(entry["total_ms"], 3), "max_ms": round(entry["max_ms"], 3),
+                 "last_ms": round(entry["last_ms"], 3), "endpoints": list(entry["endpoints"])}
+                for entry in entries[:limit or self.top_n]
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _is_full_scan(line: str) -> bool:
+    """SQLite: 'SCAN tabla' sin índice; PostgreSQL: 'Seq Scan'"""
+    return ("SCAN " in line and "USING" not in line and "SEARCH" not in line) or "Seq Scan" in line
+
+
+log = SlowQueryLog()
+
+
+# ========== EVENTOS DEL ENGINE ==========
+
+def _explain(conn, statement: str, parameters) -> Optional[List[str]]:
+    """Plan de la sentencia en un cursor aparte de la misma conexión"""
+    prefix = _EXPLAIN_PREFIX.get(conn.dialect.name)
+    if prefix is None or not statement.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        rows = cursor.fetchall()
+    except Exception as exc:
+        logger.debug("No se pudo obtener el plan: %s", exc)
+        return None
+    finally:
+        cursor.close()
+    if conn.dialect.name == "sqlite":
+        # (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+    return [row[0] for row in rows]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._slow_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_slow_query_start", None)
+    if started is None or log.threshold_ms <= 0:
+        return
+    duration_ms = (time.perf_counter() - started) * 1000
+    if duration_ms < log.threshold_ms:
+        return
+
+    sql = normalize_sql(statement)
+    plan = _explain(conn, statement, parameters) if not executemany and log.needs_plan(sql) else None
+    redacted = redact_parameters(parameters)
+    endpoint = current_endpoint()
+    log.record(sql, duration_ms, redacted, endpoint, plan)
+    logger.warning(
+        "Consulta lenta (%.1f ms) en %s: %s params=%s%s",
+        duration_ms, endpoint or "-", sql, redacted, f" plan={plan}" if plan else ""
+    )
+
+
+def instrument_engine(engine):
+    """Mide cada sentencia de este engine y registra las lentas"""
+    if getattr(engine, "_slow_queries_instrumented", False):
+        return engine
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    engine._slow_queries_instrumented = True
+    return engine
+
+
+class EndpointContextMiddleware:
+    """Middleware ASGI que deja el scope de la petición disponible para el registro"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _scope.reset(token)
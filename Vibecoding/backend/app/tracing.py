@@ -0,0 +1,436 @@
+"""
+tracing.py
+----------
+Trazas distribuidas compatibles con OpenTelemetry.
+
+Cuando una petición es lenta, las trazas muestran si fue bcrypt, jwt.decode,
+la espera del pool o una consulta. Hay spans para:
+- la petición completa (TracingMiddleware)
+- las etapas de get_current_user (decodificar JWT y buscar el usuario)
+- cada sentencia SQL y cada checkout del pool (instrument_engine)
+- el hash y la verificación de contraseñas
+
+Se implementa sin dependencias: ids y muestreo como los de OpenTelemetry
+(TraceIdRatioBased con respeto al padre), propagación W3C `traceparent` y
+exportación en el formato OTLP/JSON, a un archivo JSONL (funciona sin red)
+o a un collector OTLP/HTTP local.
+
+Desactivado (TRACING_ENABLED=false) no se registra ningún evento y el
+middleware solo deja pasar la petición.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+import urllib.request
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+# Fracción de trazas nuevas que se muestrean (las que llegan con traceparent respetan al padre)
+SAMPLE_RATIO = float(os.getenv("TRACING_SAMPLE_RATIO", "0.01"))
+# jsonl | otlp
+EXPORTER = os.getenv("TRACING_EXPORTER", "jsonl")
+JSONL_PATH = os.getenv("TRACING_JSONL_PATH", "./traces.jsonl")
+OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "quicktask-api")
+
+MAX_STATEMENT_LENGTH = 1000
+
+# Tipos de span de OTLP
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+_TRACEPARENT = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+# ========== SPANS ==========
+
+class Span:
+    """Un span terminado o en curso (solo existen para trazas muestreadas)"""
+
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: int = KIND_INTERNAL,
+                 attributes: Optional[dict] = None):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.error = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_otlp(self) -> dict:
+        """Representación OTLP/JSON del span"""
+        data = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 0},
+        }
+        if self.parent_id:
+            data["parentSpanId"] = self.parent_id
+        return data
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class _NoopSpan:
+    """Span vacío para trazas no muestreadas (sin costo)"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set_attribute(self, key: str, value):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+# Span activo del contexto actual (se propaga a los hilos del threadpool de FastAPI)
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("tracing_span", default=None)
+
+
+class _ActiveSpan:
+    """Context manager que hace del span el activo mientras dura el bloque"""
+
+    def __init__(self, tracer: "Tracer", span: Span):
+        self.tracer = tracer
+        self.span = span
+        self._token = None
+
+    def __enter__(self) -> Span:
+        self._token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        self.tracer.end(self.span, exc)
+        return False
+
+
+# ========== EXPORTADORES ==========
+
+class InMemoryExporter:
+    """Acumula los spans en una lista (pruebas)"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, spans: List[Span]):
+        self.spans.extend(spans)
+
+    def shutdown(self):
+        pass
+
+
+class JsonlExporter:
+    """Un span OTLP/JSON por línea, con el nombre del servicio"""
+
+    def __init__(self, path: str, service_name: str = SERVICE_NAME):
+        self.path = path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+        lines = "".join(
+            json.dumps({"service.name": self.service_name, **span.to_otlp()}) + "\n" for span in spans
+        )
+        with self._lock, open(self.path, "a", encoding="utf-8") as output:
+            output.write(lines)
+
+    def shutdown(self):
+        pass
+
+
+class OtlpHttpExporter:
+    """Envía lotes OTLP/JSON a un collector (POST /v1/traces)"""
+
+    def __init__(self, endpoint: str, service_name: str = SERVICE_NAME, timeout: float = 2.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def export(self, spans: List[Span]):
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "quicktask"}, "spans": [span.to_otlp() for span in spans]}],
+        }]}
+        request = urllib.request.Request(
+            self.endpoint, data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"}, method="POST"
+        )
+        try:
+            urllib.request.urlopen(request, timeout=self.timeout).close()
+        except OSError as exc:
+            logger.warning("No se pudieron exportar %s spans: %s", len(spans), exc)
+
+    def shutdown(self):
+        pass
+
+
+class BatchProcessor:
+    """
+    Exporta en un hilo aparte por lotes, para no bloquear la petición.
+    Si la cola se llena los spans se descartan.
+    """
+
+    def __init__(self, exporter, max_batch: int = 512, interval: float = 1.0, max_queue: int = 10000):
+        self.exporter = exporter
+        self.max_batch = max_batch
+        self.interval = interval
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(max_queue)
+        self._thread = threading.Thread(target=self._run, name="tracing-export", daemon=True)
+        self._thread.start()
+
+    def on_end(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.max_batch:
+                try:
+                    span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if span is None:
+                    stopping = True
+                    break
+                batch.append(span)
+            if batch:
+                try:
+                    self.exporter.export(batch)
+                except Exception:
+                    logger.exception("Falló la exportación de %s spans", len(batch))
+
+    def shutdown(self, timeout: float = 5.0):
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self.exporter.shutdown()
+
+
+class SimpleProcessor:
+    """Exporta cada span al terminar (pruebas y depuración)"""
+
+    def __init__(self, exporter):
+        self.exporter = exporter
+
+    def on_end(self, span: Span):
+        self.exporter.export([span])
+
+    def shutdown(self):
+        self.exporter.shutdown()
+
+
+# ========== TRACER ==========
+
+def parse_traceparent(header: str) -> Optional[tuple]:
+    """(trace_id, parent_span_id, sampled) de un header W3C traceparent, o None si es inválido"""
+    match = _TRACEPARENT.match(header.strip().lower())
+    if match is None:
+        return None
+    version, trace_id, span_id, flags = match.groups()
+    if version == "ff" or trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & 1)
+
+
+class Tracer:
+    """Crea spans con muestreo por trace id (como TraceIdRatioBased de OpenTelemetry)"""
+
+    def __init__(self, processor, ratio: float = SAMPLE_RATIO):
+        self.processor = processor
+        self.ratio = ratio
+        self._threshold = int(max(0.0, min(1.0, ratio)) * (1 << 64))
+
+    def should_sample(self, trace_id: str) -> bool:
+        """Decisión determinista con los 64 bits bajos del trace id"""
+        return int(trace_id[16:], 16) < self._threshold
+
+    def start_request(self, name: str, traceparent: Optional[str], attributes: dict) -> Optional[Span]:
+        """Span raíz de una petición, o None si la traza no se muestrea"""
+        parent = parse_traceparent(traceparent) if traceparent else None
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id = secrets.token_hex(16), None
+            sampled = self.should_sample(trace_id)
+        if not sampled:
+            return None
+        return Span(name, trace_id, parent_id, KIND_SERVER, attributes)
+
+    def end(self, span: Span, exc: Optional[BaseException] = None):
+        span.end_ns = time.time_ns()
+        if exc is not None and span.error is None:
+            span.error = f"{type(exc).__name__}: {exc}"
+        self.processor.on_end(span)
+
+    def shutdown(self):
+        self.processor.shutdown()
+
+
+tracer: Optional[Tracer] = None
+
+
+def configure(exporter=None, ratio: float = SAMPLE_RATIO, batch: bool = True) -> Tracer:
+    """Activa las trazas con el exportador dado (por defecto el de TRACING_EXPORTER)"""
+    global tracer
+    if exporter is None:
+        exporter = OtlpHttpExporter(OTLP_ENDPOINT) if EXPORTER == "otlp" else JsonlExporter(JSONL_PATH)
+    processor = BatchProcessor(exporter) if batch else SimpleProcessor(exporter)
+    tracer = Tracer(processor, ratio)
+    return tracer
+
+
+def shutdown():
+    """Exporta lo pendiente y desactiva las trazas"""
+    global tracer
+    if tracer is not None:
+        tracer.shutdown()
+        tracer = None
+
+
+def span(name: str, **attributes):
+    """
+    Span hijo del activo: `with tracing.span("auth.jwt_decode"): ...`.
+    Sin traza muestreada en curso retorna un span vacío.
+    """
+    parent = _current.get()
+    if parent is None or tracer is None:
+        return _NOOP
+    return _ActiveSpan(tracer, Span(name, parent.trace_id, parent.span_id, attributes=attributes))
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+# ========== MIDDLEWARE ==========
+
+class TracingMiddleware:
+    """Middleware ASGI: span SERVER por petición y header traceresponse en la respuesta"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        active = tracer
+        if active is None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        root = active.start_request(f"{scope['method']} {scope['path']}", traceparent, {
+            "http.method": scope["method"],
+            "http.target": scope["path"],
+        })
+        if root is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def traced_send(message):
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    root.error = f"HTTP {message['status']}"
+                message = {**message, "headers": [
+                    *message.get("headers", []), (b"traceresponse", root.traceparent.encode())
+                ]}
+            await send(message)
+
+        with _ActiveSpan(active, root):
+            await self.app(scope, receive, traced_send)
+
+
+# ========== INSTRUMENTACIÓN DE SQLALCHEMY ==========
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    parent = _current.get()
+    if parent is None or tracer is None:
+        return
+    context._tracing_span = Span("db.query", parent.trace_id, parent.span_id, KIND_CLIENT, {
+        "db.system": conn.dialect.name,
+        "db.statement": statement[:MAX_STATEMENT_LENGTH],
+        "db.executemany": executemany,
+    })
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    query_span = getattr(context, "_tracing_span", None)
+    if query_span is not None and tracer is not None:
+        context._tracing_span = None
+        tracer.end(query_span)
+
+
+def _handle_error(exception_context):
+    context = exception_context.execution_context
+    query_span = getattr(context, "_tracing_span", None) if context is not None else None
+    if query_span is not None and tracer is not None:
+        context._tracing_span = None
+        tracer.end(query_span, exception_context.original_exception)
+
+
+def instrument_engine(engine):
+    """Spans para cada sentencia SQL y para la espera del pool de este engine"""
+    if getattr(engine, "_tracing_instrumented", False):
+        return engine
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+    pool = engine.pool
+    checkout = pool.connect
+
+    def traced_checkout():
+        with span("db.pool.checkout", **{"db.pool.size": pool.size() if hasattr(pool, "size") else 0}):
+            return checkout()
+
+    pool.connect = traced_checkout
+    engine._tracing_instrumented = True
+    return engine
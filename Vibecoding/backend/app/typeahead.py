@@ -0,0 +1,261 @@
+"""
+typeahead.py
+------------
+Índice en memoria de prefijos de títulos para /api/tasks/suggest.
+
+Cada usuario tiene arreglos ordenados de (token normalizado, task_id) y
+(título normalizado, task_id); un prefijo es un rango por bisect. Las
+listas rankeadas de cada prefijo se cachean hasta la siguiente escritura
+y una búsqueda solo recorre hasta juntar `limit` resultados, sin tocar la
+BD. Los índices se cargan al primer uso, crud los mantiene al crear,
+editar o eliminar tareas, y un LRU limita cuántos usuarios hay en memoria.
+
+El índice es local al proceso: con varios workers cada uno carga el suyo
+y las escrituras hechas en otro worker se ven al recargarse (LRU).
+"""
+
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, Iterator, List, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+
+MAX_USERS = 1000
+# Listas rankeadas por prefijo que cada usuario conserva entre escrituras
+MAX_CACHED_PREFIXES = 256
+# Cargas que se reintentan si una escritura del usuario llega mientras tanto
+LOAD_ATTEMPTS = 3
+
+_TOKEN = re.compile(r"\w+")
+
+
+def normalize(text: str) -> List[str]:
+    """Tokens en minúsculas y sin tildes: 'Revisión Café' -> ['revision', 'cafe']"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _TOKEN.findall(stripped)
+
+
+def _prefix_range(entries: List[Tuple[str, int]], prefix: str) -> Iterator[int]:
+    """task_ids de las entradas cuyo texto empieza por prefix (arreglo ordenado)"""
+    position = bisect_left(entries, (prefix,))
+    while position < len(entries) and entries[position][0].startswith(prefix):
+        yield entries[position][1]
+        position += 1
+
+
+def _discard(entries: List[Tuple[str, int]], entry: Tuple[str, int]):
+    position = bisect_left(entries, entry)
+    if position < len(entries) and entries[position] == entry:
+        del entries[position]
+
+
+class UserIndex:
+    """Índice de prefijos de los títulos de un usuario"""
+
+    def __init__(self, rows=()):
+        self.titles: Dict[int, str] = {}
+        # Tokens y clave de orden de cada tarea (para no normalizar al buscar)
+        self.normalized: Dict[int, Tuple[str, ...]] = {}
+        self.sort_keys: Dict[int, tuple] = {}
+        entries, phrases = [], []
+        for task_id, title in rows:
+            tokens = self._store(task_id, title)
+            entries.extend((token, task_id) for token in set(tokens))
+            phrases.append((" ".join(tokens), task_id))
+        entries.sort()
+        phrases.sort()
+        # (token, task_id): tareas con un token que empieza por un prefijo
+        self.entries: List[Tuple[str, int]] = entries
+        # (título normalizado, task_id): tareas cuyo título empieza por un prefijo
+        self.phrases: List[Tuple[str, int]] = phrases
+        # Prefijo -> task_ids ya ordenados por ranking; se vacía en cada escritura
+        self._ranked: "OrderedDict[tuple, Tuple[int, ...]]" = OrderedDict()
+
+    def _store(self, task_id: int, title: str) -> Tuple[str, ...]:
+        tokens = tuple(normalize(title))
+        self.titles[task_id] = title
+        self.normalized[task_id] = tokens
+        self.sort_keys[task_id] = (len(title), title.lower(), task_id)
+        return tokens
+
+    def add(self, task_id: int, title: str):
+        self.remove(task_id)
+        tokens = self._store(task_id, title)
+        for token in set(tokens):
+            insort(self.entries, (token, task_id))
+        insort(self.phrases, (" ".join(tokens), task_id))
+        self._ranked.clear()
+
+    def remove(self, task_id: int):
+        self.titles.pop(task_id, None)
+        self.sort_keys.pop(task_id, None)
+        tokens = self.normalized.pop(task_id, None)
+        if tokens is None:
+            return
+        for token in set(tokens):
+            _discard(self.entries, (token, task_id))
+        _discard(self.phrases, (" ".join(tokens), task_id))
+        self._ranked.clear()
+
+    def _ranked_ids(self, kind: str, text: str) -> Tuple[int, ...]:
+        """
+        task_ids ordenados por (largo, título, id) de uno de estos conjuntos:
+        'token' (un token empieza por text), 'exact' (un token es text) o
+        'phrase' (el título normalizado empieza por text). Se cachea por usuario.
+        """
+        key = (kind, text)
+        ranked = self._ranked.get(key)
+        if ranked is not None:
+            self._ranked.move_to_end(key)
+            return ranked
+        if kind == "phrase":
+            ids = set(_prefix_range(self.phrases, text))
+        else:
+            ids = set(_prefix_range(self.entries, text))
+            if kind == "exact":
+                ids = {task_id for task_id in ids if text in self.normalized[task_id]}
+        ranked = tuple(sorted(ids, key=self.sort_keys.__getitem__))
+        self._ranked[key] = ranked
+        while len(self._ranked) > MAX_CACHED_PREFIXES:
+            self._ranked.popitem(last=False)
+        return ranked
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Tuple[int, str]]:
+        """
+        Tareas cuyo título tiene un token que empieza por el último término
+        del prefijo y contiene los anteriores. Primero las que empiezan
+        por el prefijo, luego las de título más corto.
+
+        Se recorren listas ya rankeadas y se corta al juntar `limit`
+        resultados que cumplen todos los términos, así que el costo no
+        depende de cuántas tareas comparten el prefijo ni de sus ids.
+        """
+        terms = normalize(prefix)
+        if not terms:
+            return []
+        *complete, partial = terms
+        wanted = " ".join(terms)
+
+        # 1) Títulos que empiezan por el prefijo completo (cumplen todos los términos)
+        result = list(islice(self._ranked_ids("phrase", wanted), limit))
+        if len(result) < limit:
+            # 2) El resto, recorriendo la lista más corta entre el término parcial y los completos
+            lists = [self._ranked_ids("token", partial)] + [self._ranked_ids("exact", term) for term in complete]
+            for task_id in min(lists, key=len):
+                tokens = self.normalized[task_id]
+                if " ".join(tokens).startswith(wanted):
+                    continue  # ya está en el grupo 1
+                if any(term not in tokens for term in complete):
+                    continue
+                if not any(token.startswith(partial) for token in tokens):
+                    continue
+                result.append(task_id)
+                if len(result) == limit:
+                    break
+        return [(task_id, self.titles[task_id]) for task_id in result]
+
+
+class TypeaheadIndex:
+    """Índices por usuario con carga perezosa y LRU"""
+
+    def __init__(self, max_users: int = MAX_USERS):
+        self.max_users = max_users
+        self._users: "OrderedDict[int, UserIndex]" = OrderedDict()
+        # user_id -> [cargas en curso, escrituras recibidas durante ellas]
+        self._loading: Dict[int, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def for_user(self, db: Session, user_id: int) -> UserIndex:
+        """
+        Índice del usuario, cargándolo si hace falta. Una escritura que llega
+        durante la carga no encuentra índice que actualizar: en ese caso la
+        carga se descarta y se repite, en vez de instalar un índice viejo.
+        """
+        for _ in range(LOAD_ATTEMPTS):
+            with self._lock:
+                index = self._users.get(user_id)
+                if index is not None:
+                    self._users.move_to_end(user_id)
+                    return index
+                state = self._loading.setdefault(user_id, [0, 0])
+                state[0] += 1
+                writes = state[1]
+
+            try:
+                index = UserIndex(db.execute(
+                    select(models.Task.id, models.Task.title).where(models.Task.user_id == user_id)
+                ).all())
+            except BaseException:
+                with self._lock:
+                    self._end_load(user_id)
+                raise
+
+            with self._lock:
+                if self._end_load(user_id) == writes:
+                    # Otra petición pudo cargarlo mientras tanto: se conserva el existente
+                    index = self._users.setdefault(user_id, index)
+                    self._users.move_to_end(user_id)
+                    while len(self._users) > self.max_users:
+                        self._users.popitem(last=False)
+                    return index
+        # Escrituras continuas: se responde con la última carga sin guardarla
+        return index
+
+    def _end_load(self, user_id: int) -> int:
+        """Cierra una carga en curso; retorna las escrituras vistas (con el lock tomado)"""
+        state = self._loading[user_id]
+        state[0] -= 1
+        if not state[0]:
+            del self._loading[user_id]
+        return state[1]
+
+    def _changed(self, user_id: int):
+        """Registra una escritura del usuario para las cargas en curso (con el lock tomado)"""
+        state = self._loading.get(user_id)
+        if state is not None:
+            state[1] += 1
+
+    def suggest(self, db: Session, user_id: int, prefix: str, limit: int = 10) -> List[Tuple[int, str]]:
+        index = self.for_user(db, user_id)
+        with self._lock:
+            return index.suggest(prefix, limit)
+
+    # Mantenimiento desde crud: solo se actualizan índices ya cargados
+
+    def task_saved(self, user_id: int, task_id: int, title: str):
+        with self._lock:
+            self._changed(user_id)
+            index = self._users.get(user_id)
+            if index is not None:
+                index.add(task_id, title)
+
+    def task_removed(self, user_id: int, task_id: int):
+        with self._lock:
+            self._changed(user_id)
+            index = self._users.get(user_id)
+            if index is not None:
+                index.remove(task_id)
+
+    def invalidate(self, user_id: int):
+        """Descarta el índice (se recarga en el próximo uso), p. ej. tras un import masivo"""
+        with self._lock:
+            self._changed(user_id)
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+    def __len__(self):
+        return len(self._users)
+
+
+index = TypeaheadIndex()
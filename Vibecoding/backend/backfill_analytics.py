@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Script de backfill de la analítica de tareas.
+Recalcula los rollups diarios (task_daily_stats) a partir de las tareas
+existentes. Se ejecuta una vez tras desplegar la tabla de rollups, o para
+reparar un usuario concreto: python backfill_analytics.py [user_id]
+"""
+
+import sys
+
+from app.database import init_db, shard_session_factories
+from app import analytics
+
+# Crear la tabla de rollups si aún no existe
+init_db()
+
+
+def main():
+    user_id = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    rows = 0
+    # Con sharding, cada shard se recalcula con sus propias tareas
+    for session_factory in shard_session_factories():
+        db = session_factory()
+        try:
+            rows += analytics.backfill(db, user_id)
+        finally:
+            db.close()
+    scope = f"usuario {user_id}" if user_id is not None else "todos los usuarios"
+    print(f"✅ Backfill completado ({scope}): {rows} filas de rollup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark de group commit.
+Varios hilos crean tareas con crud.create_task sobre una BD SQLite en disco:
+- directo: cada operación hace su propio COMMIT (comportamiento por defecto)
+- agrupado: las operaciones pasan por GroupCommitWriter (un COMMIT por grupo)
+Se repite con PRAGMA synchronous=FULL y NORMAL.
+
+Uso (desde Vibecoding/backend):
+    python benchmarks/bench_group_commit.py [n_hilos] [tareas_por_hilo] [directorio]
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from app import crud, group_commit, schemas
+from app.database import Base
+from app.models import User
+
+
+def build_engine(path: str, synchronous: str):
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False, "timeout": 60}
+    )
+
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_connection, _):
+        dbapi_connection.execute(f"PRAGMA synchronous={synchronous}")
+
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.add(User(email="bench@quicktask.com", password_hash="x"))
+        db.commit()
+    return engine
+
+
+def run_threads(threads: int, work) -> float:
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def direct(engine, threads: int, per_thread: int) -> float:
+    def work():
+        for i in range(per_thread):
+            with Session(engine, autoflush=False) as db:
+                crud.create_task(db, schemas.TaskCreate(title=f"Tarea {i}"), 1)
+
+    return threads * per_thread / run_threads(threads, work)
+
+
+def grouped(engine, threads: int, per_thread: int, synchronous: str) -> tuple:
+    writer = group_commit.GroupCommitWriter(
+        lambda: group_commit.GroupSession(bind=engine, **group_commit.SESSION_OPTIONS),
+        synchronous=synchronous
+    )
+
+    def work():
+        for i in range(per_thread):
+            writer.submit(crud.create_task, schemas.TaskCreate(title=f"Tarea {i}"), 1).result()
+
+    throughput = threads * per_thread / run_threads(threads, work)
+    writer.stop()
+    return throughput, writer.operations / max(writer.batches, 1)
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    directory = sys.argv[3] if len(sys.argv) > 3 else None
+
+    print(f"{threads} hilos x {per_thread} tareas")
+    print(f"{'synchronous':>11} {'directo/s':>10} {'agrupado/s':>11} {'ops/commit':>10}")
+    for synchronous in ("FULL", "NORMAL"):
+        with tempfile.TemporaryDirectory(dir=directory) as tmp:
+            engine = build_engine(os.path.join(tmp, "direct.db"), synchronous)
+            base = direct(engine, threads, per_thread)
+            engine.dispose()
+            engine = build_engine(os.path.join(tmp, "grouped.db"), synchronous)
+            fast, batch = grouped(engine, threads, per_thread, synchronous)
+            engine.dispose()
+        print(f"{synchronous:>11} {base:>10.0f} {fast:>11.0f} {batch:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark de las consultas calientes de crud/auth.
+Compara, por llamada, la forma anterior (db.query(...).filter(...) construida
+en cada llamada) con los select precompilados con bindparam de crud.
+El tiempo incluye la ejecución en SQLite, así que la diferencia es el costo
+de construir la consulta y generar su cache key.
+
+Uso (desde Vibecoding/backend):
+    python benchmarks/bench_hot_queries.py [n_tareas] [llamadas]
+"""
+
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.database import Base
+from app.models import Task, User
+
+
+# ========== FORMA ANTERIOR ==========
+
+def legacy_get_user_by_id(db, user_id):
+    return db.query(User).filter(User.id == user_id).first()
+
+
+def legacy_get_user_by_email(db, email):
+    return db.query(User).filter(User.email == email).first()
+
+
+def legacy_get_task_by_id(db, task_id, user_id):
+    return db.query(Task).filter(Task.id == task_id, Task.user_id == user_id).first()
+
+
+def legacy_get_tasks(db, user_id, status=None):
+    query = db.query(Task).filter(Task.user_id == user_id)
+    if status:
+        query = query.filter(Task.status == status)
+    return query.order_by(Task.created_at.desc()).all()
+
+
+def legacy_statistics(db, user_id):
+    total = db.query(Task).filter(Task.user_id == user_id).count()
+    completed = db.query(Task).filter(Task.user_id == user_id, Task.status == "completed").count()
+    return {"total": total, "completed": completed, "pending": total - completed}
+
+
+def best_of(func, number: int) -> float:
+    """Mejor tiempo medio por llamada en microsegundos"""
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    n_tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    number = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/bench.db")
+        Base.metadata.create_all(bind=engine)
+        with Session(engine) as db:
+            db.add(User(email="bench@quicktask.com", password_hash="x"))
+            db.add_all([
+                Task(user_id=1, title=f"Tarea {i}", status="completed" if i % 3 == 0 else "pending")
+                for i in range(n_tasks)
+            ])
+            db.commit()
+
+        cases = [
+            ("get_user_by_id", lambda db: legacy_get_user_by_id(db, 1), lambda db: crud.get_user_by_id(db, 1)),
+            ("get_user_by_email",
+             lambda db: legacy_get_user_by_email(db, "bench@quicktask.com"),
+             lambda db: crud.get_user_by_email(db, "bench@quicktask.com")),
+            ("get_task_by_id", lambda db: legacy_get_task_by_id(db, 5, 1), lambda db: crud.get_task_by_id(db, 5, 1)),
+            ("get_tasks", lambda db: legacy_get_tasks(db, 1), lambda db: crud.get_tasks(db, 1)),
+            ("get_tasks(status)",
+             lambda db: legacy_get_tasks(db, 1, "pending"), lambda db: crud.get_tasks(db, 1, status="pending")),
+            ("get_task_statistics", lambda db: legacy_statistics(db, 1), lambda db: crud.get_task_statistics(db, 1)),
+        ]
+
+        print(f"{n_tasks} tareas, {number} llamadas por caso (µs por llamada)")
+        print(f"{'consulta':>20} {'antes':>8} {'después':>8} {'mejora':>7}")
+        with Session(engine) as db:
+            for name, legacy, cached in cases:
+                before = best_of(lambda: legacy(db), number)
+                after = best_of(lambda: cached(db), number)
+                print(f"{name:>20} {before:>8.1f} {after:>8.1f} {before / after:>6.2f}x")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark de formatos de respuesta: JSON vs MessagePack, con y sin compresión.
+Mide tamaño del payload y tiempo de codificación/decodificación de un
+TaskListResponse típico.
+
+Uso (desde Vibecoding/backend):
+    python benchmarks/bench_payloads.py [n_tareas ...]
+"""
+
+import gzip
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import msgpack
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app import schemas
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def build_payload(n_tasks: int) -> dict:
+    """Payload ya serializable, igual al que recibe la clase de respuesta"""
+    now = datetime(2025, 1, 1, 12, 0, 0)
+    tasks = [
+        schemas.TaskResponse(
+            id=i,
+            user_id=1,
+            title=f"Tarea número {i}",
+            description="Revisar el informe trimestral y enviar comentarios al equipo" if i % 3 else None,
+            due_date=now + timedelta(days=i % 30) if i % 2 else None,
+            status="completed" if i % 4 == 0 else "pending",
+            created_at=now,
+            updated_at=now,
+        )
+        for i in range(n_tasks)
+    ]
+    response = schemas.TaskListResponse(tasks=tasks, total=n_tasks, pending=n_tasks // 2, completed=n_tasks // 2)
+    return jsonable_encoder(response)
+
+
+def best_of(func, number: int) -> float:
+    """Mejor tiempo medio por llamada en microsegundos"""
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def run(n_tasks: int):
+    payload = build_payload(n_tasks)
+    json_body = JSONResponse(payload).body
+    msgpack_body = msgpack.packb(payload, use_bin_type=True)
+    number = max(1, 20000 // n_tasks)
+
+    rows = [
+        ("json", len(json_body),
+         best_of(lambda: JSONResponse(payload).body, number),
+         best_of(lambda: json.loads(json_body), number)),
+        ("msgpack", len(msgpack_body),
+         best_of(lambda: msgpack.packb(payload, use_bin_type=True), number),
+         best_of(lambda: msgpack.unpackb(msgpack_body, raw=False), number)),
+    ]
+
+    print(f"\n=== {n_tasks} tareas ===")
+    print(f"{'formato':<10}{'bytes':>10}{'gzip':>10}{'br':>10}{'encode µs':>12}{'decode µs':>12}")
+    for name, size, encode_us, decode_us in rows:
+        body = json_body if name == "json" else msgpack_body
+        gzip_size = len(gzip.compress(body, 6))
+        br_size = len(brotli.compress(body, quality=4)) if brotli else float("nan")
+        print(f"{name:<10}{size:>10}{gzip_size:>10}{br_size:>10}{encode_us:>12.1f}{decode_us:>12.1f}")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 100, 1000]
+    for n in sizes:
+        run(n)
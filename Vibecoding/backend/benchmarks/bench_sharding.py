@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark de escritura concurrente con sharding por usuario.
+Un proceso escritor por usuario crea tareas con commit individual; se
+compara el throughput con 1, 2, 4 y 8 shards SQLite en disco.
+
+Para que el límite sea el lock de escritura y no Python:
+- procesos en vez de hilos (sin GIL compartido),
+- synchronous=FULL: cada commit espera su fsync con el lock tomado.
+Con un solo archivo todos los escritores hacen cola en ese lock; con N
+shards hay N locks. Se informa también el tiempo medio dentro de COMMIT.
+
+Uso (desde Vibecoding/backend):
+    python benchmarks/bench_sharding.py [n_procesos] [tareas_por_proceso] [synchronous]
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import create_engine, event
+
+from app import activity, crud, schemas, sharding
+from app.database import Base
+
+# Solo se miden los commits de tareas: el historial escribiría en otro hilo
+activity.ENABLED = False
+
+
+def build_router(directory: str, shard_count: int, synchronous: str) -> sharding.ShardRouter:
+    def sqlite_engine(path):
+        engine = create_engine(
+            f"sqlite:///{path}",
+            connect_args={"check_same_thread": False, "timeout": 60}
+        )
+
+        @event.listens_for(engine, "connect")
+        def _pragmas(dbapi_connection, _):
+            dbapi_connection.execute("PRAGMA journal_mode=WAL")
+            dbapi_connection.execute(f"PRAGMA synchronous={synchronous}")
+
+        return engine
+
+    return sharding.ShardRouter(
+        sqlite_engine(os.path.join(directory, "directory.db")),
+        [sqlite_engine(os.path.join(directory, f"shard_{i}.db")) for i in range(shard_count)],
+        Base.metadata,
+    )
+
+
+def writer(directory, shard_count, synchronous, user_id, tasks_per_writer, start, results):
+    router = build_router(directory, shard_count, synchronous)
+    session = sharding.RoutingSession(router=router)
+    sharding.route_to_user(session, user_id)
+    in_commit = 0.0
+    original_commit = session.commit
+
+    def timed_commit():
+        nonlocal in_commit
+        began = time.perf_counter()
+        original_commit()
+        in_commit += time.perf_counter() - began
+
+    session.commit = timed_commit
+    start.wait()
+    for i in range(tasks_per_writer):
+        crud.create_task(session, schemas.TaskCreate(title=f"Tarea {i}"), user_id)
+    session.close()
+    results.put(in_commit)
+
+
+def run(shard_count: int, writers: int, tasks_per_writer: int, synchronous: str):
+    with tempfile.TemporaryDirectory() as directory:
+        router = build_router(directory, shard_count, synchronous)
+        router.create_all()
+        db = sharding.RoutingSession(router=router)
+        user_ids = [
+            crud.create_user(db, schemas.UserCreate(email=f"bench{i}@quicktask.com", password="Secret123!"), "x").id
+            for i in range(writers)
+        ]
+        db.close()
+        for engine in [router.directory_engine, *router.shards]:
+            engine.dispose()
+
+        start = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=writer,
+                args=(directory, shard_count, synchronous, user_id, tasks_per_writer, start, results)
+            )
+            for user_id in user_ids
+        ]
+        for process in processes:
+            process.start()
+        time.sleep(0.5)  # los procesos importan la app antes de medir
+        began = time.perf_counter()
+        start.set()
+        commit_seconds = [results.get() for _ in processes]
+        elapsed = time.perf_counter() - began
+        for process in processes:
+            process.join()
+        total = writers * tasks_per_writer
+        return total / elapsed, sum(commit_seconds) / total * 1000
+
+
+def main():
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    tasks_per_writer = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    synchronous = sys.argv[3].upper() if len(sys.argv) > 3 else "FULL"
+    print(f"{writers} procesos x {tasks_per_writer} tareas (commit por tarea, synchronous={synchronous}, "
+          f"{os.cpu_count()} CPU)")
+    print(f"{'shards':>6} {'tareas/s':>10} {'ms en COMMIT':>13}")
+    for shard_count in (1, 2, 4, 8):
+        throughput, commit_ms = run(shard_count, writers, tasks_per_writer, synchronous)
+        print(f"{shard_count:>6} {throughput:>10.0f} {commit_ms:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
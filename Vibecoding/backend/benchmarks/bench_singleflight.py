@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark de single-flight.
+Lanza ráfagas de GET /api/tasks idénticos y simultáneos (como varias
+pestañas de un dashboard) contra la app ASGI con una BD SQLite en disco,
+con y sin agrupación, y cuenta las sentencias SQL ejecutadas.
+
+Uso (desde Vibecoding/backend):
+    python benchmarks/bench_singleflight.py [peticiones_por_rafaga] [rafagas] [n_tareas]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import auth, singleflight
+from app.database import Base, create_db_engine, get_db
+from app.main import app
+from app.models import Task, User
+
+
+async def bursts(headers: dict, size: int, count: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        start = time.perf_counter()
+        for _ in range(count):
+            responses = await asyncio.gather(*[http.get("/api/tasks", headers=headers) for _ in range(size)])
+            assert all(response.status_code == 200 for response in responses)
+        return time.perf_counter() - start
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    n_tasks = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{tmp}/bench.db")
+        Base.metadata.create_all(bind=engine)
+        with Session(engine) as db:
+            db.add(User(email="bench@quicktask.com", password_hash="x"))
+            db.add_all([Task(user_id=1, title=f"Tarea {i}") for i in range(n_tasks)])
+            db.commit()
+        BenchSession = sessionmaker(autoflush=False, bind=engine)
+
+        def bench_get_db():
+            db = BenchSession()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = bench_get_db
+        statements = [0]
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _count(*args):
+            statements[0] += 1
+
+        headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': '1'})}"}
+        print(f"{count} ráfagas de {size} GET /api/tasks idénticos ({n_tasks} tareas)")
+        print(f"{'single-flight':>13} {'SQL/ráfaga':>10} {'ms/ráfaga':>10}")
+        for enabled in (False, True):
+            singleflight.SINGLEFLIGHT_ENABLED = enabled
+            statements[0] = 0
+            elapsed = asyncio.run(bursts(headers, size, count))
+            print(f"{'sí' if enabled else 'no':>13} {statements[0] / count:>10.1f} {elapsed / count * 1000:>10.1f}")
+
+        app.dependency_overrides.pop(get_db, None)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Prueba de resistencia (soak) de memoria.
+Ejecuta en bucle la mezcla de endpoints habitual (crear, leer, editar,
+completar, listar, sugerir y eliminar tareas) sobre una BD SQLite temporal
+y mide la memoria trazada y el RSS al final de cada ventana. El conjunto
+de datos se mantiene estable, así que la memoria debería estabilizarse
+tras el calentamiento; si sigue creciendo el script termina con código 1
+y muestra las líneas que más memoria sumaron.
+
+Uso (desde Vibecoding/backend):
+    python benchmarks/soak.py [duracion_s] [ventana_s] [tolerancia_kb_por_ventana]
+Ejemplo de varias horas:
+    python benchmarks/soak.py 14400 300 64
+"""
+
+import gc
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from app import memory
+from app.database import Base, create_db_engine, get_db
+from app.main import app
+
+WARMUP_WINDOWS = 2
+
+
+def endpoint_mix(client: TestClient, headers: dict, i: int):
+    created = client.post("/api/tasks", headers=headers, json={"title": f"Soak {i} informe semanal"}).json()
+    task_id = created["id"]
+    client.get(f"/api/tasks/{task_id}", headers=headers)
+    client.put(f"/api/tasks/{task_id}", headers=headers, json={"description": "x" * (i % 200)})
+    client.post(f"/api/tasks/{task_id}/complete", headers=headers)
+    client.get("/api/tasks", headers=headers, params={"limit": 50})
+    client.get("/api/tasks/suggest", headers=headers, params={"prefix": "inf"})
+    client.delete(f"/api/tasks/{task_id}", headers=headers)
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 600
+    window = float(sys.argv[2]) if len(sys.argv) > 2 else 30
+    tolerance = float(sys.argv[3]) * 1024 if len(sys.argv) > 3 else 64 * 1024
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{tmp}/soak.db")
+        Base.metadata.create_all(bind=engine)
+        SoakSession = sessionmaker(autoflush=False, bind=engine)
+
+        def soak_get_db():
+            db = SoakSession()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = soak_get_db
+        tracker = memory.MemoryTracker(interval=window)
+        tracker.start()
+
+        with TestClient(app) as client:
+            credentials = {"email": "soak@quicktask.com", "password": "soak12345"}
+            client.post("/api/auth/register", json=credentials)
+            token = client.post("/api/auth/login", json=credentials).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+
+            samples = []
+            requests = 0
+            end = time.monotonic() + duration
+            print(f"{'ventana':>7} {'peticiones':>10} {'trazada KB':>11} {'RSS MB':>8}")
+            while time.monotonic() < end:
+                window_end = min(end, time.monotonic() + window)
+                while time.monotonic() < window_end:
+                    endpoint_mix(client, headers, requests)
+                    requests += 1
+                gc.collect()
+                entry = tracker.take_snapshot()
+                samples.append(entry["traced_bytes"])
+                rss = entry["rss_bytes"] / 2 ** 20 if entry["rss_bytes"] else float("nan")
+                print(f"{len(samples):>7} {requests * 7:>10} {entry['traced_bytes'] / 1024:>11.0f} {rss:>8.1f}")
+
+        report = tracker.report()
+        tracker.stop()
+        app.dependency_overrides.pop(get_db, None)
+        engine.dispose()
+
+    measured = samples[WARMUP_WINDOWS:]
+    if memory.detect_growth(measured, tolerance):
+        print("FALLO: la memoria sigue creciendo tras el calentamiento")
+        for stat in report["top_growth"][:10]:
+            print(f"  +{stat['size_diff_bytes'] / 1024:.1f} KB  {stat['location']}")
+        sys.exit(1)
+    print("OK: la memoria se mantiene estable")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,13 +10,14 @@ import os
 # Agregar el directorio app al path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
 
-from app.database import SessionLocal, engine
+from app.database import SessionLocal, init_db
 from app import models
+from app.sharding import route_to_user
 from app.auth import hash_password
 from datetime import datetime, timedelta
 
-# Crear todas las tablas
-models.Base.metadata.create_all(bind=engine)
+# Crear todas las tablas (directorio y shards si hay sharding)
+init_db()
 
 def init_dev_data():
     """Inicializa datos de desarrollo en la base de datos"""
@@ -31,6 +32,7 @@ def init_dev_data():
         
         if existing_user:
             print("⚠️  Usuario de desarrollo ya existe. Limpiando datos anteriores...")
+            route_to_user(db, existing_user.id)
             # Eliminar tareas antiguas
             db.query(models.Task).filter(models.Task.user_id == existing_user.id).delete()
             user = existing_user
@@ -45,6 +47,7 @@ def init_dev_data():
             db.commit()
             db.refresh(user)
             print(f"✅ Usuario creado: {user.email}")
+            route_to_user(db, user.id)
         
         # Crear tareas de ejemplo
         print("\n📝 Creando tareas de ejemplo...")
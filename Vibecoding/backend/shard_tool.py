@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Herramienta de administración del sharding por usuario.
+Se ejecuta con la API detenida y SHARD_COUNT configurado con el número de
+shards de destino:
+
+    python shard_tool.py migrate              # BD única -> SHARD_COUNT shards
+    python shard_tool.py rebalance --from 2   # de 2 shards a SHARD_COUNT shards
+    python shard_tool.py status               # filas por shard
+
+Los datos de cada usuario se copian conservando sus ids, luego se actualiza
+su ubicación en el directorio y por último se borran del shard de origen.
+"""
+
+import argparse
+import sys
+
+from sqlalchemy import func, select
+
+from app import models  # noqa: F401  (registra las tablas en Base.metadata)
+from app import sharding
+from app.database import (
+    Base, SHARD_URL_TEMPLATE, create_db_engine, engine, init_db, router
+)
+
+
+def _user_ids():
+    with engine.connect() as conn:
+        return [row[0] for row in conn.execute(select(models.User.__table__.c.id).order_by("id"))]
+
+
+def migrate():
+    """Reparte los datos de la BD única (el directorio) entre los shards"""
+    source = sharding.ShardRouter(engine, [engine], Base.metadata)
+    moved = sharding.rebalance(source, router, _user_ids())
+    print(f"✅ Migración completada: {len(moved)} usuarios, {sum(moved.values())} filas movidas")
+
+
+def rebalance(previous_count: int):
+    """Mueve a los usuarios de previous_count shards a SHARD_COUNT shards"""
+    source = sharding.ShardRouter(
+        engine,
+        [create_db_engine(SHARD_URL_TEMPLATE.format(shard=i)) for i in range(previous_count)],
+        Base.metadata,
+    )
+    moved = sharding.rebalance(source, router, _user_ids())
+    print(f"✅ Rebalanceo completado: {len(moved)} usuarios movidos, {sum(moved.values())} filas")
+
+
+def status():
+    """Muestra el número de usuarios y tareas por shard"""
+    placements = {}
+    for user_id in _user_ids():
+        shard = router.shard_for_user(user_id)
+        placements[shard] = placements.get(shard, 0) + 1
+    for index, shard_engine in enumerate(router.shards):
+        with shard_engine.connect() as conn:
+            tasks = conn.execute(select(func.count()).select_from(models.Task.__table__)).scalar()
+        print(f"shard {index} ({shard_engine.url}): {placements.get(index, 0)} usuarios, {tasks} tareas")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Administración del sharding por usuario")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("migrate", help="BD única -> shards")
+    rebalance_parser = subcommands.add_parser("rebalance", help="cambiar el número de shards")
+    rebalance_parser.add_argument("--from", dest="previous", type=int, required=True)
+    subcommands.add_parser("status", help="filas por shard")
+    args = parser.parse_args()
+
+    if router is None:
+        print("❌ Configure SHARD_COUNT (> 0) con el número de shards de destino")
+        sys.exit(1)
+
+    init_db()
+    if args.command == "migrate":
+        migrate()
+    elif args.command == "rebalance":
+        rebalance(args.previous)
+    else:
+        status()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,16 +5,22 @@ Fixtures compartidas para todas las pruebas.
 Define base de datos en memoria, cliente de pruebas y datos de ejemplo.
 """
 
+from contextlib import contextmanager
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from app.main import app
-from app.database import Base, get_db
+from app.database import Base, create_db_engine, get_db
 from app.models import User, Task, Reminder
-from app import auth
+from app import auth, typeahead, activity, labels
+
+# El escritor de actividad usaría la misma conexión en memoria desde otro hilo;
+# test_activity.py lo habilita con una BD en archivo
+activity.ENABLED = False
 
 # ========== CONFIGURACIÓN DE BASE DE DATOS DE PRUEBA ==========
 
@@ -58,6 +64,31 @@ def db_session():
     finally:
         db.close()
         Base.metadata.drop_all(bind=engine)
+        # Los ids se reutilizan entre pruebas: los índices en memoria no deben sobrevivir
+        typeahead.index.clear()
+        labels.index.clear()
+
+
+@pytest.fixture
+def captured_statements(db_session):
+    """
+    Context manager que captura las sentencias SQL (statement, parameters)
+    ejecutadas en la BD de prueba: `with captured_statements() as statements:`
+    """
+    @contextmanager
+    def capture():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    return capture
 
 
 @pytest.fixture(scope="function")
@@ -69,6 +100,41 @@ def client(db_session):
         yield test_client
 
 
+@pytest.fixture
+def file_db(tmp_path, client, sample_user_data):
+    """
+    BD en archivo para las pruebas con trabajo en otros hilos (jobs en segundo
+    plano, peticiones concurrentes, escritor de actividad): en la BD en memoria
+    todas las sesiones comparten una conexión y se pisan las transacciones.
+    Reemplaza get_db, registra al usuario de ejemplo y retorna
+    (fábrica de sesiones, headers de autenticación).
+    """
+    file_engine = create_db_engine(f"sqlite:///{tmp_path}/file.db")
+    Base.metadata.create_all(bind=file_engine)
+    FileSession = sessionmaker(autoflush=False, bind=file_engine)
+
+    def file_get_db():
+        db = FileSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    previous = app.dependency_overrides[get_db]
+    app.dependency_overrides[get_db] = file_get_db
+    client.post("/api/auth/register", json=sample_user_data)
+    token = client.post("/api/auth/login", json=sample_user_data).json()["access_token"]
+    yield FileSession, {"Authorization": f"Bearer {token}"}
+    app.dependency_overrides[get_db] = previous
+    file_engine.dispose()
+
+
+@pytest.fixture
+def file_auth_headers(file_db):
+    """Headers de autenticación del usuario de la BD en archivo (file_db)"""
+    return file_db[1]
+
+
 @pytest.fixture
 def sample_user_data():
     """Datos de usuario de ejemplo"""
@@ -0,0 +1,193 @@
+"""
+test_activity.py
+----------------
+Pruebas del historial de tareas: escritor en lotes (tamaño, tiempo, buffer
+acotado y vaciado al apagar) y GET /api/tasks/{id}/history con paginación
+por cursor. Usa una BD en archivo: el escritor corre en su propio hilo.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app import activity, crud, group_commit, schemas
+from app.database import Base, create_db_engine
+from app.models import TaskActivity, User
+
+
+def _entry(i: int) -> dict:
+    return {"task_id": 1, "user_id": 1, "action": "updated", "changes": None,
+            "ts": datetime(2024, 1, 1, 0, 0, i % 60)}
+
+
+@pytest.fixture
+def file_engine(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path}/activity.db")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.add(User(email="activity@quicktask.com", password_hash="x"))
+        db.commit()
+    yield engine
+    engine.dispose()
+
+
+def _count(engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count(TaskActivity.id))).scalar()
+
+
+@pytest.fixture
+def history_headers(file_db, monkeypatch):
+    """BD en archivo (history_headers) con el escritor de actividad habilitado"""
+    monkeypatch.setattr(activity, "ENABLED", True)
+    yield file_db[1]
+    activity.shutdown()
+
+
+# ========== PRUEBAS UNITARIAS ==========
+
+def test_writer_batches_by_size(file_engine):
+    """Los registros se insertan en lotes de batch_size"""
+    writer = activity.ActivityWriter(lambda: Session(file_engine), batch_size=10, interval=10)
+    for i in range(25):
+        writer.submit(_entry(i))
+
+    assert writer.flush()
+    writer.stop()
+    assert writer.written == 25
+    assert writer.batches == 3
+    assert _count(file_engine) == 25
+
+
+def test_writer_flushes_by_time(file_engine):
+    """Un lote incompleto se escribe al vencer el intervalo"""
+    writer = activity.ActivityWriter(lambda: Session(file_engine), batch_size=1000, interval=0.05)
+    writer.submit(_entry(0))
+
+    deadline = time.monotonic() + 5
+    while writer.written == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    writer.stop()
+    assert writer.written == 1
+
+
+def test_buffer_is_bounded(file_engine):
+    """Con el escritor ocupado y el buffer lleno se descarta sin bloquear"""
+    release = threading.Event()
+
+    def slow_session():
+        release.wait(5)
+        return Session(file_engine)
+
+    writer = activity.ActivityWriter(slow_session, batch_size=1, interval=0, max_buffer=3)
+    writer.submit(_entry(0))  # lo toma el hilo, que queda esperando la sesión
+    time.sleep(0.05)
+    accepted = [writer.submit(_entry(i)) for i in range(1, 6)]
+    release.set()
+    writer.stop()
+
+    assert accepted == [True, True, True, False, False]
+    assert writer.dropped == 2
+    assert _count(file_engine) == 4
+
+
+def test_stop_drains_buffer(file_engine):
+    """Al apagar se escribe todo lo pendiente aunque no se haya cumplido el intervalo"""
+    writer = activity.ActivityWriter(lambda: Session(file_engine), batch_size=1000, interval=60)
+    for i in range(50):
+        writer.submit(_entry(i))
+    writer.stop()
+
+    assert _count(file_engine) == 50
+
+
+def test_rolled_back_changes_are_not_recorded(file_engine, monkeypatch):
+    """Solo se encola lo que confirmó su transacción"""
+    monkeypatch.setattr(activity, "ENABLED", True)
+    with Session(file_engine) as db:
+        db.get(User, 1)
+        activity.record(db, 1, 1, "updated", {"title": "x"})
+        db.rollback()
+        activity.record(db, 1, 1, "completed")
+        db.commit()
+    activity.shutdown()
+
+    with Session(file_engine) as db:
+        assert db.execute(select(TaskActivity.action)).scalars().all() == ["completed"]
+
+
+# ========== PRUEBAS DE INTEGRACIÓN ==========
+
+@pytest.mark.integration
+def test_history_records_every_change(client, history_headers):
+    """Crear, editar, completar, reabrir y eliminar quedan en el historial"""
+    task_id = client.post("/api/tasks", headers=history_headers, json={"title": "Auditada"}).json()["id"]
+    client.put(f"/api/tasks/{task_id}", headers=history_headers, json={"title": "Renombrada"})
+    client.post(f"/api/tasks/{task_id}/complete", headers=history_headers)
+    client.post(f"/api/tasks/{task_id}/pending", headers=history_headers)
+    client.delete(f"/api/tasks/{task_id}", headers=history_headers)
+    activity.flush()
+
+    response = client.get(f"/api/tasks/{task_id}/history", headers=history_headers)
+
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert [item["action"] for item in items] == ["deleted", "reopened", "completed", "updated", "created"]
+    assert items[3]["changes"] == {"title": "Renombrada"}
+    assert response.json()["next_cursor"] is None
+
+
+@pytest.mark.integration
+def test_history_keyset_pagination(client, history_headers):
+    """Las páginas siguen el cursor sin repetir ni saltar registros"""
+    task_id = client.post("/api/tasks", headers=history_headers, json={"title": "T"}).json()["id"]
+    for i in range(6):
+        client.put(f"/api/tasks/{task_id}", headers=history_headers, json={"description": f"v{i}"})
+    activity.flush()
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        page = client.get(f"/api/tasks/{task_id}/history", headers=history_headers, params=params).json()
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(seen) == 7
+    assert seen == sorted(seen, reverse=True)
+
+
+@pytest.mark.integration
+def test_history_errors(client, history_headers):
+    """Tarea inexistente: 404; cursor corrupto: 400"""
+    assert client.get("/api/tasks/999/history", headers=history_headers).status_code == 404
+    task_id = client.post("/api/tasks", headers=history_headers, json={"title": "T"}).json()["id"]
+    assert client.get(f"/api/tasks/{task_id}/history?cursor=xx", headers=history_headers).status_code == 400
+
+
+def test_failed_group_operation_is_not_recorded(file_engine, monkeypatch):
+    """En un grupo, la operación que falla no deja actividad; las demás sí"""
+    monkeypatch.setattr(activity, "ENABLED", True)
+    writer = group_commit.GroupCommitWriter(
+        lambda: group_commit.GroupSession(bind=file_engine, **group_commit.SESSION_OPTIONS), window=0.2
+    )
+
+    def create_then_fail(db):
+        crud.create_task(db, schemas.TaskCreate(title="Fallida"), 1)
+        raise ValueError("fallo de la operación")
+
+    failing = writer.submit(create_then_fail)
+    ok = writer.submit(crud.create_task, schemas.TaskCreate(title="Correcta"), 1)
+    with pytest.raises(ValueError):
+        failing.result(timeout=5)
+    task = ok.result(timeout=5)
+    writer.stop()
+    activity.shutdown()
+
+    with Session(file_engine) as db:
+        assert db.execute(select(TaskActivity.task_id)).scalars().all() == [task.id]
@@ -0,0 +1,194 @@
+"""
+test_admission.py
+-----------------
+Pruebas del control de admisión: límites por clase, colas acotadas con
+plazo, 503 + Retry-After, prioridad de lecturas sobre auth y recarga en
+caliente de la configuración.
+"""
+
+import asyncio
+import json
+import os
+import time
+
+import httpx
+import pytest
+
+from app import admission, crud, debug
+from app.main import app
+
+
+def _controller(**overrides):
+    classes = {name: {**settings, **overrides.get(name, {})} for name, settings in admission.DEFAULT_CLASSES.items()}
+    return admission.AdmissionController(classes, total_limit=overrides.get("total_limit", 40), config_path="")
+
+
+@pytest.fixture
+def tight_limits():
+    """Reduce los límites del controlador global y los restaura al terminar"""
+    admission.controller.configure({"classes": {"read": {"limit": 1, "queue": 1, "timeout": 0.5}}})
+    yield admission.controller
+    admission.controller.configure({"total_limit": admission.TOTAL_LIMIT, "classes": admission.DEFAULT_CLASSES})
+
+
+# ========== PRUEBAS UNITARIAS ==========
+
+def test_classify_routes():
+    """Login y registro son auth; el resto de GET son lecturas y lo demás escrituras"""
+    assert admission.classify("POST", "/api/auth/login") == "auth"
+    assert admission.classify("POST", "/api/auth/register") == "auth"
+    assert admission.classify("GET", "/api/tasks") == "read"
+    assert admission.classify("PUT", "/api/tasks/1") == "write"
+    assert admission.classify("GET", "/api/health") is None
+    assert admission.classify("GET", "/api/_debug/admission") is None
+
+
+def test_full_queue_is_rejected_immediately():
+    """Con el límite y la cola ocupados la siguiente petición se rechaza sin esperar"""
+    controller = _controller(read={"limit": 1, "queue": 1, "timeout": 5})
+
+    async def run():
+        await controller.acquire("read")
+        waiter = asyncio.create_task(controller.acquire("read"))
+        await asyncio.sleep(0)
+        start = time.perf_counter()
+        with pytest.raises(admission.Rejected) as rejected:
+            await controller.acquire("read")
+        elapsed = time.perf_counter() - start
+        controller.release("read")
+        await waiter
+        return rejected.value, elapsed
+
+    rejected, elapsed = asyncio.run(run())
+
+    assert rejected.reason == "queue_full"
+    assert elapsed < 0.05
+    metrics = controller.metrics()["classes"]["read"]
+    assert metrics["rejected_full"] == 1
+    assert metrics["admitted"] == 2
+
+
+def test_queue_deadline():
+    """Quien espera más que el plazo de su clase se rechaza y sale de la cola"""
+    controller = _controller(write={"limit": 1, "timeout": 0.05})
+
+    async def run():
+        await controller.acquire("write")
+        with pytest.raises(admission.Rejected) as rejected:
+            await controller.acquire("write")
+        return rejected.value
+
+    rejected = asyncio.run(run())
+
+    assert rejected.reason == "timeout"
+    metrics = controller.metrics()["classes"]["write"]
+    assert metrics["waiting"] == 0
+    assert metrics["rejected_timeout"] == 1
+
+
+def test_reads_are_served_before_auth():
+    """Al liberarse un lugar del límite total pasa antes la lectura que el login"""
+    controller = _controller(total_limit=1)
+    order = []
+
+    async def admitted(name):
+        await controller.acquire(name)
+        order.append(name)
+
+    async def run():
+        await controller.acquire("write")
+        auth_waiter = asyncio.create_task(admitted("auth"))
+        await asyncio.sleep(0)
+        read_waiter = asyncio.create_task(admitted("read"))
+        await asyncio.sleep(0)
+        controller.release("write")
+        await read_waiter
+        controller.release("read")
+        await auth_waiter
+
+    asyncio.run(run())
+
+    assert order == ["read", "auth"]
+
+
+def test_saturated_read_class_does_not_block_writes():
+    """Las lecturas en cola por su propio límite no frenan a las escrituras"""
+    controller = _controller(read={"limit": 1, "queue": 1, "timeout": 5})
+
+    async def run():
+        await controller.acquire("read")
+        read_waiter = asyncio.create_task(controller.acquire("read"))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(controller.acquire("write"), 0.05)
+        controller.release("write")
+        controller.release("read")
+        await read_waiter
+
+    asyncio.run(run())
+
+    metrics = controller.metrics()["classes"]
+    assert metrics["write"]["admitted"] == 1
+    assert metrics["write"]["queued"] == 0
+
+
+def test_config_is_reloaded_when_file_changes(tmp_path, monkeypatch):
+    """Un cambio en el JSON de configuración se aplica sin reiniciar"""
+    config_path = tmp_path / "admission.json"
+    config_path.write_text(json.dumps({"classes": {"auth": {"limit": 2}}}))
+    controller = admission.AdmissionController(config_path=str(config_path))
+    monkeypatch.setattr(admission, "RELOAD_CHECK_SECONDS", 0)
+
+    controller.reload_if_changed()
+    assert controller.classes["auth"].limit == 2
+    assert controller.classes["auth"].queue == admission.DEFAULT_CLASSES["auth"]["queue"]
+
+    config_path.write_text(json.dumps({"total_limit": 8, "classes": {"auth": {"limit": 1}}}))
+    os.utime(config_path, (time.time() + 5, time.time() + 5))
+    controller.reload_if_changed()
+    assert controller.classes["auth"].limit == 1
+    assert controller.total_limit == 8
+
+
+# ========== PRUEBAS DE INTEGRACIÓN ==========
+
+@pytest.mark.integration
+def test_overload_returns_503_with_retry_after(client, auth_headers, tight_limits, monkeypatch):
+    """Con una lectura en curso y otra en cola, las demás reciben 503 + Retry-After"""
+    original = crud.get_tasks
+
+    def slow_get_tasks(*args, **kwargs):
+        time.sleep(0.2)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(crud, "get_tasks", slow_get_tasks)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            # Query strings distintos: el single-flight no las agrupa
+            return await asyncio.gather(*[
+                http.get(f"/api/tasks?search=t{i}", headers=auth_headers) for i in range(4)
+            ])
+
+    responses = asyncio.run(run())
+    statuses = sorted(response.status_code for response in responses)
+
+    assert statuses == [200, 200, 503, 503]
+    rejected = [response for response in responses if response.status_code == 503]
+    assert all(response.headers["retry-after"] == "1" for response in rejected)
+    assert rejected[0].headers["x-admission-rejected"] == "queue_full"
+
+
+@pytest.mark.integration
+def test_admission_metrics_endpoint(client, monkeypatch):
+    """Las métricas de las colas están en /api/_debug/admission (con token)"""
+    monkeypatch.setattr(debug, "DEBUG_ADMIN_TOKEN", "secreto")
+    client.get("/")
+
+    response = client.get("/api/_debug/admission", headers={"X-Debug-Token": "secreto"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body["classes"]) == {"auth", "read", "write"}
+    assert body["classes"]["auth"]["priority"] > body["classes"]["read"]["priority"]
+    assert client.get("/api/_debug/admission").status_code == 403
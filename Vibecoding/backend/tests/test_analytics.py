@@ -0,0 +1,111 @@
+"""
+test_analytics.py
+-----------------
+Pruebas de la analítica de tareas basada en rollups diarios.
+"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app import analytics
+from app.models import Task, TaskDailyStat
+
+
+def _rollups(db_session, user_id):
+    db_session.expire_all()
+    return {
+        row.day: {name: getattr(row, name) for name in analytics.COUNTERS}
+        for row in db_session.query(TaskDailyStat).filter(TaskDailyStat.user_id == user_id)
+        if any(getattr(row, name) for name in analytics.COUNTERS)
+    }
+
+
+@pytest.mark.integration
+def test_rollups_maintained_by_mutations(client, auth_headers, db_session, created_user):
+    """Crear, completar, reabrir, reprogramar y eliminar actualizan los rollups"""
+    today = datetime.utcnow().date()
+    yesterday = today - timedelta(days=1)
+
+    first = client.post("/api/tasks", headers=auth_headers, json={
+        "title": "Vencida", "due_date": f"{yesterday}T12:00:00"
+    }).json()
+    second = client.post("/api/tasks", headers=auth_headers, json={"title": "Sin fecha"}).json()
+
+    client.post(f"/api/tasks/{second['id']}/complete", headers=auth_headers)
+    client.post(f"/api/tasks/{second['id']}/complete", headers=auth_headers)  # idempotente
+    client.post(f"/api/tasks/{second['id']}/pending", headers=auth_headers)
+    client.put(f"/api/tasks/{first['id']}", headers=auth_headers, json={"due_date": f"{today}T18:00:00"})
+
+    rollups = _rollups(db_session, created_user.id)
+    assert rollups[today] == {
+        "created": 2, "completed": 1, "reopened": 1, "due": 1, "due_pending": 1
+    }
+    assert yesterday not in rollups
+
+    client.delete(f"/api/tasks/{first['id']}", headers=auth_headers)
+    assert _rollups(db_session, created_user.id)[today]["due"] == 0
+
+
+@pytest.mark.integration
+def test_backfill_matches_incremental(client, auth_headers, db_session, created_user):
+    """El backfill reconstruye los mismos rollups que el mantenimiento incremental"""
+    tomorrow = datetime.utcnow().date() + timedelta(days=1)
+    for i in range(3):
+        client.post("/api/tasks", headers=auth_headers, json={
+            "title": f"Tarea {i}", "due_date": f"{tomorrow}T09:00:00"
+        })
+    task_id = client.get("/api/tasks", headers=auth_headers).json()["tasks"][0]["id"]
+    client.post(f"/api/tasks/{task_id}/complete", headers=auth_headers)
+
+    incremental = _rollups(db_session, created_user.id)
+    analytics.backfill(db_session, created_user.id)
+
+    assert _rollups(db_session, created_user.id) == incremental
+
+
+@pytest.mark.integration
+def test_analytics_endpoint_weekly_buckets(client, auth_headers, db_session, created_user):
+    """El endpoint agrega los rollups por semana y cuenta vencidas pendientes"""
+    db_session.add_all([
+        TaskDailyStat(user_id=created_user.id, day=date(2025, 3, 3), created=2, due=1, due_pending=1),
+        TaskDailyStat(user_id=created_user.id, day=date(2025, 3, 5), completed=1),
+        TaskDailyStat(user_id=created_user.id, day=date(2025, 3, 12), created=1),
+    ])
+    db_session.commit()
+
+    response = client.get(
+        "/api/tasks/analytics?granularity=week&from=2025-03-04&to=2025-03-16",
+        headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["start"] == "2025-03-03"
+    assert [bucket["period_start"] for bucket in data["buckets"]] == ["2025-03-03", "2025-03-10"]
+    assert data["buckets"][0] == {
+        "period_start": "2025-03-03",
+        "created": 2, "completed": 1, "reopened": 0, "due": 1, "overdue": 1
+    }
+    assert data["buckets"][1]["created"] == 1
+
+
+@pytest.mark.integration
+def test_analytics_invalid_granularity(client, auth_headers):
+    """Una granularidad desconocida retorna 400"""
+    response = client.get("/api/tasks/analytics?granularity=month", headers=auth_headers)
+
+    assert response.status_code == 400
+
+
+@pytest.mark.integration
+def test_analytics_only_own_rollups(client, auth_headers, db_session, created_user):
+    """Cada usuario solo ve sus propios rollups"""
+    today = datetime.utcnow().date()
+    db_session.add(TaskDailyStat(user_id=created_user.id + 1, day=today, created=5))
+    db_session.commit()
+
+    data = client.get("/api/tasks/analytics", headers=auth_headers).json()
+
+    assert len(data["buckets"]) == 30
+    assert sum(bucket["created"] for bucket in data["buckets"]) == 0
@@ -0,0 +1,103 @@
+"""
+test_dashboard.py
+-----------------
+Pruebas de GET /api/dashboard: contenido combinado, una sola autenticación
+y validación con ETag / If-None-Match.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app import auth
+from app.models import Notification, Reminder, Task
+
+from .conftest import engine
+
+
+@pytest.fixture
+def dashboard_data(db_session, created_user):
+    now = datetime.utcnow()
+    tasks = [
+        Task(user_id=created_user.id, title="Vencida", due_date=now - timedelta(days=1)),
+        Task(user_id=created_user.id, title="Mañana", due_date=now + timedelta(days=1)),
+        Task(user_id=created_user.id, title="Hoy", due_date=now + timedelta(hours=2)),
+        Task(user_id=created_user.id, title="Hecha", status="completed", due_date=now - timedelta(days=2)),
+    ]
+    db_session.add_all(tasks)
+    db_session.flush()
+    db_session.add_all([
+        Reminder(task_id=tasks[1].id, remind_at=now + timedelta(hours=12)),
+        Reminder(task_id=tasks[0].id, remind_at=now - timedelta(days=2)),
+        Notification(user_id=created_user.id, message="Hola", type="email"),
+    ])
+    db_session.commit()
+    return tasks
+
+
+@pytest.mark.integration
+def test_dashboard_content(client, auth_headers, dashboard_data):
+    """Incluye usuario, contadores, próximas tareas, recordatorios y notificaciones"""
+    response = client.get("/api/dashboard", headers=auth_headers)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["user"]["email"] == "test@quicktask.com"
+    assert data["stats"] == {"total": 4, "pending": 3, "completed": 1, "overdue": 1}
+    assert [task["title"] for task in data["upcoming"]] == ["Hoy", "Mañana"]
+    assert [reminder["task_id"] for reminder in data["reminders"]] == [dashboard_data[1].id]
+    assert [notification["message"] for notification in data["notifications"]] == ["Hola"]
+    assert data["unread_notifications"] == 0  # creada sin pasar por crud: sin contador
+
+
+@pytest.mark.integration
+def test_dashboard_limit(client, auth_headers, dashboard_data):
+    """?limit= acota cada lista"""
+    data = client.get("/api/dashboard?limit=1", headers=auth_headers).json()
+
+    assert [task["title"] for task in data["upcoming"]] == ["Hoy"]
+
+
+@pytest.mark.integration
+def test_dashboard_authenticates_once(client, auth_headers, dashboard_data, monkeypatch):
+    """El token se valida una vez y los contadores salen de una sola consulta"""
+    decodes = []
+    original = auth.decode_access_token
+    monkeypatch.setattr(auth, "decode_access_token", lambda token: decodes.append(token) or original(token))
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        client.get("/api/dashboard", headers=auth_headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert len(decodes) == 1
+    # usuario, contadores, próximas tareas, recordatorios, notificaciones y no leídas
+    assert len(statements) == 6
+
+
+@pytest.mark.integration
+def test_dashboard_etag(client, auth_headers, dashboard_data):
+    """Con If-None-Match igual responde 304; tras un cambio, el ETag es otro"""
+    first = client.get("/api/dashboard", headers=auth_headers)
+    etag = first.headers["etag"]
+
+    cached = client.get("/api/dashboard", headers={**auth_headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+
+    client.post("/api/tasks", headers=auth_headers, json={"title": "Nueva"})
+    changed = client.get("/api/dashboard", headers={**auth_headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["stats"]["total"] == 5
+
+
+def test_dashboard_requires_auth(client):
+    assert client.get("/api/dashboard").status_code == 403
@@ -0,0 +1,251 @@
+"""
+test_delivery.py
+----------------
+Pruebas del pipeline de entrega de notificaciones (outbox).
+Usa un servidor SMTP local (aiosmtpd) y un stub HTTP local como destinos.
+"""
+
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from aiosmtpd.controller import Controller
+from sqlalchemy import update
+from sqlalchemy.orm import sessionmaker
+
+from app import delivery
+from app.models import Notification
+
+
+# ========== SERVIDORES LOCALES ==========
+
+class SinkHandler:
+    """Handler de aiosmtpd que guarda los mensajes recibidos"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_sink():
+    """Servidor SMTP local que acepta y almacena todos los mensajes"""
+    handler = SinkHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    try:
+        yield controller, handler
+    finally:
+        controller.stop()
+
+
+@pytest.fixture
+def push_stub():
+    """Stub HTTP local del gateway push; status configurable por test"""
+    state = {"status": 200, "requests": []}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            state["requests"].append(json.loads(body))
+            self.send_response(state["status"])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/push", state
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def session_factory(db_session):
+    return sessionmaker(autocommit=False, autoflush=False, bind=db_session.get_bind())
+
+
+def _add_notifications(db_session, user_id, notification_type, count):
+    for i in range(count):
+        db_session.add(Notification(user_id=user_id, message=f"Mensaje {i}", type=notification_type))
+    db_session.commit()
+
+
+# ========== PRUEBAS ==========
+
+@pytest.mark.integration
+def test_email_batch_delivered_over_single_connection(db_session, created_user, smtp_sink, session_factory):
+    """Un lote de emails se envía por una sola conexión SMTP del pool"""
+    controller, handler = smtp_sink
+    _add_notifications(db_session, created_user.id, "email", 5)
+
+    pool = delivery.SMTPConnectionPool(controller.hostname, controller.port)
+    worker = delivery.OutboxWorker(session_factory, {"email": delivery.SMTPEmailSender(pool)})
+
+    assert worker.run_once() == 5
+    assert worker.run_once() == 0
+
+    assert len(handler.messages) == 5
+    assert handler.messages[0].rcpt_tos == [created_user.email]
+    assert pool.connections_opened == 1
+
+    db_session.expire_all()
+    statuses = {n.status for n in db_session.query(Notification).all()}
+    assert statuses == {"sent"}
+    pool.close_all()
+
+
+@pytest.mark.integration
+def test_email_without_recipient_fails_only_its_item(db_session, created_user, smtp_sink, session_factory):
+    """Si falta el email de un usuario, solo esa notificación se reprograma"""
+    controller, handler = smtp_sink
+    _add_notifications(db_session, created_user.id, "email", 2)
+    db_session.add(Notification(user_id=999, message="Sin destinatario", type="email"))
+    db_session.commit()
+
+    pool = delivery.SMTPConnectionPool(controller.hostname, controller.port)
+    worker = delivery.OutboxWorker(session_factory, {"email": delivery.SMTPEmailSender(pool)})
+
+    assert worker.run_once() == 3
+    assert len(handler.messages) == 2
+
+    db_session.expire_all()
+    statuses = {n.user_id: n.status for n in db_session.query(Notification).all()}
+    assert statuses == {created_user.id: "sent", 999: "pending"}
+    orphan = db_session.query(Notification).filter_by(user_id=999).one()
+    assert "no tiene email" in orphan.last_error
+    pool.close_all()
+
+
+@pytest.mark.integration
+def test_smtp_connection_reused_between_batches(db_session, created_user, smtp_sink, session_factory):
+    """La conexión SMTP persiste entre lotes consecutivos"""
+    controller, handler = smtp_sink
+    pool = delivery.SMTPConnectionPool(controller.hostname, controller.port)
+    worker = delivery.OutboxWorker(
+        session_factory, {"email": delivery.SMTPEmailSender(pool)}, batch_size=2
+    )
+    _add_notifications(db_session, created_user.id, "email", 4)
+
+    assert worker.run_once() == 2
+    assert worker.run_once() == 2
+
+    assert len(handler.messages) == 4
+    assert pool.connections_opened == 1
+    pool.close_all()
+
+
+@pytest.mark.integration
+def test_push_delivered_through_http_sender(db_session, created_user, push_stub, session_factory):
+    """Las notificaciones push se envían al gateway HTTP reutilizando la conexión"""
+    url, state = push_stub
+    _add_notifications(db_session, created_user.id, "push", 3)
+
+    pool = delivery.HTTPConnectionPool(url)
+    worker = delivery.OutboxWorker(session_factory, {"push": delivery.HTTPPushSender(pool)})
+
+    assert worker.run_once() == 3
+    assert [r["message"] for r in state["requests"]] == ["Mensaje 0", "Mensaje 1", "Mensaje 2"]
+    assert all(r["user_id"] == created_user.id for r in state["requests"])
+    assert pool.connections_opened == 1
+    pool.close_all()
+
+
+@pytest.mark.integration
+def test_failed_delivery_retries_with_backoff_then_dead_letter(db_session, created_user, push_stub, session_factory):
+    """Un fallo reprograma con backoff exponencial y tras max_attempts pasa a 'dead'"""
+    url, state = push_stub
+    state["status"] = 500
+    _add_notifications(db_session, created_user.id, "push", 1)
+
+    worker = delivery.OutboxWorker(
+        session_factory,
+        {"push": delivery.HTTPPushSender(delivery.HTTPConnectionPool(url))},
+        max_attempts=3,
+        backoff_base=10.0
+    )
+
+    assert worker.run_once() == 1
+    notification = db_session.query(Notification).one()
+    assert notification.status == "pending"
+    assert notification.attempts == 1
+    assert "HTTP 500" in notification.last_error
+    assert (notification.next_attempt_at - notification.claimed_at).total_seconds() == pytest.approx(10, abs=1)
+
+    # No se reintenta antes de que venza el backoff
+    assert worker.run_once() == 0
+
+    for expected_attempts in (2, 3):
+        notification.next_attempt_at = notification.claimed_at
+        db_session.commit()
+        assert worker.run_once() == 1
+        db_session.refresh(notification)
+        assert notification.attempts == expected_attempts
+
+    assert notification.status == "dead"
+    assert len(state["requests"]) == 3
+
+
+@pytest.mark.integration
+def test_worker_that_lost_its_lease_does_not_overwrite(db_session, created_user, session_factory):
+    """Si otro worker reclamó el lote durante el envío, el primero no escribe sus resultados"""
+    _add_notifications(db_session, created_user.id, "push", 2)
+
+    class ReclaimedSender:
+        """Simula un lote más largo que el lease: otro worker reclama las filas a mitad del envío"""
+
+        def send_batch(self, items):
+            other = session_factory()
+            other.execute(update(Notification).values(claim_token="otro-worker", attempts=3))
+            other.commit()
+            other.close()
+            return [None, delivery.DeliveryError("falló")]
+
+    worker = delivery.OutboxWorker(session_factory, {"push": ReclaimedSender()})
+
+    assert worker.run_once() == 2
+    db_session.expire_all()
+    for notification in db_session.query(Notification).all():
+        assert notification.status == "sending"
+        assert notification.claim_token == "otro-worker"
+        assert notification.attempts == 3
+        assert notification.last_error is None
+
+
+def test_backoff_is_exponential_and_capped():
+    """El backoff se duplica en cada intento hasta el máximo configurado"""
+    worker = delivery.OutboxWorker(lambda: None, {}, backoff_base=30.0, backoff_max=100.0)
+
+    assert worker.backoff(1).total_seconds() == 30
+    assert worker.backoff(2).total_seconds() == 60
+    assert worker.backoff(3).total_seconds() == 100
+
+
+@pytest.mark.integration
+def test_missing_sender_schedules_retry(db_session, created_user, session_factory):
+    """Sin sender para el tipo, la notificación queda pendiente con el error registrado"""
+    _add_notifications(db_session, created_user.id, "push", 1)
+    worker = delivery.OutboxWorker(session_factory, {})
+
+    assert worker.run_once() == 1
+    notification = db_session.query(Notification).one()
+    assert notification.status == "pending"
+    assert "No hay sender" in notification.last_error
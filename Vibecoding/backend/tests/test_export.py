@@ -0,0 +1,108 @@
+"""
+test_export.py
+--------------
+Pruebas de la exportación de tareas en streaming (NDJSON / CSV).
+"""
+
+import csv
+import gzip
+import io
+import json
+import tracemalloc
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert
+
+from app import crud, export
+from app.models import Task
+
+
+def _bulk_tasks(db_session, user_id, count, start=0):
+    now = datetime.utcnow()
+    db_session.execute(insert(Task), [
+        {
+            "user_id": user_id,
+            "title": f"Tarea {i}",
+            "description": "x" * 200,
+            "status": "pending",
+            "created_at": now,
+            "updated_at": now
+        }
+        for i in range(start, start + count)
+    ])
+    db_session.commit()
+
+
+def _peak_export_memory(db_session, user_id):
+    """Pico de memoria (bytes) al consumir la exportación completa"""
+    tracemalloc.start()
+    try:
+        rows = crud.iter_tasks_for_export(db_session, user_id, chunk_size=200)
+        for _ in export.gzip_stream(export.stream_tasks(rows, "ndjson")):
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.integration
+def test_export_ndjson(client, auth_headers, created_task):
+    """Exporta las tareas como NDJSON (una tarea por línea)"""
+    response = client.get("/api/tasks/export?format=ndjson", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = response.text.strip().split("\n")
+    assert len(lines) == 1
+    record = json.loads(lines[0])
+    assert record["id"] == created_task.id
+    assert record["title"] == created_task.title
+    assert record["status"] == "pending"
+
+
+@pytest.mark.integration
+def test_export_csv_gzip(client, auth_headers, db_session, created_user):
+    """Exporta como CSV comprimido al vuelo con gzip"""
+    _bulk_tasks(db_session, created_user.id, 3)
+
+    response = client.get("/api/tasks/export?format=csv&gzip=true", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    assert "tasks.csv.gz" in response.headers["content-disposition"]
+    rows = list(csv.reader(io.StringIO(gzip.decompress(response.content).decode("utf-8"))))
+    assert rows[0] == list(export.EXPORT_FIELDS)
+    assert [row[1] for row in rows[1:]] == ["Tarea 0", "Tarea 1", "Tarea 2"]
+
+
+@pytest.mark.integration
+def test_export_invalid_format(client, auth_headers):
+    """Un formato desconocido retorna 400"""
+    response = client.get("/api/tasks/export?format=xml", headers=auth_headers)
+
+    assert response.status_code == 400
+
+
+@pytest.mark.integration
+def test_export_only_own_tasks(client, auth_headers, db_session, created_user):
+    """La exportación solo incluye tareas del usuario autenticado"""
+    _bulk_tasks(db_session, created_user.id, 2)
+    _bulk_tasks(db_session, created_user.id + 1, 2)
+
+    response = client.get("/api/tasks/export", headers=auth_headers)
+
+    assert len(response.text.strip().split("\n")) == 2
+
+
+@pytest.mark.slow
+def test_export_memory_stays_flat(db_session, created_user):
+    """La memoria pico de la exportación no crece con el número de tareas"""
+    _bulk_tasks(db_session, created_user.id, 500)
+    small_peak = _peak_export_memory(db_session, created_user.id)
+
+    _bulk_tasks(db_session, created_user.id, 19500, start=500)
+    large_peak = _peak_export_memory(db_session, created_user.id)
+
+    # 40x más tareas (~5 MB de datos) con un pico de memoria prácticamente igual
+    assert large_peak < small_peak * 1.5
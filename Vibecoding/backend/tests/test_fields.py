@@ -0,0 +1,72 @@
+"""
+test_fields.py
+--------------
+Pruebas de sparse fieldsets (?fields=) en los endpoints de tareas:
+proyección de columnas en SQL, modelo de respuesta derivado y validación.
+"""
+
+import pytest
+from sqlalchemy import insert
+
+from app import crud, schemas
+from app.models import Task
+
+
+@pytest.fixture
+def long_tasks(db_session, created_user):
+    db_session.execute(insert(Task), [
+        {"user_id": created_user.id, "title": f"Tarea {i}", "description": "texto largo " * 200}
+        for i in range(20)
+    ])
+    db_session.commit()
+
+
+# ========== PRUEBAS UNITARIAS ==========
+
+def test_projection_model_is_cached_and_restricted():
+    """El modelo derivado se cachea por proyección y solo tiene esos campos"""
+    model = schemas.task_projection(("id", "title"))
+
+    assert schemas.task_projection(("id", "title")) is model
+    assert set(model.model_fields) == {"id", "title"}
+
+
+def test_get_tasks_selects_only_requested_columns(db_session, created_user, long_tasks, captured_statements):
+    """Con fields, la consulta no lee description"""
+    user_id = created_user.id
+    with captured_statements() as statements:
+        tasks = crud.get_tasks(db_session, user_id, fields=("id", "title", "status", "due_date"))
+
+    assert len(tasks) == 20
+    assert "description" not in statements[0][0].split("FROM")[0]
+
+
+# ========== PRUEBAS DE INTEGRACIÓN ==========
+
+@pytest.mark.integration
+def test_list_tasks_with_fields(client, auth_headers, long_tasks):
+    """Cada tarea trae solo los campos pedidos (más id) y el payload se reduce"""
+    full = client.get("/api/tasks", headers=auth_headers)
+    sparse = client.get("/api/tasks?fields=title,status,due_date", headers=auth_headers)
+
+    assert sparse.status_code == 200
+    data = sparse.json()
+    assert data["total"] == 20
+    assert set(data["tasks"][0]) == {"id", "title", "status", "due_date"}
+    assert len(sparse.content) * 10 < len(full.content)
+
+
+@pytest.mark.integration
+def test_get_task_with_fields(client, auth_headers, created_task):
+    """El detalle admite ?fields="""
+    response = client.get(f"/api/tasks/{created_task.id}?fields=title", headers=auth_headers)
+
+    assert response.json() == {"id": created_task.id, "title": created_task.title}
+
+
+@pytest.mark.integration
+def test_unknown_field_rejected(client, auth_headers):
+    """Un campo desconocido retorna 400"""
+    response = client.get("/api/tasks?fields=title,password_hash", headers=auth_headers)
+
+    assert response.status_code == 400
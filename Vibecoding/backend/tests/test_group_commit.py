@@ -0,0 +1,126 @@
+"""
+test_group_commit.py
+--------------------
+Pruebas del group commit: agrupación de escrituras concurrentes,
+aislamiento de errores por operación y endpoints con el escritor activo.
+"""
+
+import threading
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app import crud, group_commit, schemas
+from app.database import Base, create_db_engine
+from app.models import Task, User
+
+
+@pytest.fixture
+def file_engine(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path}/group.db")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.add(User(email="group@quicktask.com", password_hash="x"))
+        db.commit()
+    yield engine
+    engine.dispose()
+
+
+def _writer(engine, **kwargs):
+    return group_commit.GroupCommitWriter(
+        lambda: group_commit.GroupSession(bind=engine, **group_commit.SESSION_OPTIONS), **kwargs
+    )
+
+
+def _task_titles(engine):
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(select(Task.title))}
+
+
+# ========== PRUEBAS UNITARIAS ==========
+
+def test_concurrent_writes_share_commits(file_engine):
+    """Escrituras concurrentes se confirman en menos transacciones que operaciones"""
+    writer = _writer(file_engine, window=0.02, synchronous="FULL")
+    results = []
+
+    def create(i):
+        future = writer.submit(crud.create_task, schemas.TaskCreate(title=f"Tarea {i}"), 1)
+        results.append(future.result(timeout=10))
+
+    threads = [threading.Thread(target=create, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.stop()
+
+    assert len({task.id for task in results}) == 20
+    assert all(task.created_at is not None for task in results)  # desconectadas pero cargadas
+    assert writer.operations == 20
+    assert writer.batches < 20
+    assert len(_task_titles(file_engine)) == 20
+
+
+def test_failed_operation_only_rolls_back_itself(file_engine):
+    """Un error deshace solo su SAVEPOINT y se entrega a su llamador"""
+    writer = _writer(file_engine, window=0.2)
+
+    def create_then_fail(db):
+        crud.create_task(db, schemas.TaskCreate(title="Fallida"), 1)
+        raise ValueError("fallo de la operación")
+
+    failing = writer.submit(create_then_fail)
+    ok = writer.submit(crud.create_task, schemas.TaskCreate(title="Correcta"), 1)
+
+    with pytest.raises(ValueError):
+        failing.result(timeout=5)
+    assert ok.result(timeout=5).title == "Correcta"
+    writer.stop()
+
+    assert writer.batches == 1
+    assert _task_titles(file_engine) == {"Correcta"}
+
+
+def test_synchronous_is_restored_on_pooled_connection(file_engine):
+    """PRAGMA synchronous del grupo no queda en la conexión que vuelve al pool"""
+    with file_engine.connect() as conn:
+        before = conn.exec_driver_sql("PRAGMA synchronous").scalar()
+    writer = _writer(file_engine, synchronous="OFF")
+    writer.submit(crud.create_task, schemas.TaskCreate(title="Tarea"), 1).result(timeout=5)
+    writer.stop()
+
+    assert file_engine.pool.checkedin() == 1  # la misma conexión que usó el escritor
+    with file_engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == before != 0
+
+
+def test_invalid_synchronous_mode(file_engine):
+    """Solo se aceptan modos válidos de PRAGMA synchronous"""
+    with pytest.raises(ValueError):
+        _writer(file_engine, synchronous="SOMETIMES")
+
+
+# ========== PRUEBAS DE INTEGRACIÓN ==========
+
+@pytest.fixture
+def group_commit_enabled(monkeypatch):
+    monkeypatch.setattr(group_commit, "ENABLED", True)
+    yield
+    group_commit.shutdown()
+
+
+@pytest.mark.integration
+def test_endpoints_with_group_commit(client, auth_headers, db_session, group_commit_enabled):
+    """Crear, completar y eliminar funcionan a través del escritor"""
+    created = client.post("/api/tasks", headers=auth_headers, json={"title": "Agrupada"})
+    assert created.status_code == 201
+    task_id = created.json()["id"]
+
+    completed = client.post(f"/api/tasks/{task_id}/complete", headers=auth_headers)
+    assert completed.json()["status"] == "completed"
+    assert client.post("/api/tasks/999/complete", headers=auth_headers).status_code == 404
+
+    assert client.delete(f"/api/tasks/{task_id}", headers=auth_headers).status_code == 204
+    assert db_session.scalar(select(func.count()).select_from(Task)) == 0
@@ -0,0 +1,182 @@
+"""
+test_idempotency.py
+-------------------
+Pruebas del header Idempotency-Key: repetición de la respuesta guardada,
+conflicto de cuerpo, aislamiento por usuario y coalescencia de duplicados.
+"""
+
+import asyncio
+import time
+import uuid
+
+import msgpack
+import pytest
+
+from app import auth, idempotency
+from app.models import Task
+
+
+def _key():
+    return str(uuid.uuid4())
+
+
+# ========== PRUEBAS UNITARIAS ==========
+
+def test_memory_store_ttl_and_set_if_absent():
+    """add() solo guarda claves nuevas y las entradas caducan con su TTL"""
+    store = idempotency.MemoryStore()
+    assert store.add("k", b"1", ttl=0.05)
+    assert not store.add("k", b"2", ttl=0.05)
+    assert store.get("k") == b"1"
+    time.sleep(0.06)
+    assert store.get("k") is None
+
+
+def test_concurrent_duplicates_are_coalesced():
+    """Dos peticiones simultáneas con la misma clave ejecutan el endpoint una vez"""
+    calls = []
+
+    async def slow_app(scope, receive, send):
+        message = await receive()
+        calls.append(message["body"])
+        await asyncio.sleep(0.05)
+        await send({"type": "http.response.start", "status": 201, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": b'{"id": 1}'})
+
+    middleware = idempotency.IdempotencyMiddleware(slow_app, store=idempotency.MemoryStore())
+    token = auth.create_access_token({"sub": "1"})
+    scope = {
+        "type": "http", "method": "POST", "path": "/api/tasks",
+        "headers": [(b"authorization", f"Bearer {token}".encode()), (b"idempotency-key", b"abc")],
+    }
+
+    async def request():
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b'{"title": "x"}', "more_body": False}
+
+        async def send(message):
+            sent.append(message)
+
+        await middleware(scope, receive, send)
+        return sent
+
+    async def main():
+        return await asyncio.gather(request(), request())
+
+    first, second = asyncio.run(main())
+
+    assert len(calls) == 1
+    assert first[0]["status"] == second[0]["status"] == 201
+    assert first[1]["body"] == second[1]["body"] == b'{"id": 1}'
+    assert (b"idempotent-replayed", b"true") in second[0]["headers"]
+
+
+def test_slow_original_keeps_its_in_flight_marker():
+    """Una original más lenta que el TTL de la marca no deja pasar al reintento"""
+    calls = []
+
+    async def slow_app(scope, receive, send):
+        message = await receive()
+        calls.append(message["body"])
+        await asyncio.sleep(0.3)
+        await send({"type": "http.response.start", "status": 201, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    # TTL de la marca = 2 x wait = 0.1 s, muy por debajo de los 0.3 s de la original
+    middleware = idempotency.IdempotencyMiddleware(slow_app, store=idempotency.MemoryStore(), wait=0.05)
+    token = auth.create_access_token({"sub": "1"})
+    scope = {
+        "type": "http", "method": "POST", "path": "/api/tasks",
+        "headers": [(b"authorization", f"Bearer {token}".encode()), (b"idempotency-key", b"slow")],
+    }
+
+    async def request(delay):
+        await asyncio.sleep(delay)
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"{}", "more_body": False}
+
+        async def send(message):
+            sent.append(message)
+
+        await middleware(scope, receive, send)
+        return sent[0]["status"]
+
+    async def main():
+        return await asyncio.gather(request(0), request(0.2))
+
+    assert asyncio.run(main()) == [201, 409]
+    assert len(calls) == 1
+
+
+# ========== PRUEBAS DE INTEGRACIÓN ==========
+
+@pytest.mark.integration
+def test_retry_replays_first_response(client, auth_headers, db_session):
+    """El reintento retorna la misma respuesta sin crear otra tarea"""
+    headers = {**auth_headers, "Idempotency-Key": _key()}
+
+    first = client.post("/api/tasks", headers=headers, json={"title": "Una vez"})
+    retry = client.post("/api/tasks", headers=headers, json={"title": "Una vez"})
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert db_session.query(Task).count() == 1
+
+
+@pytest.mark.integration
+def test_key_reused_with_different_body(client, auth_headers):
+    """Reusar la clave con otro cuerpo retorna 422"""
+    headers = {**auth_headers, "Idempotency-Key": _key()}
+    client.post("/api/tasks", headers=headers, json={"title": "Original"})
+
+    response = client.post("/api/tasks", headers=headers, json={"title": "Otra"})
+
+    assert response.status_code == 422
+
+
+@pytest.mark.integration
+def test_keys_scoped_per_user(client, auth_headers, db_session):
+    """La misma clave de dos usuarios distintos no colisiona"""
+    key = _key()
+    client.post("/api/tasks", headers={**auth_headers, "Idempotency-Key": key}, json={"title": "Mía"})
+
+    credentials = {"email": "otro@quicktask.com", "password": "Secret123!"}
+    client.post("/api/auth/register", json=credentials)
+    token = client.post("/api/auth/login", json=credentials).json()["access_token"]
+    other = client.post(
+        "/api/tasks",
+        headers={"Authorization": f"Bearer {token}", "Idempotency-Key": key},
+        json={"title": "Mía"}
+    )
+
+    assert other.status_code == 201
+    assert "idempotent-replayed" not in other.headers
+    assert db_session.query(Task).count() == 2
+
+
+@pytest.mark.integration
+def test_without_key_requests_are_not_deduplicated(client, auth_headers, db_session):
+    """Sin Idempotency-Key el comportamiento no cambia"""
+    client.post("/api/tasks", headers=auth_headers, json={"title": "Dup"})
+    client.post("/api/tasks", headers=auth_headers, json={"title": "Dup"})
+
+    assert db_session.query(Task).count() == 2
+
+
+@pytest.mark.integration
+def test_replay_uses_the_retry_format(client, auth_headers, db_session):
+    """La primera respuesta fue MessagePack; un reintento que pide JSON la recibe en JSON"""
+    headers = {**auth_headers, "Idempotency-Key": _key()}
+    first = client.post("/api/tasks", headers={**headers, "Accept": "application/msgpack"}, json={"title": "Formato"})
+    retry = client.post("/api/tasks", headers=headers, json={"title": "Formato"})
+
+    assert first.headers["content-type"] == "application/msgpack"
+    assert retry.headers["content-type"] == "application/json"
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json() == msgpack.unpackb(first.content, raw=False)
+    assert db_session.query(Task).count() == 1
@@ -0,0 +1,170 @@
+"""
+test_import.py
+--------------
+Pruebas de la importación masiva de tareas (CSV / NDJSON / multipart).
+"""
+
+import json
+import time
+
+import pytest
+
+from app import importer
+from app.models import Task
+
+
+def _ndjson(records):
+    return "\n".join(json.dumps(record) for record in records).encode("utf-8")
+
+
+# ========== PRUEBAS DE DECODIFICACIÓN ==========
+
+def test_csv_decoder_handles_split_chunks_and_multiline_fields():
+    """El decodificador CSV tolera bloques partidos y campos con saltos de línea"""
+    body = b'title,description\nUno,"linea 1\nlinea 2"\nDos,\n'
+    decoder = importer.CSVDecoder()
+
+    records = []
+    for i in range(0, len(body), 3):
+        records.extend(decoder.feed(body[i:i + 3]))
+    records.extend(decoder.close())
+
+    assert records == [
+        (1, {"title": "Uno", "description": "linea 1\nlinea 2"}),
+        (2, {"title": "Dos", "description": None}),
+    ]
+
+
+def test_ndjson_decoder_reports_invalid_lines():
+    """Las líneas con JSON inválido se reportan con su número de línea"""
+    decoder = importer.NDJSONDecoder()
+
+    records = decoder.feed(b'{"title": "Uno"}\n{roto\n\n{"title": "Dos"}')
+    records += decoder.close()
+
+    assert records[0] == (1, {"title": "Uno"})
+    assert records[1][0] == 2 and isinstance(records[1][1], ValueError)
+    assert records[2] == (4, {"title": "Dos"})
+
+
+# ========== PRUEBAS DE INTEGRACIÓN ==========
+
+@pytest.mark.integration
+def test_import_ndjson(client, auth_headers, db_session):
+    """Importa tareas NDJSON y reporta errores por fila"""
+    body = _ndjson([
+        {"title": "Primera", "due_date": "2025-12-31T10:00:00"},
+        {"title": ""},
+        {"title": "Completada", "status": "completed"},
+        {"description": "sin título"},
+    ])
+
+    response = client.post(
+        "/api/tasks/import",
+        headers={**auth_headers, "Content-Type": "application/x-ndjson"},
+        content=body
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "completed"
+    assert data["processed"] == 4
+    assert data["inserted"] == 2
+    assert data["failed"] == 2
+    assert [error["row"] for error in data["errors"]] == [2, 4]
+
+    tasks = db_session.query(Task).order_by(Task.id).all()
+    assert [(t.title, t.status) for t in tasks] == [("Primera", "pending"), ("Completada", "completed")]
+
+
+@pytest.mark.integration
+def test_import_csv_multipart(client, auth_headers, db_session):
+    """Importa un CSV subido como archivo multipart/form-data"""
+    csv_body = "title,description,due_date\nA,desc A,\nB,,2025-01-01T00:00:00\n"
+
+    response = client.post(
+        "/api/tasks/import",
+        headers=auth_headers,
+        files={"file": ("tareas.csv", csv_body, "text/csv")}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 2
+    titles = [t.title for t in db_session.query(Task).order_by(Task.id)]
+    assert titles == ["A", "B"]
+
+
+@pytest.mark.integration
+def test_import_inserts_in_chunks(client, auth_headers, db_session, monkeypatch):
+    """Las filas se insertan en varias transacciones de tamaño fijo"""
+    monkeypatch.setattr(importer, "IMPORT_CHUNK_SIZE", 10)
+    calls = []
+    original = importer.crud.bulk_create_tasks
+
+    def counting_bulk_create(db, user_id, rows):
+        calls.append(len(rows))
+        return original(db, user_id, rows)
+
+    monkeypatch.setattr(importer.crud, "bulk_create_tasks", counting_bulk_create)
+
+    body = _ndjson([{"title": f"Tarea {i}"} for i in range(25)])
+    response = client.post(
+        "/api/tasks/import",
+        headers={**auth_headers, "Content-Type": "application/x-ndjson"},
+        content=body
+    )
+
+    assert response.json()["inserted"] == 25
+    assert calls == [10, 10, 5]
+
+
+@pytest.mark.integration
+def test_import_unsupported_format(client, auth_headers):
+    """Un tipo de contenido no soportado retorna 415"""
+    response = client.post(
+        "/api/tasks/import",
+        headers={**auth_headers, "Content-Type": "application/xml"},
+        content=b"<tasks/>"
+    )
+
+    assert response.status_code == 415
+
+
+@pytest.mark.integration
+def test_import_async_job_progress(client, file_db):
+    """Con Prefer: respond-async retorna 202 y el progreso se consulta por job id"""
+    FileSession, auth_headers = file_db
+    body = _ndjson([{"title": f"Tarea {i}"} for i in range(50)])
+
+    response = client.post(
+        "/api/tasks/import",
+        headers={
+            **auth_headers,
+            "Content-Type": "application/x-ndjson",
+            "Prefer": "respond-async"
+        },
+        content=body
+    )
+
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert response.headers["location"] == f"/api/tasks/import/{job_id}"
+
+    for _ in range(100):
+        job = client.get(f"/api/tasks/import/{job_id}", headers=auth_headers).json()
+        if job["status"] != "running":
+            break
+        time.sleep(0.05)
+
+    assert job["status"] == "completed"
+    assert job["inserted"] == 50
+    with FileSession() as db:
+        assert db.query(Task).count() == 50
+
+
+@pytest.mark.integration
+def test_import_job_not_found(client, auth_headers):
+    """Consultar un trabajo inexistente retorna 404"""
+    response = client.get("/api/tasks/import/no-existe", headers=auth_headers)
+
+    assert response.status_code == 404
@@ -0,0 +1,74 @@
+"""
+test_include.py
+---------------
+Pruebas de ?include=reminder: recordatorio embebido en tareas y
+precarga con selectinload (dos consultas para N tareas, sin N+1).
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import crud
+from app.models import Task, Reminder
+
+
+@pytest.fixture
+def tasks_with_reminders(db_session, created_user):
+    """10 tareas; las pares tienen recordatorio"""
+    tasks = [Task(user_id=created_user.id, title=f"Tarea {i}") for i in range(10)]
+    db_session.add_all(tasks)
+    db_session.commit()
+    remind_at = datetime.utcnow() + timedelta(days=1)
+    db_session.add_all([Reminder(task_id=task.id, remind_at=remind_at) for task in tasks[::2]])
+    db_session.commit()
+    return [task.id for task in tasks]
+
+
+# ========== PRUEBAS UNITARIAS ==========
+
+def test_include_reminder_costs_two_queries(db_session, created_user, tasks_with_reminders, captured_statements):
+    """El listado con reminder precargado usa 2 consultas y no hace lazy loads"""
+    user_id = created_user.id
+    db_session.expire_all()
+    with captured_statements() as statements:
+        tasks = crud.get_tasks(db_session, user_id, include=("reminder",))
+        with_reminder = [task for task in tasks if task.reminder is not None]
+
+    assert len(tasks) == 10
+    assert len(with_reminder) == 5
+    assert len(statements) == 2
+
+
+# ========== PRUEBAS DE INTEGRACIÓN ==========
+
+@pytest.mark.integration
+def test_list_tasks_include_reminder(client, auth_headers, tasks_with_reminders):
+    """Cada tarea trae su recordatorio anidado (o null)"""
+    response = client.get("/api/tasks?include=reminder", headers=auth_headers)
+
+    assert response.status_code == 200
+    tasks = {task["id"]: task for task in response.json()["tasks"]}
+    first, second = tasks[tasks_with_reminders[0]], tasks[tasks_with_reminders[1]]
+    assert first["reminder"]["task_id"] == first["id"]
+    assert second["reminder"] is None
+    assert "description" in first
+
+
+@pytest.mark.integration
+def test_get_task_include_reminder_with_fields(client, auth_headers, tasks_with_reminders):
+    """include se combina con fields en el detalle"""
+    task_id = tasks_with_reminders[0]
+    response = client.get(f"/api/tasks/{task_id}?include=reminder&fields=title", headers=auth_headers)
+
+    data = response.json()
+    assert set(data) == {"id", "title", "reminder"}
+    assert data["reminder"]["task_id"] == task_id
+
+
+@pytest.mark.integration
+def test_unknown_include_rejected(client, auth_headers):
+    """Un recurso desconocido en include retorna 400"""
+    response = client.get("/api/tasks?include=owner", headers=auth_headers)
+
+    assert response.status_code == 400
@@ -0,0 +1,180 @@
+"""
+test_labels.py
+--------------
+Pruebas de etiquetas: bitmaps del índice en memoria, filtro
+GET /api/tasks?labels=... (all / any) combinado con los demás filtros,
+?include=labels y mantenimiento del índice en las escrituras.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event, insert
+
+from app import labels
+from app.labels import Bitmap, UserLabels
+from app.models import Label, Task, task_labels
+
+from .conftest import engine
+
+
+# ========== PRUEBAS UNITARIAS ==========
+
+def test_bitmap_operations_across_chunks():
+    """AND / OR / iteración con ids en bloques distintos de 2^16"""
+    a = Bitmap([1, 5, 70000, 1 << 40])
+    b = Bitmap([5, 70000, 9])
+
+    assert list(a & b) == [5, 70000]
+    assert list(a | b) == [1, 5, 9, 70000, 1 << 40]
+    assert len(a) == 4 and 70000 in a and 6 not in a
+
+    a.discard(70000)
+    a.discard(123456789)
+    assert list(a) == [1, 5, 1 << 40]
+    assert 70000 >> 16 not in a.chunks
+
+
+def test_user_labels_match_modes():
+    """'all' exige todas las etiquetas; en 'any' los nombres desconocidos se ignoran"""
+    index = UserLabels([(1, "casa"), (2, "urgente")], [(10, 1), (11, 1), (11, 2), (12, 2)])
+
+    assert list(index.match(["casa", "urgente"], "all")) == [11]
+    assert list(index.match(["casa", "urgente"], "any")) == [10, 11, 12]
+    assert list(index.match(["casa", "otra"], "all")) == []
+    assert list(index.match(["casa", "otra"], "any")) == [10, 11]
+
+    index.set_task_labels(11, [1])
+    assert list(index.match(["urgente"])) == [12]
+    index.remove_label(1)
+    assert list(index.match(["casa"], "any")) == []
+
+
+def test_write_during_load_is_not_lost(db_session, created_user, monkeypatch):
+    """Una asignación confirmada mientras se carga el índice no queda fuera de él"""
+    user_id = created_user.id
+    label = Label(user_id=user_id, name="casa")
+    task = Task(user_id=user_id, title="T")
+    db_session.add_all([label, task])
+    db_session.commit()
+    label_id, task_id = label.id, task.id
+    index = labels.LabelIndex()
+    original = db_session.execute
+
+    def execute_then_write(*args, **kwargs):
+        calls = db_session.info["calls"] = db_session.info.get("calls", 0) + 1
+        if calls != 2:
+            return original(*args, **kwargs)
+        rows = original(*args, **kwargs).all()
+        # Otra petición etiqueta la tarea después de que la carga leyó las asignaciones
+        db_session.execute(insert(task_labels), {"task_id": task_id, "label_id": label_id})
+        db_session.commit()
+        index.task_labels_set(user_id, task_id, [label_id])
+        return SimpleNamespace(all=lambda: rows)
+
+    monkeypatch.setattr(db_session, "execute", execute_then_write)
+
+    assert index.match(db_session, user_id, ["casa"]) == [task_id]
+
+
+# ========== PRUEBAS DE INTEGRACIÓN ==========
+
+@pytest.fixture
+def labeled_tasks(client, auth_headers):
+    """Tres tareas: A (casa, urgente), B (casa), C (trabajo)"""
+    label_ids = {
+        name: client.post("/api/labels", headers=auth_headers, json={"name": name}).json()["id"]
+        for name in ("casa", "urgente", "trabajo")
+    }
+    tasks = {}
+    for title, names in (("A", ["casa", "urgente"]), ("B", ["casa"]), ("C", ["trabajo"])):
+        task_id = client.post("/api/tasks", headers=auth_headers, json={"title": title}).json()["id"]
+        client.put(f"/api/tasks/{task_id}/labels", headers=auth_headers,
+                   json={"label_ids": [label_ids[name] for name in names]})
+        tasks[title] = task_id
+    return tasks, label_ids
+
+
+def _titles(client, auth_headers, query: str) -> list:
+    response = client.get(f"/api/tasks?{query}", headers=auth_headers)
+    assert response.status_code == 200
+    return sorted(task["title"] for task in response.json()["tasks"])
+
+
+@pytest.mark.integration
+def test_filter_by_labels(client, auth_headers, labeled_tasks):
+    """labels= con modo all (por defecto) y any"""
+    assert _titles(client, auth_headers, "labels=casa") == ["A", "B"]
+    assert _titles(client, auth_headers, "labels=casa,urgente") == ["A"]
+    assert _titles(client, auth_headers, "labels=urgente,trabajo&labels_mode=any") == ["A", "C"]
+    assert _titles(client, auth_headers, "labels=casa,nada") == []
+    assert client.get("/api/tasks?labels=casa&labels_mode=x", headers=auth_headers).status_code == 400
+
+
+@pytest.mark.integration
+def test_label_filter_combines_with_other_filters(client, auth_headers, labeled_tasks):
+    """El filtro de etiquetas se combina con status y search en la misma consulta"""
+    tasks, _ = labeled_tasks
+    client.post(f"/api/tasks/{tasks['A']}/complete", headers=auth_headers)
+
+    assert _titles(client, auth_headers, "labels=casa&status=pending") == ["B"]
+    assert _titles(client, auth_headers, "labels=casa&search=A") == ["A"]
+
+
+@pytest.mark.integration
+def test_label_filter_does_not_join_task_labels(client, auth_headers, labeled_tasks):
+    """Con el índice cargado, el listado filtra por ids sin JOIN a task_labels"""
+    client.get("/api/tasks?labels=casa", headers=auth_headers)
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        client.get("/api/tasks?labels=casa,urgente", headers=auth_headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert not any("task_labels" in statement for statement in statements)
+
+
+@pytest.mark.integration
+def test_include_labels(client, auth_headers, labeled_tasks):
+    """?include=labels embebe las etiquetas de cada tarea ordenadas por nombre"""
+    response = client.get("/api/tasks?include=labels&fields=title", headers=auth_headers)
+
+    tasks = {task["title"]: task for task in response.json()["tasks"]}
+    assert [label["name"] for label in tasks["A"]["labels"]] == ["casa", "urgente"]
+    assert tasks["C"]["labels"][0]["name"] == "trabajo"
+
+
+@pytest.mark.integration
+def test_index_follows_writes(client, auth_headers, labeled_tasks):
+    """Reasignar, eliminar tareas y etiquetas actualiza el índice ya cargado"""
+    tasks, label_ids = labeled_tasks
+    assert _titles(client, auth_headers, "labels=casa") == ["A", "B"]
+
+    client.put(f"/api/tasks/{tasks['C']}/labels", headers=auth_headers,
+               json={"label_ids": [label_ids["casa"]]})
+    client.delete(f"/api/tasks/{tasks['B']}", headers=auth_headers)
+    assert _titles(client, auth_headers, "labels=casa") == ["A", "C"]
+
+    assert client.delete(f"/api/labels/{label_ids['urgente']}", headers=auth_headers).status_code == 204
+    assert _titles(client, auth_headers, "labels=urgente") == []
+    assert len(labels.index) == 1
+
+
+@pytest.mark.integration
+def test_label_endpoints_validation(client, auth_headers, labeled_tasks):
+    """Nombre repetido, etiqueta ajena o tarea inexistente"""
+    tasks, label_ids = labeled_tasks
+
+    assert client.post("/api/labels", headers=auth_headers, json={"name": "casa"}).status_code == 400
+    assert [label["name"] for label in client.get("/api/labels", headers=auth_headers).json()] == \
+        ["casa", "trabajo", "urgente"]
+    response = client.put(f"/api/tasks/{tasks['A']}/labels", headers=auth_headers, json={"label_ids": [999]})
+    assert response.status_code == 400
+    response = client.put("/api/tasks/999/labels", headers=auth_headers, json={"label_ids": []})
+    assert response.status_code == 404
+    assert client.delete("/api/labels/999", headers=auth_headers).status_code == 404
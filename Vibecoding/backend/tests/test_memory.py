@@ -0,0 +1,78 @@
+"""
+test_memory.py
+--------------
+Pruebas del seguimiento de memoria (tracemalloc) y de /api/_debug/memory.
+"""
+
+import pytest
+
+from app import debug, memory
+
+TOKEN = "token-de-diagnostico"
+
+_retained = []
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    """Tracker global activo, midiendo el pico de todas las peticiones"""
+    monkeypatch.setattr(memory, "ROUTE_SAMPLE_RATE", 1.0)
+    memory.tracker.routes.clear()
+    memory.tracker.start()
+    yield memory.tracker
+    memory.tracker.stop()
+    memory.tracker.routes.clear()
+    memory.tracker.history.clear()
+
+
+# ========== PRUEBAS UNITARIAS ==========
+
+def test_detect_growth():
+    """Un crecimiento sostenido es fuga; calentamiento más meseta no lo es"""
+    assert memory.detect_growth([100, 200, 300, 400, 500, 600], tolerance=50)
+    assert not memory.detect_growth([100, 900, 1000, 990, 1005, 995], tolerance=50)
+    assert not memory.detect_growth([100, 101, 102, 103, 104, 105], tolerance=50)
+    assert not memory.detect_growth([100, 200, 300], tolerance=50)
+
+
+def test_snapshot_diff_reports_top_allocators(tracker):
+    """La comparación entre snapshots señala la línea que retuvo memoria"""
+    tracker.take_snapshot()
+    _retained.append([bytearray(1024) for _ in range(2000)])
+    try:
+        tracker.take_snapshot()
+    finally:
+        _retained.clear()
+
+    [top] = tracker.top_growth[:1]
+    assert "test_memory.py" in top["location"]
+    assert top["size_diff_bytes"] >= 2000 * 1024
+    assert len(tracker.history) == 2
+
+
+# ========== PRUEBAS DE INTEGRACIÓN ==========
+
+@pytest.mark.integration
+def test_route_peaks_use_route_templates(client, auth_headers, tracker):
+    """El pico de cada petición se agrupa por la plantilla de la ruta"""
+    created = client.post("/api/tasks", headers=auth_headers, json={"title": "Memoria"}).json()
+    client.get(f"/api/tasks/{created['id']}", headers=auth_headers)
+    client.get(f"/api/tasks/{created['id']}", headers=auth_headers)
+
+    routes = tracker.report()["routes"]
+    assert routes["GET /api/tasks/{task_id}"]["samples"] == 2
+    assert routes["POST /api/tasks"]["max_peak_bytes"] > 0
+
+
+@pytest.mark.integration
+def test_memory_debug_endpoint(client, tracker, monkeypatch):
+    """El informe está protegido por el token de diagnóstico"""
+    monkeypatch.setattr(debug, "DEBUG_ADMIN_TOKEN", TOKEN)
+    assert client.get("/api/_debug/memory").status_code == 403
+
+    report = client.get("/api/_debug/memory?snapshot=true", headers={"X-Debug-Token": TOKEN}).json()
+
+    assert report["enabled"] is True
+    assert report["traced_bytes"] > 0
+    assert len(report["history"]) == 1
+    assert set(report) >= {"rss_bytes", "top_growth", "routes", "growing"}
@@ -0,0 +1,123 @@
+"""
+test_negotiation.py
+-------------------
+Pruebas de negociación de contenido (JSON / MessagePack) y compresión br/gzip.
+"""
+
+import gzip
+import json
+
+import msgpack
+import pytest
+from sqlalchemy import insert
+
+from app import negotiation
+from app.models import Task
+
+
+@pytest.fixture
+def many_tasks(db_session, created_user):
+    db_session.execute(insert(Task), [
+        {"user_id": created_user.id, "title": f"Tarea {i}", "description": "descripción " * 10}
+        for i in range(50)
+    ])
+    db_session.commit()
+
+
+# ========== PRUEBAS UNITARIAS ==========
+
+def test_preferred_format():
+    """MessagePack solo se elige si el cliente lo acepta con q >= JSON"""
+    assert negotiation.preferred_format("application/msgpack") == "msgpack"
+    assert negotiation.preferred_format("application/json, application/msgpack;q=0.5") == "json"
+    assert negotiation.preferred_format("application/x-msgpack, */*;q=0.1") == "msgpack"
+    assert negotiation.preferred_format("*/*") == "json"
+    assert negotiation.preferred_format("") == "json"
+
+
+def test_preferred_encoding():
+    """br tiene prioridad sobre gzip salvo que el cliente indique otra cosa"""
+    assert negotiation.preferred_encoding("gzip") == "gzip"
+    assert negotiation.preferred_encoding("identity") is None
+    if negotiation.brotli is not None:
+        assert negotiation.preferred_encoding("gzip, br") == "br"
+        assert negotiation.preferred_encoding("br;q=0.5, gzip") == "gzip"
+
+
+# ========== PRUEBAS DE INTEGRACIÓN ==========
+
+@pytest.mark.integration
+def test_msgpack_response(client, auth_headers, many_tasks):
+    """Accept: application/msgpack retorna el listado en MessagePack"""
+    response = client.get(
+        "/api/tasks",
+        headers={**auth_headers, "Accept": "application/msgpack", "Accept-Encoding": "identity"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    assert "Accept" in response.headers["vary"]
+    data = msgpack.unpackb(response.content, raw=False)
+    assert data["total"] == 50
+    assert len(data["tasks"]) == 50
+
+
+@pytest.mark.integration
+def test_json_remains_default(client, auth_headers, created_task):
+    """Sin Accept explícito la respuesta sigue siendo JSON"""
+    response = client.get(f"/api/tasks/{created_task.id}", headers=auth_headers)
+
+    assert response.headers["content-type"] == "application/json"
+    assert response.json()["id"] == created_task.id
+
+
+@pytest.mark.integration
+def test_large_response_gzip_compressed(client, auth_headers, many_tasks):
+    """Las respuestas grandes se comprimen con gzip si el cliente lo acepta"""
+    with client.stream("GET", "/api/tasks", headers={**auth_headers, "Accept-Encoding": "gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) == len(raw)
+    assert json.loads(gzip.decompress(raw))["total"] == 50
+
+
+@pytest.mark.integration
+def test_small_response_not_compressed(client):
+    """Las respuestas por debajo del umbral no se comprimen"""
+    response = client.get("/api/health", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+
+
+@pytest.mark.integration
+def test_brotli_compression(client, auth_headers, many_tasks):
+    """Con br aceptado (y brotli instalado) se usa Brotli"""
+    brotli = pytest.importorskip("brotli")
+    with client.stream(
+        "GET", "/api/tasks",
+        headers={**auth_headers, "Accept": "application/msgpack", "Accept-Encoding": "br"}
+    ) as response:
+        raw = b"".join(response.iter_raw())
+
+    assert response.headers["content-encoding"] == "br"
+    assert msgpack.unpackb(brotli.decompress(raw), raw=False)["total"] == 50
+
+
+@pytest.mark.integration
+def test_import_accepts_msgpack(client, auth_headers, db_session):
+    """La importación masiva acepta un flujo de mapas MessagePack"""
+    body = b"".join(msgpack.packb({"title": f"Tarea {i}"}) for i in range(5))
+    body += msgpack.packb({"title": ""})
+
+    response = client.post(
+        "/api/tasks/import",
+        headers={**auth_headers, "Content-Type": "application/msgpack"},
+        content=body
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["inserted"] == 5
+    assert data["failed"] == 1
+    assert db_session.query(Task).count() == 5
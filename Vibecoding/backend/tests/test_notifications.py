@@ -0,0 +1,137 @@
+"""
+test_notifications.py
+---------------------
+Pruebas del estado de lectura de notificaciones: contador de no leídas
+mantenido de forma incremental y marcado masivo como leídas.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, event, update
+
+from app import crud
+from app.models import Notification, NotificationCounter, User
+
+from .conftest import engine
+
+
+@pytest.fixture
+def notifications(db_session, created_user):
+    created = [crud.create_notification(db_session, created_user.id, f"Aviso {i}", "push") for i in range(5)]
+    # Fechas de envío escalonadas: Aviso 0 es el más antiguo
+    for i, notification in enumerate(created):
+        db_session.execute(
+            update(Notification).where(Notification.id == notification.id)
+            .values(sent_at=datetime(2024, 1, 1) + timedelta(days=i))
+        )
+    db_session.commit()
+    return created
+
+
+# ========== PRUEBAS UNITARIAS ==========
+
+def test_counter_follows_creations_and_reads(db_session, created_user, notifications):
+    """Crear suma al contador y marcar como leídas resta las filas afectadas"""
+    assert crud.get_unread_count(db_session, created_user.id) == 5
+
+    assert crud.mark_notifications_read(db_session, created_user.id, up_to_id=notifications[1].id) == 2
+    assert crud.get_unread_count(db_session, created_user.id) == 3
+
+    # Repetir no vuelve a descontar las ya leídas
+    assert crud.mark_notifications_read(db_session, created_user.id, up_to_id=notifications[1].id) == 0
+    assert crud.get_unread_count(db_session, created_user.id) == 3
+
+
+def test_counter_is_seeded_when_missing(db_session, created_user, notifications):
+    """Sin fila de contador (datos previos) se siembra con las no leídas reales"""
+    db_session.execute(delete(NotificationCounter))
+    db_session.commit()
+
+    assert crud.mark_notifications_read(db_session, created_user.id, up_to_id=notifications[1].id) == 2
+    assert crud.get_unread_count(db_session, created_user.id) == 3
+
+    db_session.execute(delete(NotificationCounter))
+    db_session.commit()
+    crud.create_notification(db_session, created_user.id, "Aviso nuevo", "push")
+    assert crud.get_unread_count(db_session, created_user.id) == 4
+
+
+def test_counter_never_goes_below_zero(db_session, created_user, notifications):
+    """Un contador desfasado hacia abajo queda en 0 y no en negativo"""
+    db_session.execute(update(NotificationCounter).values(unread=1))
+    db_session.commit()
+
+    assert crud.mark_notifications_read(db_session, created_user.id) == 5
+    assert crud.get_unread_count(db_session, created_user.id) == 0
+
+
+def test_mark_read_is_one_update(db_session, created_user, notifications):
+    """El marcado masivo es un UPDATE sobre las notificaciones más el upsert del contador"""
+    user_id = created_user.id
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        crud.mark_notifications_read(db_session, user_id)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert len([statement for statement in statements if statement.startswith("UPDATE notifications")]) == 1
+    assert not any(statement.startswith("SELECT") for statement in statements)
+
+
+# ========== PRUEBAS DE INTEGRACIÓN ==========
+
+@pytest.mark.integration
+def test_unread_count_endpoint(client, auth_headers, created_user):
+    """Las notificaciones creadas por la API cuentan como no leídas"""
+    for i in range(3):
+        client.post("/api/notifications", headers=auth_headers,
+                    json={"user_id": created_user.id, "message": f"Aviso {i}", "type": "email"})
+
+    response = client.get("/api/notifications/unread-count", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json() == {"unread": 3}
+    assert all(not notification["is_read"] for notification in
+               client.get("/api/notifications", headers=auth_headers).json())
+
+
+@pytest.mark.integration
+def test_mark_read_by_timestamp(client, auth_headers, notifications):
+    """before marca las enviadas hasta esa fecha (inclusive)"""
+    response = client.post("/api/notifications/mark-read", headers=auth_headers,
+                           json={"before": "2024-01-03T00:00:00"})
+
+    assert response.status_code == 200
+    assert response.json() == {"marked": 3, "unread": 2}
+    listed = {n["message"]: n for n in client.get("/api/notifications", headers=auth_headers).json()}
+    assert listed["Aviso 2"]["is_read"] and listed["Aviso 2"]["read_at"]
+    assert not listed["Aviso 3"]["is_read"]
+
+
+@pytest.mark.integration
+def test_mark_all_read(client, auth_headers, notifications):
+    """Sin límites se marcan todas y el badge queda en cero"""
+    response = client.post("/api/notifications/mark-read", headers=auth_headers, json={})
+
+    assert response.json() == {"marked": 5, "unread": 0}
+    assert client.get("/api/notifications/unread-count", headers=auth_headers).json() == {"unread": 0}
+
+
+@pytest.mark.integration
+def test_mark_read_only_affects_own_notifications(client, auth_headers, notifications, db_session):
+    """Las notificaciones de otro usuario no se marcan ni cambian su contador"""
+    other = User(email="otro@quicktask.com", password_hash="x")
+    db_session.add(other)
+    db_session.commit()
+    crud.create_notification(db_session, other.id, "Ajena", "email")
+
+    response = client.post("/api/notifications/mark-read", headers=auth_headers, json={})
+
+    assert response.json()["marked"] == 5
+    assert crud.get_unread_count(db_session, other.id) == 1
@@ -0,0 +1,172 @@
+"""
+test_profiling.py
+-----------------
+Pruebas del perfilado bajo demanda y de /api/_debug/profiles.
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app import crud, debug, profiling
+from app.main import app
+
+TOKEN = "token-de-diagnostico"
+
+
+def _busy_wait(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+@pytest.fixture
+def debug_token(monkeypatch):
+    monkeypatch.setattr(debug, "DEBUG_ADMIN_TOKEN", TOKEN)
+    profiling.store.clear()
+    yield {"X-Debug-Token": TOKEN}
+    profiling.store.clear()
+
+
+@pytest.fixture
+def slow_list(monkeypatch):
+    """GET /api/tasks tarda ~50 ms en una función reconocible"""
+    original = crud.get_tasks
+
+    def slow_get_tasks(*args, **kwargs):
+        _busy_wait(0.05)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(crud, "get_tasks", slow_get_tasks)
+
+
+# ========== PRUEBAS UNITARIAS ==========
+
+def test_sampling_profiler_sees_other_threads():
+    """El perfilador muestrea el hilo que trabaja y omite los que esperan"""
+    profiler = profiling.SamplingProfiler(interval=0.001)
+    profiler.start()
+    _busy_wait(0.05)
+    samples = profiler.stop()
+
+    assert sum(samples.values()) > 0
+    assert any("_busy_wait" in stack.split(";")[-1] for stack in samples)
+
+
+def test_profile_store_is_bounded():
+    """Solo se conservan los últimos perfiles"""
+    store = profiling.ProfileStore(max_profiles=2)
+    for request_id in ("a", "b", "c"):
+        store.add({"request_id": request_id, "stacks": {}})
+
+    assert [summary["request_id"] for summary in store.summaries()] == ["c", "b"]
+    assert store.get("a") is None
+
+
+# ========== PRUEBAS DE INTEGRACIÓN ==========
+
+@pytest.mark.integration
+def test_profile_requested_with_admin_header(client, auth_headers, debug_token, slow_list):
+    """X-Profile con el token perfila la petición y el perfil se consulta por su id"""
+    before = time.time()
+    response = client.get(
+        "/api/tasks", headers={**auth_headers, "X-Profile": TOKEN, "X-Request-ID": "req-1"}
+    )
+
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+
+    [summary] = client.get("/api/_debug/profiles", headers=debug_token).json()
+    assert summary["path"] == "/api/tasks" and summary["status"] == 200
+    assert summary["client_request_id"] == "req-1"
+    assert summary["duration_ms"] >= 50
+    assert before <= summary["started_at"] <= before + summary["duration_ms"] / 1000
+
+    profile = client.get(f"/api/_debug/profiles/{profile_id}", headers=debug_token).json()
+    assert any("slow_get_tasks" in stack for stack in profile["stacks"])
+
+    collapsed = client.get(f"/api/_debug/profiles/{profile_id}?format=collapsed", headers=debug_token)
+    assert collapsed.headers["content-type"].startswith("text/plain")
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed.text.splitlines())
+
+
+@pytest.mark.integration
+def test_profile_ids_are_generated_by_the_server(client, auth_headers, debug_token):
+    """Un X-Request-ID repetido no reemplaza un perfil anterior"""
+    headers = {**auth_headers, "X-Profile": TOKEN, "X-Request-ID": "fijo"}
+    first = client.get("/api/tasks", headers=headers).headers["x-profile-id"]
+    second = client.get("/api/tasks", headers=headers).headers["x-profile-id"]
+
+    assert first != second
+    assert len(client.get("/api/_debug/profiles", headers=debug_token).json()) == 2
+
+
+@pytest.mark.integration
+def test_concurrent_requests_do_not_leak_into_profile(client, auth_headers, debug_token, slow_list, monkeypatch):
+    """Las pilas de otra petición que corre a la vez en el threadpool no entran al perfil"""
+    original = crud.get_upcoming_tasks
+
+    def other_request_work(*args, **kwargs):
+        _busy_wait(0.1)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(crud, "get_upcoming_tasks", other_request_work)
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            other = asyncio.ensure_future(async_client.get("/api/tasks/upcoming", headers=auth_headers))
+            await asyncio.sleep(0.02)
+            profiled = await async_client.get("/api/tasks", headers={**auth_headers, "X-Profile": TOKEN})
+            await other
+            return profiled.headers["x-profile-id"]
+
+    profile_id = asyncio.run(main())
+
+    stacks = profiling.store.get(profile_id)["stacks"]
+    assert any("slow_get_tasks" in stack for stack in stacks)
+    assert not any("other_request_work" in stack for stack in stacks)
+
+
+@pytest.mark.integration
+def test_requests_not_profiled_without_trigger(client, auth_headers, debug_token):
+    """Sin header válido ni muestreo la petición no se perfila"""
+    response = client.get("/api/tasks", headers={**auth_headers, "X-Profile": "otro"})
+
+    assert "x-profile-id" not in response.headers
+    assert client.get("/api/_debug/profiles", headers=debug_token).json() == []
+
+
+@pytest.mark.integration
+def test_sample_rate_profiles_requests(client, debug_token, monkeypatch):
+    """Con PROFILING_SAMPLE_RATE=1 todas las peticiones se perfilan"""
+    monkeypatch.setattr(profiling, "SAMPLE_RATE", 1.0)
+
+    response = client.get("/api/health")
+
+    assert "x-profile-id" in response.headers
+    assert len(client.get("/api/_debug/profiles", headers=debug_token).json()) >= 1
+
+
+@pytest.mark.integration
+def test_debug_endpoints_are_guarded(client, monkeypatch):
+    """Sin token configurado no existen; con token incorrecto retornan 403"""
+    monkeypatch.setattr(debug, "DEBUG_ADMIN_TOKEN", "")
+    assert client.get("/api/_debug/profiles").status_code == 404
+
+    monkeypatch.setattr(debug, "DEBUG_ADMIN_TOKEN", TOKEN)
+    assert client.get("/api/_debug/profiles", headers={"X-Debug-Token": "otro"}).status_code == 403
+    assert client.get("/api/_debug/profiles/nada", headers={"X-Debug-Token": TOKEN}).status_code == 404
+
+
+@pytest.mark.integration
+def test_non_ascii_tokens_are_rejected_not_errors(client, debug_token):
+    """Un header con caracteres no ASCII es un token inválido, no un error 500"""
+    non_ascii = "é".encode("utf-8")
+
+    response = client.get("/api/health", headers={"X-Profile": non_ascii})
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+    assert client.get("/api/_debug/profiles", headers={"X-Debug-Token": non_ascii}).status_code == 403
@@ -0,0 +1,113 @@
+"""
+test_replicas.py
+----------------
+Pruebas del enrutado de lecturas a réplica con read-your-writes.
+El primario y la réplica son dos archivos SQLite; la prueba los
+sincroniza explícitamente (backup) para simular el lag de replicación.
+"""
+
+import time
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app import database, replicas
+from app.database import Base, create_db_engine, get_db
+from app.main import app
+
+
+@pytest.fixture
+def primary_and_replica(tmp_path, monkeypatch):
+    primary = create_db_engine(f"sqlite:///{tmp_path}/primary.db")
+    replica = create_db_engine(f"sqlite:///{tmp_path}/replica.db")
+    Base.metadata.create_all(bind=primary)
+    PrimarySession = sessionmaker(autoflush=False, bind=primary)
+
+    def primary_get_db():
+        db = PrimarySession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def sync():
+        """Copia el primario sobre la réplica (replicación completa)"""
+        source, target = primary.raw_connection(), replica.raw_connection()
+        try:
+            source.driver_connection.backup(target.driver_connection)
+        finally:
+            source.close()
+            target.close()
+
+    previous = app.dependency_overrides[get_db]
+    app.dependency_overrides[get_db] = primary_get_db
+    monkeypatch.setattr(database, "ReplicaSessionLocal", sessionmaker(autoflush=False, bind=replica))
+    replicas.pins.clear()
+    sync()
+    yield sync
+    app.dependency_overrides[get_db] = previous
+    replicas.pins.clear()
+    primary.dispose()
+    replica.dispose()
+
+
+@pytest.fixture
+def replica_headers(client, primary_and_replica, sample_user_data):
+    client.post("/api/auth/register", json=sample_user_data)
+    token = client.post("/api/auth/login", json=sample_user_data).json()["access_token"]
+    primary_and_replica()
+    return {"Authorization": f"Bearer {token}"}
+
+
+# ========== PRUEBAS UNITARIAS ==========
+
+def test_read_pin_expires():
+    """El pin de lectura tras escritura caduca tras la ventana configurada"""
+    pins = replicas.ReadPins(seconds=0.05)
+    pins.pin(7)
+    assert pins.is_pinned(7)
+    assert not pins.is_pinned(8)
+    time.sleep(0.06)
+    assert not pins.is_pinned(7)
+
+
+# ========== PRUEBAS DE INTEGRACIÓN ==========
+
+@pytest.mark.integration
+def test_reads_go_to_replica(client, primary_and_replica, replica_headers):
+    """Sin escrituras recientes los GET leen de la réplica (aunque vaya retrasada)"""
+    client.post("/api/tasks", headers=replica_headers, json={"title": "Nueva"})
+    replicas.pins.clear()  # simula que pasó la ventana de read-your-writes
+
+    assert client.get("/api/tasks", headers=replica_headers).json()["total"] == 0
+
+    primary_and_replica()
+    assert client.get("/api/tasks", headers=replica_headers).json()["total"] == 1
+
+
+@pytest.mark.integration
+def test_read_your_writes_after_mutation(client, primary_and_replica, replica_headers):
+    """Tras una escritura el usuario lee del primario y ve su cambio"""
+    created = client.post("/api/tasks", headers=replica_headers, json={"title": "Nueva"}).json()
+
+    assert client.get("/api/tasks", headers=replica_headers).json()["total"] == 1
+    detail = client.get(f"/api/tasks/{created['id']}", headers=replica_headers)
+    assert detail.status_code == 200
+
+    client.post(f"/api/tasks/{created['id']}/complete", headers=replica_headers)
+    assert client.get("/api/tasks", headers=replica_headers).json()["completed"] == 1
+
+
+@pytest.mark.integration
+def test_label_index_is_loaded_from_primary(client, primary_and_replica, replica_headers):
+    """Una réplica retrasada no deja un índice de etiquetas desactualizado para las peticiones siguientes"""
+    label_id = client.post("/api/labels", headers=replica_headers, json={"name": "casa"}).json()["id"]
+    task_id = client.post("/api/tasks", headers=replica_headers, json={"title": "A"}).json()["id"]
+    primary_and_replica()
+    client.put(f"/api/tasks/{task_id}/labels", headers=replica_headers, json={"label_ids": [label_id]})
+    replicas.pins.clear()  # la réplica aún no tiene la asignación
+
+    assert [task["title"] for task in client.get("/api/tasks?labels=casa", headers=replica_headers).json()["tasks"]] == ["A"]
+
+    primary_and_replica()
+    assert [task["title"] for task in client.get("/api/tasks?labels=casa", headers=replica_headers).json()["tasks"]] == ["A"]
@@ -0,0 +1,153 @@
+"""
+test_sharding.py
+----------------
+Pruebas del sharding por usuario: enrutado de sesiones, ids globales,
+API completa sobre shards y rebalanceo entre distintos números de shards.
+"""
+
+import pytest
+from sqlalchemy import func, select
+
+from app import crud, schemas, sharding
+from app.database import Base, create_db_engine, get_db
+from app.main import app
+from app.models import Task, Reminder, User
+
+
+def _router(tmp_path, count, directory=None):
+    directory = directory or create_db_engine(f"sqlite:///{tmp_path}/directory.db")
+    shards = [create_db_engine(f"sqlite:///{tmp_path}/shard_{i}.db") for i in range(count)]
+    router = sharding.ShardRouter(directory, shards, Base.metadata)
+    router.create_all()
+    return router
+
+
+def _session(router):
+    return sharding.RoutingSession(router=router, autoflush=False)
+
+
+def _task_count(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(Task.__table__)).scalar()
+
+
+def _create_users(router, count):
+    db = _session(router)
+    users = [
+        crud.create_user(db, schemas.UserCreate(email=f"user{i}@quicktask.com", password="Secret123!"), "hash")
+        for i in range(count)
+    ]
+    ids = [user.id for user in users]
+    db.close()
+    return ids
+
+
+@pytest.fixture
+def router(tmp_path):
+    return _router(tmp_path, 3)
+
+
+# ========== PRUEBAS UNITARIAS ==========
+
+def test_users_in_directory_tasks_in_user_shard(router):
+    """Los usuarios viven en el directorio y sus tareas en shard = user_id % N"""
+    user_ids = _create_users(router, 3)
+    with router.directory_engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(User.__table__)).scalar() == 3
+
+    for user_id in user_ids:
+        db = _session(router)
+        sharding.route_to_user(db, user_id)
+        task = crud.create_task(db, schemas.TaskCreate(title=f"Tarea de {user_id}"), user_id)
+        crud.create_reminder(db, schemas.ReminderCreate(task_id=task.id, remind_at="2030-01-01T09:00:00"), user_id)
+        db.close()
+
+    for index, engine in enumerate(router.shards):
+        expected = sum(1 for user_id in user_ids if user_id % 3 == index)
+        assert _task_count(engine) == expected
+
+
+def test_unrouted_session_rejects_shard_queries(router):
+    """Sin usuario fijado, acceder a una tabla repartida es un error explícito"""
+    db = _session(router)
+    assert db.query(User).count() == 0  # el directorio sí es accesible
+    with pytest.raises(sharding.ShardRoutingError):
+        db.query(Task).count()
+    db.close()
+
+
+def test_ids_unique_across_shards(router):
+    """Los ids se asignan globalmente (ORM y bulk insert)"""
+    user_ids = _create_users(router, 3)
+    ids = []
+    for user_id in user_ids:
+        db = _session(router)
+        sharding.route_to_user(db, user_id)
+        crud.bulk_create_tasks(db, user_id, [{"title": "Bulk"}, {"title": "Bulk 2"}])
+        ids.append(crud.create_task(db, schemas.TaskCreate(title="ORM"), user_id).id)
+        ids += [task.id for task in crud.get_tasks(db, user_id) if task.title != "ORM"]
+        db.close()
+
+    assert len(ids) == 9
+    assert len(set(ids)) == 9
+
+
+def test_rebalance_moves_user_data(tmp_path):
+    """Pasar de 2 a 3 shards mueve las filas, conserva ids y actualiza el directorio"""
+    before = _router(tmp_path, 2)
+    user_ids = _create_users(before, 4)
+    for user_id in user_ids:
+        db = _session(before)
+        sharding.route_to_user(db, user_id)
+        task = crud.create_task(db, schemas.TaskCreate(title=f"Tarea de {user_id}"), user_id)
+        crud.create_reminder(db, schemas.ReminderCreate(task_id=task.id, remind_at="2030-01-01T09:00:00"), user_id)
+        db.close()
+
+    after = _router(tmp_path, 3, directory=before.directory_engine)
+    moved = sharding.rebalance(before, after, user_ids)
+
+    assert moved  # al menos un usuario cambia de shard
+    assert sum(_task_count(engine) for engine in after.shards) == 4
+    fresh = _router(tmp_path, 3, directory=before.directory_engine)
+    for user_id in user_ids:
+        assert fresh.shard_for_user(user_id) == user_id % 3
+        db = _session(fresh)
+        sharding.route_to_user(db, user_id)
+        tasks = crud.get_tasks(db, user_id)
+        assert len(tasks) == 1
+        assert db.query(Reminder).filter(Reminder.task_id == tasks[0].id).count() == 1
+        db.close()
+
+
+# ========== PRUEBAS DE INTEGRACIÓN ==========
+
+@pytest.mark.integration
+def test_api_over_shards(client, router):
+    """Registro, login y CRUD de tareas funcionan con la sesión enrutada"""
+    def sharded_get_db():
+        db = _session(router)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    previous = app.dependency_overrides[get_db]
+    app.dependency_overrides[get_db] = sharded_get_db
+    try:
+        tokens = []
+        for i in range(2):
+            credentials = {"email": f"api{i}@quicktask.com", "password": "Secret123!"}
+            client.post("/api/auth/register", json=credentials)
+            tokens.append(client.post("/api/auth/login", json=credentials).json()["access_token"])
+
+        for i, token in enumerate(tokens):
+            headers = {"Authorization": f"Bearer {token}"}
+            created = client.post("/api/tasks", headers=headers, json={"title": f"Tarea {i}"})
+            assert created.status_code == 201
+            listing = client.get("/api/tasks", headers=headers).json()
+            assert [task["title"] for task in listing["tasks"]] == [f"Tarea {i}"]
+    finally:
+        app.dependency_overrides[get_db] = previous
+
+    # Usuarios 1 y 2 -> shards 1 y 2; el shard 0 queda vacío
+    assert [_task_count(engine) for engine in router.shards] == [0, 1, 1]
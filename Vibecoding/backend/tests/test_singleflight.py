@@ -0,0 +1,124 @@
+"""
+test_singleflight.py
+--------------------
+Pruebas del single-flight: GET idénticos concurrentes comparten una sola
+ejecución. Las peticiones concurrentes usan httpx sobre la app ASGI y una
+BD en archivo (cada hilo del threadpool con su propia conexión).
+"""
+
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from app import crud, singleflight
+from app.main import app
+
+
+@pytest.fixture
+def slow_list(monkeypatch):
+    """get_tasks tarda 200 ms y cuenta sus ejecuciones"""
+    calls = []
+    lock = threading.Lock()
+    original = crud.get_tasks
+
+    def slow_get_tasks(db, user_id, status=None, *args, **kwargs):
+        with lock:
+            calls.append(status)
+        time.sleep(0.2)
+        return original(db, user_id, status, *args, **kwargs)
+
+    monkeypatch.setattr(crud, "get_tasks", slow_get_tasks)
+    return calls
+
+
+def _burst(*requests):
+    """Lanza las peticiones (método, url, headers[, json]) a la vez y retorna sus respuestas"""
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(*[
+                http.request(method, url, headers=headers, json=body[0] if body else None)
+                for method, url, headers, *body in requests
+            ])
+
+    return asyncio.run(run())
+
+
+# ========== PRUEBAS UNITARIAS ==========
+
+def test_coalesced_paths():
+    """Se agrupan las lecturas de tareas, no la exportación ni la importación"""
+    assert singleflight.is_coalesced("/api/tasks")
+    assert singleflight.is_coalesced("/api/tasks/12")
+    assert not singleflight.is_coalesced("/api/tasks/export")
+    assert not singleflight.is_coalesced("/api/tasks/import/abc")
+    assert not singleflight.is_coalesced("/api/health")
+
+
+# ========== PRUEBAS DE INTEGRACIÓN ==========
+
+@pytest.mark.integration
+def test_identical_reads_share_one_execution(file_auth_headers, slow_list):
+    """10 GET idénticos simultáneos ejecutan el endpoint una vez"""
+    responses = _burst(*[("GET", "/api/tasks", file_auth_headers)] * 10)
+
+    assert len(slow_list) == 1
+    assert {response.status_code for response in responses} == {200}
+    assert len({response.content for response in responses}) == 1
+    assert sum(response.headers.get("x-singleflight") == "shared" for response in responses) == 9
+
+
+@pytest.mark.integration
+def test_different_queries_are_not_shared(file_auth_headers, slow_list):
+    """Query strings distintos son ejecuciones distintas"""
+    _burst(
+        ("GET", "/api/tasks?status=pending", file_auth_headers),
+        ("GET", "/api/tasks?status=completed", file_auth_headers),
+        ("GET", "/api/tasks?status=pending", file_auth_headers),
+    )
+
+    assert sorted(slow_list) == ["completed", "pending"]
+
+
+@pytest.mark.integration
+def test_reads_after_a_write_see_it(file_auth_headers, slow_list):
+    """Una lectura que empieza tras una escritura no reutiliza la ejecución anterior"""
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            before = asyncio.create_task(http.get("/api/tasks", headers=file_auth_headers))
+            await asyncio.sleep(0.05)
+            await http.post("/api/tasks", headers=file_auth_headers, json={"title": "Nueva"})
+            after = await http.get("/api/tasks", headers=file_auth_headers)
+            return await before, after
+
+    before, after = asyncio.run(run())
+
+    assert len(slow_list) == 2
+    assert "x-singleflight" not in after.headers
+    assert after.json()["total"] == 1
+
+
+@pytest.mark.integration
+def test_leader_cancellation_does_not_affect_followers(file_auth_headers, slow_list):
+    """Si el cliente que inició la ejecución se va, los demás reciben la respuesta"""
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            leader = asyncio.create_task(http.get("/api/tasks", headers=file_auth_headers))
+            await asyncio.sleep(0.02)
+            follower = asyncio.create_task(http.get("/api/tasks", headers=file_auth_headers))
+            await asyncio.sleep(0.02)
+            leader.cancel()
+            response = await follower
+            return leader, response
+
+    leader, response = asyncio.run(run())
+
+    assert leader.cancelled()
+    assert response.status_code == 200
+    assert response.headers["x-singleflight"] == "shared"
+    assert len(slow_list) == 1
@@ -0,0 +1,103 @@
+"""
+test_slow_queries.py
+--------------------
+Pruebas del registro de consultas lentas y de /api/_debug/slow-queries.
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from app import debug, slow_queries
+
+from .conftest import engine
+
+TOKEN = "token-de-diagnostico"
+
+
+@pytest.fixture
+def record_all(monkeypatch):
+    """Umbral mínimo: todas las sentencias del engine de pruebas cuentan como lentas"""
+    slow_queries.instrument_engine(engine)
+    monkeypatch.setattr(slow_queries.log, "threshold_ms", 1e-6)
+    monkeypatch.setattr(debug, "DEBUG_ADMIN_TOKEN", TOKEN)
+    slow_queries.log.clear()
+    yield slow_queries.log
+    slow_queries.log.clear()
+
+
+# ========== PRUEBAS UNITARIAS ==========
+
+def test_normalize_sql():
+    """Se colapsan espacios, literales y listas IN de largo variable"""
+    statement = "SELECT *\n  FROM tasks\nWHERE id IN (?, ?, ?) AND title = 'x''y' LIMIT 10"
+
+    assert slow_queries.normalize_sql(statement) == "SELECT * FROM tasks WHERE id IN (?, ...) AND title = ? LIMIT ?"
+    assert slow_queries.normalize_sql("SELECT anon_1.id FROM tasks_1") == "SELECT anon_1.id FROM tasks_1"
+
+
+def test_redact_parameters():
+    """Los textos se reemplazan por su tipo y longitud"""
+    when = datetime(2025, 1, 1)
+
+    assert slow_queries.redact_parameters(("ana@mail.com", 7, None, when)) == [
+        "<str len=12>", 7, None, "2025-01-01T00:00:00"
+    ]
+    assert slow_queries.redact_parameters({"password": b"hash"}) == {"password": "<bytes len=4>"}
+    assert slow_queries.redact_parameters([(1, "a"), (2, "b")]) == "<executemany x2>"
+
+
+def test_log_keeps_top_n_by_total_time():
+    """Se conservan las sentencias con más tiempo acumulado"""
+    log = slow_queries.SlowQueryLog(threshold_ms=1, top_n=2)
+    for i in range(5):
+        log.record(f"SELECT {i}", float(i), [], None)
+    log.record("SELECT 1", 10.0, [], "GET /x")
+    log.record("SELECT 4", 3.0, [], "GET /y")
+
+    top = log.top()
+    assert [entry["sql"] for entry in top] == ["SELECT 1", "SELECT 4"]
+    assert top[1]["count"] == 2 and top[1]["total_ms"] == 7.0
+    assert top[0]["endpoints"] == ["GET /x"]
+
+
+# ========== PRUEBAS DE INTEGRACIÓN ==========
+
+@pytest.mark.integration
+def test_search_is_recorded_with_endpoint_and_plan(client, auth_headers, record_all):
+    """La búsqueda con LIKE queda registrada con su endpoint, parámetros redactados y plan"""
+    client.post("/api/tasks", headers=auth_headers, json={"title": "Informe"})
+    record_all.clear()
+
+    client.get("/api/tasks", params={"search": "forme"}, headers=auth_headers)
+
+    report = client.get("/api/_debug/slow-queries", headers={"X-Debug-Token": TOKEN}).json()
+    [search] = [query for query in report["queries"] if "LIKE" in query["sql"].upper()]
+    assert search["endpoints"] == ["GET /api/tasks"]
+    assert "<str len=7>" in search["last_parameters"]
+    # Filtra primero por usuario con el índice compuesto
+    assert any("USING INDEX" in line for line in search["plan"])
+    assert search["full_scan"] is False
+
+
+def test_unindexed_like_is_flagged_as_full_scan(db_session, record_all):
+    """Un LIKE sin filtro indexado recorre toda la tabla y se marca como full scan"""
+    db_session.execute(text("SELECT id FROM tasks WHERE title LIKE :pattern"), {"pattern": "%forme%"}).all()
+
+    [entry] = [entry for entry in record_all.top() if "LIKE" in entry["sql"]]
+    assert entry["endpoints"] == []
+    assert entry["full_scan"] is True
+
+
+@pytest.mark.integration
+def test_indexed_lookup_is_not_full_scan(client, auth_headers, record_all):
+    """Una búsqueda por clave primaria usa el índice"""
+    created = client.post("/api/tasks", headers=auth_headers, json={"title": "Informe"}).json()
+    record_all.clear()
+
+    client.get(f"/api/tasks/{created['id']}", headers=auth_headers)
+
+    lookups = [entry for entry in record_all.top() if "FROM tasks" in entry["sql"]]
+    assert lookups and all(entry["endpoints"] == ["GET /api/tasks/{task_id}"] for entry in lookups)
+    assert not any(entry["full_scan"] for entry in lookups)
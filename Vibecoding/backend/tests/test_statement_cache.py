@@ -0,0 +1,72 @@
+"""
+test_statement_cache.py
+-----------------------
+Las consultas calientes de crud/auth se reutilizan precompiladas: tras la
+primera llamada SQLAlchemy debe encontrar su SQL en la caché de compilación.
+"""
+
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import default
+
+from app import crud
+from app.models import Task
+
+from .conftest import engine
+
+
+@contextmanager
+def cache_stats():
+    """Cuenta aciertos y fallos de la caché de compilación por sentencia ejecutada"""
+    stats = {"hit": 0, "miss": 0}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if context.cache_hit is default.CACHE_HIT:
+            stats["hit"] += 1
+        elif statement.lstrip().upper().startswith("SELECT"):
+            stats["miss"] += 1
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield stats
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+@pytest.fixture
+def user_with_tasks(db_session, created_user):
+    db_session.add_all([Task(user_id=created_user.id, title=f"Tarea {i}") for i in range(5)])
+    db_session.commit()
+    return created_user
+
+
+def _hot_paths(db, user):
+    crud.get_user_by_id(db, user.id)
+    crud.get_user_by_email(db, user.email)  # consulta de authenticate_user
+    crud.get_task_by_id(db, 1, user.id)
+    crud.get_tasks(db, user.id)
+    crud.get_tasks(db, user.id, status="pending", search="tarea", order_by="due_date")
+    crud.get_task_statistics(db, user.id)
+
+
+def test_hot_queries_hit_compiled_cache(db_session, user_with_tasks):
+    """Tras la primera llamada casi todas las ejecuciones son aciertos de la caché"""
+    _hot_paths(db_session, user_with_tasks)
+
+    with cache_stats() as stats:
+        for _ in range(20):
+            _hot_paths(db_session, user_with_tasks)
+
+    assert stats["hit"] >= 20 * 6
+    assert stats["hit"] / (stats["hit"] + stats["miss"]) >= 0.95
+
+
+def test_statements_are_built_once():
+    """Cada combinación de filtros reutiliza el mismo objeto select"""
+    first = crud._tasks_statement(True, False, False, True, "created_at", None, ())
+    again = crud._tasks_statement(True, False, False, True, "created_at", None, ())
+
+    assert first is again
+    assert crud._task_by_id_statement(None, ("reminder",)) is crud._task_by_id_statement(None, ("reminder",))
@@ -0,0 +1,170 @@
+"""
+test_suggest.py
+---------------
+Pruebas del autocompletado de títulos (GET /api/tasks/suggest) y de su
+índice de prefijos en memoria.
+"""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import typeahead
+from app.models import Task
+
+
+# ========== PRUEBAS UNITARIAS ==========
+
+def test_normalize_strips_case_and_accents():
+    """Los tokens se comparan sin mayúsculas ni tildes"""
+    assert typeahead.normalize("Revisión del CAFÉ, mañana!") == ["revision", "del", "cafe", "manana"]
+
+
+def test_user_index_prefix_ranking():
+    """Primero los títulos que empiezan por el prefijo, luego los más cortos"""
+    index = typeahead.UserIndex([
+        (1, "Llamar al banco"),
+        (2, "Banco"),
+        (3, "Ir al banco central"),
+        (4, "Comprar pan"),
+    ])
+
+    assert [task_id for task_id, _ in index.suggest("ban")] == [2, 1, 3]
+    assert [task_id for task_id, _ in index.suggest("al ban")] == [1, 3]
+    assert index.suggest("ban", limit=1) == [(2, "Banco")]
+    assert index.suggest("   ") == []
+
+
+def test_user_index_add_and_remove():
+    """Editar y eliminar mantienen el arreglo ordenado y sin entradas huérfanas"""
+    index = typeahead.UserIndex([(1, "Pagar luz")])
+    index.add(2, "Pagar agua")
+    index.add(1, "Revisar luz")
+    index.remove(2)
+
+    assert index.suggest("pag") == []
+    assert index.suggest("rev") == [(1, "Revisar luz")]
+    assert index.entries == sorted(index.entries)
+    assert len(index.entries) == 2
+
+
+def test_many_prefix_matches_do_not_hide_results():
+    """Con cientos de tareas que comparten el prefijo no se pierden coincidencias ni el mejor ranking"""
+    index = typeahead.UserIndex(
+        [(i, f"Finanzas {i}") for i in range(1, 300)] + [(300, "Informe fiscal")]
+    )
+    assert index.suggest("informe fi") == [(300, "Informe fiscal")]
+
+    index = typeahead.UserIndex(
+        [(i, f"Tarea larga numero {i}") for i in range(1, 300)] + [(300, "Tarea")]
+    )
+    assert [task_id for task_id, _ in index.suggest("tarea", 3)] == [300, 1, 2]
+    assert [task_id for task_id, _ in index.suggest("tarea larga numero 29", 3)] == [29, 290, 291]
+
+    index.add(301, "Tarea b")
+    assert [task_id for task_id, _ in index.suggest("tarea", 2)] == [300, 301]
+
+
+def test_write_during_load_is_not_lost(db_session, created_user, monkeypatch):
+    """Una tarea creada mientras se carga el índice no queda fuera de él"""
+    user_id = created_user.id
+    db_session.add(Task(user_id=user_id, title="Vieja"))
+    db_session.commit()
+    index = typeahead.TypeaheadIndex()
+    original = db_session.execute
+
+    def execute_then_write(*args, **kwargs):
+        if db_session.info.get("written"):
+            return original(*args, **kwargs)
+        rows = original(*args, **kwargs).all()
+        # Otra petición confirma una tarea después de que la carga leyó las filas
+        db_session.info["written"] = True
+        task = Task(user_id=user_id, title="Nueva")
+        db_session.add(task)
+        db_session.commit()
+        index.task_saved(user_id, task.id, task.title)
+        return SimpleNamespace(all=lambda: rows)
+
+    monkeypatch.setattr(db_session, "execute", execute_then_write)
+
+    assert [title for _, title in index.suggest(db_session, user_id, "nue")] == ["Nueva"]
+
+
+def test_index_is_bounded_by_lru(db_session, created_user):
+    """Se conservan solo los usuarios usados más recientemente"""
+    index = typeahead.TypeaheadIndex(max_users=2)
+    for user_id in (1, 2, 3):
+        index.for_user(db_session, user_id)
+    index.for_user(db_session, 2)
+    index.for_user(db_session, 4)
+
+    assert len(index) == 2
+    assert set(index._users) == {2, 4}
+
+
+def test_suggest_is_served_from_memory(db_session, created_user, captured_statements):
+    """Con el índice cargado no se consulta la BD y la búsqueda toma menos de 1 ms"""
+    db_session.add_all([
+        Task(user_id=created_user.id, title=f"Tarea número {i} proyecto {i % 97}")
+        for i in range(5000)
+    ])
+    db_session.commit()
+    index = typeahead.TypeaheadIndex()
+    index.for_user(db_session, created_user.id)
+
+    with captured_statements() as statements:
+        started = time.perf_counter()
+        for prefix in ("tar", "proyecto 4", "num", "zzz") * 25:
+            index.suggest(db_session, created_user.id, prefix)
+        elapsed = (time.perf_counter() - started) / 100
+
+    assert statements == []
+    assert elapsed < 0.001
+
+
+# ========== PRUEBAS DE INTEGRACIÓN ==========
+
+@pytest.mark.integration
+def test_suggest_endpoint_follows_writes(client, auth_headers):
+    """Crear, renombrar y eliminar tareas se refleja en las sugerencias"""
+    created = client.post("/api/tasks", headers=auth_headers, json={"title": "Reunión de equipo"}).json()
+    client.post("/api/tasks", headers=auth_headers, json={"title": "Revisar informe"})
+
+    response = client.get("/api/tasks/suggest", params={"prefix": "re"}, headers=auth_headers)
+    assert response.status_code == 200
+    assert [s["title"] for s in response.json()] == ["Revisar informe", "Reunión de equipo"]
+
+    client.post("/api/tasks", headers=auth_headers, json={"title": "Reunion con cliente"})
+    client.put(f"/api/tasks/{created['id']}", headers=auth_headers, json={"title": "Planificar sprint"})
+    titles = [s["title"] for s in client.get(
+        "/api/tasks/suggest", params={"prefix": "reunión"}, headers=auth_headers
+    ).json()]
+    assert titles == ["Reunion con cliente"]
+
+    client.delete(f"/api/tasks/{created['id']}", headers=auth_headers)
+    assert client.get("/api/tasks/suggest", params={"prefix": "plan"}, headers=auth_headers).json() == []
+
+
+@pytest.mark.integration
+def test_suggest_after_import(client, auth_headers):
+    """La importación masiva invalida el índice y se recarga con las nuevas tareas"""
+    client.post("/api/tasks", headers=auth_headers, json={"title": "Existente"})
+    client.get("/api/tasks/suggest", params={"prefix": "ex"}, headers=auth_headers)
+
+    client.post(
+        "/api/tasks/import",
+        headers={**auth_headers, "Content-Type": "application/x-ndjson"},
+        content=b'{"title": "Examen final"}'
+    )
+
+    response = client.get("/api/tasks/suggest", params={"prefix": "ex"}, headers=auth_headers)
+    assert [s["title"] for s in response.json()] == ["Existente", "Examen final"]
+
+
+@pytest.mark.integration
+def test_suggest_requires_prefix(client, auth_headers):
+    """Sin prefijo la petición es inválida"""
+    response = client.get("/api/tasks/suggest", headers=auth_headers)
+
+    assert response.status_code == 422
@@ -0,0 +1,133 @@
+"""
+test_tracing.py
+---------------
+Pruebas de las trazas: muestreo, propagación W3C traceparent, spans de
+la petición, autenticación, SQL y bcrypt, y exportación JSONL.
+"""
+
+import json
+import secrets
+
+import pytest
+
+from app import tracing
+
+from .conftest import engine
+
+
+@pytest.fixture
+def spans():
+    """Trazas activas con muestreo total y exportación inmediata a memoria"""
+    tracing.instrument_engine(engine)
+    exporter = tracing.InMemoryExporter()
+    tracing.configure(exporter, ratio=1.0, batch=False)
+    yield exporter.spans
+    tracing.shutdown()
+
+
+def _by_name(spans, name):
+    return [span for span in spans if span.name == name]
+
+
+# ========== PRUEBAS UNITARIAS ==========
+
+def test_parse_traceparent():
+    """Se aceptan headers W3C válidos y se rechazan los malformados"""
+    trace_id, span_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+
+    assert tracing.parse_traceparent(f"00-{trace_id}-{span_id}-01") == (trace_id, span_id, True)
+    assert tracing.parse_traceparent(f"00-{trace_id}-{span_id}-00") == (trace_id, span_id, False)
+    assert tracing.parse_traceparent(f"ff-{trace_id}-{span_id}-01") is None
+    assert tracing.parse_traceparent(f"00-{'0' * 32}-{span_id}-01") is None
+    assert tracing.parse_traceparent("no-es-un-traceparent") is None
+
+
+def test_ratio_sampler():
+    """El muestreo es determinista por trace id y respeta la fracción"""
+    trace_ids = [secrets.token_hex(16) for _ in range(4000)]
+    quarter = tracing.Tracer(tracing.SimpleProcessor(tracing.InMemoryExporter()), ratio=0.25)
+
+    sampled = sum(quarter.should_sample(trace_id) for trace_id in trace_ids)
+    assert 800 < sampled < 1200
+    assert [quarter.should_sample(t) for t in trace_ids[:50]] == [quarter.should_sample(t) for t in trace_ids[:50]]
+    assert not any(tracing.Tracer(None, ratio=0.0).should_sample(t) for t in trace_ids)
+    assert all(tracing.Tracer(None, ratio=1.0).should_sample(t) for t in trace_ids)
+
+
+def test_span_is_noop_without_active_trace(spans):
+    """Fuera de una petición muestreada no se crean spans"""
+    with tracing.span("suelto") as span:
+        span.set_attribute("x", 1)
+
+    assert spans == []
+
+
+def test_jsonl_exporter_writes_otlp_spans(tmp_path):
+    """Cada span se escribe como una línea OTLP/JSON"""
+    path = tmp_path / "traces.jsonl"
+    span = tracing.Span("prueba", secrets.token_hex(16), None, attributes={"n": 3, "ok": True})
+    span.end_ns = span.start_ns + 10
+
+    tracing.JsonlExporter(str(path), service_name="test").export([span, span])
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(lines) == 2
+    assert lines[0]["service.name"] == "test"
+    assert lines[0]["traceId"] == span.trace_id
+    assert {"key": "n", "value": {"intValue": "3"}} in lines[0]["attributes"]
+    assert "parentSpanId" not in lines[0]
+
+
+# ========== PRUEBAS DE INTEGRACIÓN ==========
+
+@pytest.mark.integration
+def test_request_spans_follow_traceparent(client, created_user, sample_user_data, spans):
+    """El login continúa la traza entrante e incluye bcrypt y SQL como hijos"""
+    trace_id, parent_id = secrets.token_hex(16), secrets.token_hex(8)
+
+    response = client.post(
+        "/api/auth/login", json=sample_user_data,
+        headers={"traceparent": f"00-{trace_id}-{parent_id}-01"}
+    )
+
+    assert response.status_code == 200
+    [root] = _by_name(spans, "POST /api/auth/login")
+    assert root.trace_id == trace_id
+    assert root.parent_id == parent_id
+    assert root.attributes["http.status_code"] == 200
+    assert response.headers["traceresponse"] == root.traceparent
+
+    [verify] = _by_name(spans, "auth.bcrypt_verify")
+    assert verify.parent_id == root.span_id
+    queries = _by_name(spans, "db.query")
+    assert queries and all(query.trace_id == trace_id for query in queries)
+    assert any("FROM users" in query.attributes["db.statement"] for query in queries)
+    assert _by_name(spans, "db.pool.checkout")
+
+
+@pytest.mark.integration
+def test_authenticated_request_spans(client, auth_headers, spans):
+    """get_current_user separa la decodificación del JWT y la búsqueda del usuario"""
+    spans.clear()
+
+    client.get("/api/tasks", headers=auth_headers)
+
+    [root] = _by_name(spans, "GET /api/tasks")
+    [decode] = _by_name(spans, "auth.jwt_decode")
+    [lookup] = _by_name(spans, "auth.user_lookup")
+    assert decode.parent_id == root.span_id and lookup.parent_id == root.span_id
+    assert any(query.parent_id == lookup.span_id for query in _by_name(spans, "db.query"))
+    assert all(span.end_ns >= span.start_ns for span in spans)
+
+
+@pytest.mark.integration
+def test_unsampled_parent_is_respected(client, spans):
+    """Un traceparent sin la marca de muestreo no genera spans"""
+    response = client.get(
+        "/api/health",
+        headers={"traceparent": f"00-{secrets.token_hex(16)}-{secrets.token_hex(8)}-00"}
+    )
+
+    assert response.status_code == 200
+    assert "traceresponse" not in response.headers
+    assert spans == []
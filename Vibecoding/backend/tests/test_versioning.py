@@ -0,0 +1,129 @@
+"""
+test_versioning.py
+------------------
+Pruebas de concurrencia optimista de tareas: columna version, UPDATE
+condicional, ETag / If-Match y 409 ante ediciones en conflicto.
+"""
+
+import pytest
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+from app import crud, group_commit, schemas
+from app.database import Base, create_db_engine
+from app.models import Task, User
+
+from .conftest import engine
+
+
+# ========== PRUEBAS UNITARIAS ==========
+
+def test_update_is_a_single_conditional_statement(db_session, created_task):
+    """La edición es un UPDATE ... WHERE id AND user_id AND version, sin cargar la entidad antes"""
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        task = crud.update_task(
+            db_session, created_task.id, created_task.user_id, schemas.TaskUpdate(title="Nuevo"), expected_version=1
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert task.version == 2
+    updates = [statement for statement in statements if statement.startswith("UPDATE tasks")]
+    assert len(updates) == 1
+    assert "tasks.version = ?" in updates[0] and "tasks.user_id = ?" in updates[0]
+
+
+def test_stale_version_raises_conflict(db_session, created_task):
+    """Si la versión no coincide no se modifica nada"""
+    db_session.execute(update(Task).where(Task.id == created_task.id).values(version=5))
+    db_session.commit()
+
+    with pytest.raises(crud.VersionConflict) as conflict:
+        crud.mark_task_completed(db_session, created_task.id, created_task.user_id, expected_version=1)
+
+    assert conflict.value.current_version == 5
+    db_session.expire_all()
+    assert db_session.get(Task, created_task.id).status == "pending"
+
+
+def test_conflicting_edits_in_one_group(tmp_path):
+    """Dos ediciones con la misma versión dentro de un grupo: una gana y la otra recibe el conflicto"""
+    file_engine = create_db_engine(f"sqlite:///{tmp_path}/versions.db")
+    Base.metadata.create_all(bind=file_engine)
+    with Session(file_engine) as db:
+        db.add(User(email="version@quicktask.com", password_hash="x"))
+        db.add(Task(user_id=1, title="Original"))
+        db.commit()
+    writer = group_commit.GroupCommitWriter(
+        lambda: group_commit.GroupSession(bind=file_engine, **group_commit.SESSION_OPTIONS), window=0.2
+    )
+
+    first = writer.submit(crud.update_task, 1, 1, schemas.TaskUpdate(title="A"), expected_version=1)
+    second = writer.submit(crud.update_task, 1, 1, schemas.TaskUpdate(title="B"), expected_version=1)
+
+    assert first.result(timeout=5).version == 2
+    with pytest.raises(crud.VersionConflict):
+        second.result(timeout=5)
+    writer.stop()
+    with Session(file_engine) as db:
+        assert db.get(Task, 1).title == "A"
+    file_engine.dispose()
+
+
+# ========== PRUEBAS DE INTEGRACIÓN ==========
+
+@pytest.mark.integration
+def test_version_and_etag_in_responses(client, auth_headers, created_task):
+    """La versión se expone en el cuerpo y como ETag, y avanza con cada edición"""
+    response = client.get(f"/api/tasks/{created_task.id}", headers=auth_headers)
+    assert response.json()["version"] == 1
+    assert response.headers["etag"] == '"1"'
+
+    response = client.put(f"/api/tasks/{created_task.id}", headers=auth_headers, json={"title": "Editada"})
+    assert response.json()["version"] == 2
+    assert response.headers["etag"] == '"2"'
+
+    response = client.post(f"/api/tasks/{created_task.id}/complete", headers=auth_headers)
+    assert response.json()["version"] == 3
+
+
+@pytest.mark.integration
+def test_if_match_conflict_returns_409(client, auth_headers, created_task):
+    """Dos clientes que leyeron la versión 1: el segundo recibe 409 con el ETag vigente"""
+    url = f"/api/tasks/{created_task.id}"
+    first = client.put(url, headers={**auth_headers, "If-Match": '"1"'}, json={"title": "Cliente A"})
+    second = client.put(url, headers={**auth_headers, "If-Match": '"1"'}, json={"title": "Cliente B"})
+
+    assert first.status_code == 200
+    assert second.status_code == 409
+    assert second.headers["etag"] == '"2"'
+    assert client.get(url, headers=auth_headers).json()["title"] == "Cliente A"
+
+    retry = client.put(url, headers={**auth_headers, "If-Match": second.headers["etag"]}, json={"title": "Cliente B"})
+    assert retry.status_code == 200
+    assert retry.json()["version"] == 3
+
+
+@pytest.mark.integration
+def test_if_match_formats(client, auth_headers, created_task):
+    """Se aceptan ETags débiles y *; un valor que no es versión es 400"""
+    url = f"/api/tasks/{created_task.id}/complete"
+
+    assert client.post(url, headers={**auth_headers, "If-Match": 'W/"1"'}).status_code == 200
+    assert client.post(url, headers={**auth_headers, "If-Match": "*"}).status_code == 200
+    assert client.post(url, headers={**auth_headers, "If-Match": '"abc"'}).status_code == 400
+
+
+@pytest.mark.integration
+def test_projection_without_version_has_no_etag(client, auth_headers, created_task):
+    """Con ?fields= sin version no se carga la columna ni se envía ETag"""
+    response = client.get(f"/api/tasks/{created_task.id}?fields=title", headers=auth_headers)
+
+    assert "etag" not in response.headers
+    assert client.get(f"/api/tasks/{created_task.id}?fields=title,version", headers=auth_headers).headers["etag"] == '"1"'
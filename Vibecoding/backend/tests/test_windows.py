@@ -0,0 +1,131 @@
+"""
+test_windows.py
+---------------
+Pruebas de consultas por ventana de tiempo: próximas, vencidas,
+rango de vencimiento y ventana de recordatorios.
+Incluye verificación con EXPLAIN QUERY PLAN de que no hay full scans.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import crud
+from app.models import Task, Reminder
+
+
+@pytest.fixture
+def timeline(db_session, created_user):
+    """Tareas con vencimientos escalonados alrededor de ahora"""
+    now = datetime.utcnow()
+    specs = [
+        ("Vencida hace 2 días", -48, "pending"),
+        ("Vencida hace 1 hora", -1, "pending"),
+        ("Vencida completada", -5, "completed"),
+        ("En 2 horas", 2, "pending"),
+        ("En 20 horas", 20, "pending"),
+        ("En 3 días", 72, "pending"),
+    ]
+    tasks = {}
+    for title, hours, status in specs:
+        task = Task(user_id=created_user.id, title=title, status=status, due_date=now + timedelta(hours=hours))
+        db_session.add(task)
+        tasks[title] = task
+    db_session.add(Task(user_id=created_user.id, title="Sin fecha"))
+    db_session.commit()
+    for title, task in tasks.items():
+        db_session.add(Reminder(task_id=task.id, remind_at=task.due_date - timedelta(hours=1)))
+    db_session.commit()
+    return now
+
+
+def assert_no_full_scans(db_session, statements):
+    """
+    Ejecuta EXPLAIN QUERY PLAN y verifica que todas las tablas se acceden por
+    índice y que el orden sale del índice (sin USE TEMP B-TREE)
+    """
+    connection = db_session.connection()
+    for statement, parameters in statements:
+        plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        details = [row[-1] for row in plan]
+        assert not [d for d in details if d.startswith("SCAN")], details
+        assert not [d for d in details if "TEMP B-TREE" in d], details
+        assert any(d.startswith("SEARCH") for d in details), details
+
+
+# ========== PRUEBAS DE ENDPOINTS ==========
+
+@pytest.mark.integration
+def test_upcoming_tasks_next_24h(client, auth_headers, timeline):
+    """/api/tasks/upcoming retorna pendientes que vencen en las próximas 24h"""
+    response = client.get("/api/tasks/upcoming", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert [t["title"] for t in response.json()] == ["En 2 horas", "En 20 horas"]
+
+
+@pytest.mark.integration
+def test_upcoming_tasks_custom_window_and_limit(client, auth_headers, timeline):
+    """La ventana y el límite son configurables"""
+    response = client.get("/api/tasks/upcoming?hours=100&limit=2", headers=auth_headers)
+
+    assert [t["title"] for t in response.json()] == ["En 2 horas", "En 20 horas"]
+
+
+@pytest.mark.integration
+def test_overdue_tasks(client, auth_headers, timeline):
+    """/api/tasks/overdue retorna pendientes vencidas, las más atrasadas primero"""
+    response = client.get("/api/tasks/overdue", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert [t["title"] for t in response.json()] == ["Vencida hace 2 días", "Vencida hace 1 hora"]
+
+
+@pytest.mark.integration
+def test_list_tasks_due_range(client, auth_headers, timeline):
+    """GET /api/tasks admite due_from/due_to"""
+    due_from = (timeline - timedelta(hours=6)).isoformat()
+    due_to = (timeline + timedelta(hours=6)).isoformat()
+
+    response = client.get(
+        "/api/tasks", headers=auth_headers, params={"due_from": due_from, "due_to": due_to}
+    )
+
+    titles = {t["title"] for t in response.json()["tasks"]}
+    assert titles == {"Vencida hace 1 hora", "Vencida completada", "En 2 horas"}
+
+
+@pytest.mark.integration
+def test_list_reminders_window(client, auth_headers, timeline):
+    """GET /api/reminders admite una ventana from/to y un límite, ordenado por fecha"""
+    response = client.get(
+        "/api/reminders",
+        headers=auth_headers,
+        params={"from": timeline.isoformat(), "to": (timeline + timedelta(days=2)).isoformat(), "limit": 5}
+    )
+
+    assert response.status_code == 200
+    remind_at = [r["remind_at"] for r in response.json()]
+    assert len(remind_at) == 2
+    assert remind_at == sorted(remind_at)
+
+
+# ========== PRUEBAS DE PLANES DE EJECUCIÓN ==========
+
+@pytest.mark.integration
+def test_window_queries_use_index_range_scans(db_session, created_user, timeline, captured_statements):
+    """Próximas, vencidas, rango de vencimiento y recordatorios: rango de índice sin full scan ni sort"""
+    user_id = created_user.id
+    with captured_statements() as statements:
+        crud.get_upcoming_tasks(db_session, user_id, timeline)
+        crud.get_overdue_tasks(db_session, user_id, timeline)
+        crud.get_tasks(
+            db_session, user_id, order_by="due_date",
+            due_from=timeline, due_to=timeline + timedelta(days=1)
+        )
+        crud.get_reminders_by_user(
+            db_session, user_id, timeline, timeline + timedelta(days=1), limit=10
+        )
+
+    assert len(statements) == 4
+    assert_no_full_scans(db_session, statements)